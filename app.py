@@ -1,10 +1,19 @@
 import os
+import json
+import time
+import uuid
+import hashlib
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 from datetime import datetime
 
 BACKEND_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:8000")
+# Stream results over Server-Sent Events instead of polling a queued job (needs the backend on ASGI)
+ANALYZE_STREAMING = os.environ.get("ANALYZE_STREAMING", "False").lower() == "true"
+# How long history pages and the resume list are reused across reruns (they are also refreshed after changes)
+HISTORY_CACHE_TTL = int(os.environ.get("HISTORY_CACHE_TTL", 300))
 
 
 # --- Page Configuration (Do this first!) ---
@@ -15,16 +24,116 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
-# --- Helper Functions for API calls (No changes needed) ---
+# --- Helper Functions for API calls ---
+
+def get_http_session():
+    """One pooled requests.Session per browser session, so reruns reuse the open connection to the backend."""
+    if 'http_session' not in st.session_state:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        st.session_state['http_session'] = session
+    return st.session_state['http_session']
+
+def auth_headers():
+    return {'Authorization': f'Bearer {st.session_state["auth_token"]}'}
+
+def idempotency_key(*parts):
+    """
+    One Idempotency-Key per distinct submission, kept across reruns: resubmitting the same
+    resume and job description (a double click, a rerun, a retry) returns the original analysis.
+    """
+    fingerprint = hashlib.sha256("\0".join(map(str, parts)).encode()).hexdigest()
+    if st.session_state.get('idempotency_fingerprint') != fingerprint:
+        st.session_state['idempotency_fingerprint'] = fingerprint
+        st.session_state['idempotency_key'] = str(uuid.uuid4())
+    return st.session_state['idempotency_key']
 
 def login_user(username, password):
-    response = requests.post(f"{BACKEND_URL}/api/token/", data={"username": username, "password": password})
+    response = get_http_session().post(f"{BACKEND_URL}/api/token/", data={"username": username, "password": password})
     return response
 
 def register_user(username, email, password):
-    response = requests.post(f"{BACKEND_URL}/api/register/", json={"username": username, "email": email, "password": password})
+    response = get_http_session().post(f"{BACKEND_URL}/api/register/", json={"username": username, "email": email, "password": password})
     return response
 
+# Cached per user (the token is part of the key) and per version; bump the version in
+# session state to refetch after a change. Failed requests raise, so they are never cached.
+@st.cache_data(ttl=HISTORY_CACHE_TTL, show_spinner=False)
+def fetch_history_page(_session, page_url, auth_token, version):
+    response = _session.get(page_url, headers={'Authorization': f'Bearer {auth_token}'})
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(ttl=HISTORY_CACHE_TTL, show_spinner=False)
+def fetch_resumes(_session, auth_token, version):
+    response = _session.get(f"{BACKEND_URL}/api/resumes/?page_size=100", headers={'Authorization': f'Bearer {auth_token}'})
+    response.raise_for_status()
+    return response.json()['results']
+
+def bump_version(name):
+    st.session_state[name] = st.session_state.get(name, 0) + 1
+
+JOB_STATUS_LABELS = {
+    'queued': "Waiting for a free analyzer...",
+    'running': "AI is analyzing... this may take a moment...",
+}
+
+def poll_analysis_job(job_id, headers, status, timeout=300, interval=2):
+    """Polls a queued analysis until it is done or failed. Returns the final job, or None on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = get_http_session().get(f"{BACKEND_URL}/api/analyze/jobs/{job_id}/", headers=headers)
+        if response.status_code == 200:
+            job = response.json()
+            if job['status'] in ('done', 'failed'):
+                return job
+            status.update(label=JOB_STATUS_LABELS.get(job['status'], "Working..."))
+        time.sleep(interval)
+    return None
+
+def describe_error(response):
+    """Turns a failed API response into a message; rate-limit responses say when to try again."""
+    if response.status_code == 429:
+        return f"you have hit the analysis limit. Try again in {response.headers.get('Retry-After', 'a few')} seconds."
+    return response.text
+
+def queue_analysis(data, headers, status):
+    """Queues an analysis and polls it to completion. Returns (result, error)."""
+    response = get_http_session().post(f"{BACKEND_URL}/api/analyze/", headers=headers, json={**data, 'async': True})
+    if response.status_code != 202:
+        return None, describe_error(response)
+    job = poll_analysis_job(response.json()['id'], headers, status)
+    if job and job['status'] == 'done':
+        return job['analysis']['result'], None
+    return None, job['error'] if job else "timed out waiting for the server."
+
+def stream_analysis(data, headers, status):
+    """Runs an analysis over the SSE endpoint, showing fields as they arrive. Returns (result, error)."""
+    partial = {}
+    event = None
+    with get_http_session().post(f"{BACKEND_URL}/api/analyze/stream/", headers=headers, json=data, stream=True, timeout=300) as response:
+        if response.status_code != 200:
+            return None, describe_error(response)
+        status.update(label="AI is analyzing...")
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                payload = json.loads(line[len("data: "):])
+                if event == 'field':
+                    partial.update(payload)
+                    if 'suitability_score' in payload:
+                        status.write(f"**Suitability Score:** {payload['suitability_score']}%")
+                    else:
+                        status.write(f"✅ {', '.join(name.replace('_', ' ') for name in payload)} ready")
+                elif event == 'done':
+                    return payload['result'], None
+                elif event == 'error':
+                    return None, payload['error']
+    return None, "the analysis stream ended unexpectedly."
+
 # --- UI Rendering Functions (No changes needed) ---
 
 def display_results(result):
@@ -139,6 +248,7 @@ else:
         page = st.radio("Go to", ["Analyze New Resume 📄", "View History 📜"], label_visibility="hidden")
         st.write("---")
         if st.button("Logout 🚪"):
+            get_http_session().close()
             # Clear all session state on logout for a clean slate
             for key in st.session_state.keys():
                 del st.session_state[key]
@@ -151,9 +261,26 @@ else:
         st.title("AI-Powered Resume Analyzer")
         st.markdown("Follow the steps below to get an instant analysis of your resume.")
 
-        # --- STEP 1: RESUME UPLOAD ---
+        # --- STEP 1: RESUME UPLOAD (or pick one uploaded before) ---
         if st.session_state.get('uploaded_resume_info') is None:
             st.subheader("Step 1: Upload Your Resume")
+            try:
+                resumes = fetch_resumes(
+                    get_http_session(), st.session_state['auth_token'], st.session_state.get('resume_list_version', 0)
+                )
+            except requests.RequestException:
+                resumes = []
+            if resumes:
+                with st.container(border=True):
+                    picked = st.selectbox(
+                        "Use one of your resumes",
+                        resumes,
+                        format_func=lambda r: f"{r['name'] or 'Resume'} (uploaded {r['uploaded_at'][:10]})",
+                    )
+                    if st.button("Use this resume"):
+                        st.session_state['uploaded_resume_info'] = {'id': picked['id'], 'name': picked['name'] or 'Your resume'}
+                        st.rerun()
+                st.caption("...or upload a new one:")
             uploaded_file = st.file_uploader(
                 "Choose a PDF file to begin",
                 type="pdf",
@@ -161,15 +288,16 @@ else:
             )
             if uploaded_file:
                 with st.status("Uploading and processing resume...", expanded=True) as status:
-                    headers = {'Authorization': f'Bearer {st.session_state["auth_token"]}'}
                     files = {'file': (uploaded_file.name, uploaded_file.getvalue(), 'application/pdf')}
-                    response = requests.post(f"{BACKEND_URL}/api/resumes/upload/", headers=headers, files=files)
-                    if response.status_code == 201:
+                    response = get_http_session().post(f"{BACKEND_URL}/api/resumes/upload/", headers=auth_headers(), files=files)
+                    # 200 means this exact file was uploaded before and the existing resume was reused
+                    if response.status_code in (200, 201):
                         # Store file info in session state
                         st.session_state['uploaded_resume_info'] = {
                             'id': response.json().get('id'),
                             'name': uploaded_file.name
                         }
+                        bump_version('resume_list_version')
                         status.update(label="✅ Upload successful!", state="complete", expanded=False)
                         st.rerun() # Rerun to move to the next step
                     else:
@@ -181,7 +309,7 @@ else:
             # Show which file is ready for analysis
             file_name = st.session_state['uploaded_resume_info']['name']
             st.success(f"✅ **{file_name}** is uploaded and ready.")
-            if st.button("Upload a different resume", type="secondary"):
+            if st.button("Use a different resume", type="secondary"):
                 st.session_state['uploaded_resume_info'] = None
                 st.rerun()
             
@@ -194,20 +322,23 @@ else:
 
             st.subheader("Step 3: Analyze")
             if st.button("Analyze Now ✨", type="primary", use_container_width=True, disabled=(not jd_text)):
-                with st.status("AI is analyzing... this may take a moment...", expanded=True) as status:
-                    headers = {'Authorization': f'Bearer {st.session_state["auth_token"]}'}
-                    data = {'resume_id': st.session_state['uploaded_resume_info']['id'], 'jd_text': jd_text}
-                    response = requests.post(f"{BACKEND_URL}/api/analyze/", headers=headers, json=data)
-                    
-                    if response.status_code == 201:
-                        st.session_state['latest_analysis'] = response.json().get('result')
-                        # Reset resume info for the next analysis
-                        st.session_state['uploaded_resume_info'] = None
+                data = {'resume_id': st.session_state['uploaded_resume_info']['id'], 'jd_text': jd_text}
+                headers = {**auth_headers(), 'Idempotency-Key': idempotency_key(data['resume_id'], jd_text)}
+                with st.status("Queuing your analysis...", expanded=True) as status:
+                    if ANALYZE_STREAMING:
+                        result, error = stream_analysis(data, headers, status)
+                    else:
+                        result, error = queue_analysis(data, headers, status)
+
+                    if result:
+                        st.session_state['latest_analysis'] = result
+                        # The resume stays selected, so the next job description can be checked against it
+                        bump_version('history_version')
                         status.update(label="Analysis complete!", state="complete")
                         st.rerun()
                     else:
                         status.update(label="Analysis Failed!", state="error")
-                        st.error(f"Analysis failed: {response.text}")
+                        st.error(f"Analysis failed: {error}")
 
         # --- Display latest analysis results ---
         if st.session_state.get('latest_analysis'):
@@ -240,20 +371,25 @@ else:
 
     elif "View History" in page:
         st.title("📜 Analysis History")
-        headers = {'Authorization': f'Bearer {st.session_state["auth_token"]}'}
+
+        # The backend returns one cursor page at a time, already sorted newest first.
+        # Pages are cached, so expanding an analysis or paging back does not refetch them.
+        page_url = st.session_state.get('history_page_url') or f"{BACKEND_URL}/api/history/?page_size=10"
 
         with st.spinner("Fetching your history..."):
-            response = requests.get(f"{BACKEND_URL}/api/history/", headers=headers)
+            try:
+                history_page = fetch_history_page(
+                    get_http_session(), page_url, st.session_state['auth_token'], st.session_state.get('history_version', 0)
+                )
+            except requests.RequestException:
+                history_page = None
 
-        if response.status_code == 200:
-            history = response.json()
+        if history_page is not None:
+            history = history_page['results']
 
             if not history:
                 st.info("You have no past analyses. Go ahead and analyze a new resume!")
             else:
-                # Sort history by analyzed_at descending
-                history.sort(key=lambda x: x['analyzed_at'], reverse=True)
-
                 # Helper function to format UTC timestamp to local timezone
                 def format_local_time(utc_iso, tz_name='Asia/Kolkata'):
                     from datetime import datetime
@@ -280,6 +416,16 @@ else:
 
                         st.markdown("---")  # separator for readability
 
-    
+            # Page navigation
+            col_newer, col_older = st.columns(2)
+            with col_newer:
+                if history_page.get('previous') and st.button("← Newer"):
+                    st.session_state['history_page_url'] = history_page['previous']
+                    st.rerun()
+            with col_older:
+                if history_page.get('next') and st.button("Older →"):
+                    st.session_state['history_page_url'] = history_page['next']
+                    st.rerun()
+
         else:
-            st.error("Could not fetch your analysis history. Please try again later.")
\ No newline at end of file
+            st.error("Could not fetch your analysis history. Please try again later.")
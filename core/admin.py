@@ -1,9 +1,18 @@
 from django.contrib import admin
-from .models import User, Resume, JobDescription, Analysis
+from .models import User, Resume, JobDescription, Analysis, AnalysisJob, AnalysisBatch, ResumeBlob, ResumeUpload, LLMUsage, UserQuota, Skill, AnalysisSkill, AnalysisRequest
 
 # Register our custom models with the Django admin interface.
 
 admin.site.register(User)
 admin.site.register(Resume)
 admin.site.register(JobDescription)
-admin.site.register(Analysis)
\ No newline at end of file
+admin.site.register(Analysis)
+admin.site.register(AnalysisJob)
+admin.site.register(AnalysisBatch)
+admin.site.register(ResumeBlob)
+admin.site.register(ResumeUpload)
+admin.site.register(LLMUsage)
+admin.site.register(UserQuota)
+admin.site.register(Skill)
+admin.site.register(AnalysisSkill)
+admin.site.register(AnalysisRequest)
@@ -0,0 +1,377 @@
+import json
+import logging
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import scoring
+from .models import User
+
+# A reproducible benchmark of the upload -> analyze -> history path, driven through
+# Django's test client against whatever LLM backends services.llm_router routes to
+# (the benchmark command uses core.fake_llm). Everything random is seeded, so two
+# runs with the same options generate the same corpus and requests.
+
+WORDS_PER_LINE = 12
+LINES_PER_PAGE = 45
+
+VERBS = ["Built", "Designed", "Led", "Maintained", "Migrated", "Optimized", "Shipped", "Automated", "Scaled", "Tested"]
+NOUNS = ["services", "pipelines", "dashboards", "APIs", "data models", "deployments", "test suites", "integrations"]
+FILLER = ("team product customers platform reliability latency cost quality release roadmap stakeholders "
+          "migration incidents onboarding documentation metrics").split()
+
+# Job description lengths, in words, cycled through when generating the corpus.
+JD_LENGTHS = (60, 250, 900)
+
+
+# -------------------------------
+# CORPUS
+# -------------------------------
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages):
+    """
+    Builds a valid PDF with one page per list of text lines, in Helvetica.
+    """
+    page_count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(page_count))
+        + b"] /Count %d >>" % page_count,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        shown = b" T* ".join(b"(" + pdf_escape(line).encode("latin-1", "replace") + b") Tj" for line in lines)
+        stream = b"BT /F1 10 Tf 14 TL 56 760 Td " + shown + b" ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def skill_names():
+    return sorted(set(scoring.load_skills().values()))
+
+
+def resume_line(rng, skills):
+    words = [rng.choice(VERBS), rng.choice(skills), rng.choice(NOUNS), "with", rng.choice(skills)]
+    words += rng.choices(FILLER, k=WORDS_PER_LINE - len(words))
+    return " ".join(words)
+
+
+def generate_resume(rng, page_count, skills):
+    """
+    Returns the PDF bytes of a resume with `page_count` full pages.
+    """
+    own_skills = rng.sample(skills, 12)
+    pages = []
+    for number in range(page_count):
+        lines = [f"Candidate {rng.randrange(10 ** 6)} - Experience (page {number + 1})"]
+        lines += [resume_line(rng, own_skills) for _ in range(LINES_PER_PAGE - 1)]
+        pages.append(lines)
+    return build_pdf(pages)
+
+
+def generate_job_description(rng, words, skills):
+    required = rng.sample(skills, 8)
+    text = [f"Senior {rng.choice(required)} Engineer", "", "Requirements:"]
+    text += [f"- {skill} experience" for skill in required]
+    body = []
+    while len(body) < words:
+        body += [rng.choice(VERBS).lower(), rng.choice(required), rng.choice(NOUNS)] + rng.choices(FILLER, k=5)
+    text.append(" ".join(body[:words]))
+    return "\n".join(text)
+
+
+def generate_corpus(seed, resume_count, max_pages, jd_count):
+    """
+    Returns (resumes, job descriptions): resumes as (file name, PDF bytes, pages) with
+    page counts cycling 1..max_pages, and JDs cycling through JD_LENGTHS words.
+    """
+    rng = random.Random(seed)
+    skills = skill_names()
+    resumes = []
+    for i in range(resume_count):
+        pages = 1 + i % max_pages
+        resumes.append((f"resume-{i:03d}.pdf", generate_resume(rng, pages, skills), pages))
+    job_descriptions = [generate_job_description(rng, JD_LENGTHS[i % len(JD_LENGTHS)], skills) for i in range(jd_count)]
+    return resumes, job_descriptions
+
+
+# -------------------------------
+# MEASUREMENT
+# -------------------------------
+def summarize(values):
+    """
+    Returns count, mean, p50, p95 and max of `values`, rounded to 0.01.
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 2),
+        "p50": round(percentile(50), 2),
+        "p95": round(percentile(95), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class TimingCollector(logging.Handler):
+    """
+    Collects the per-request stage timings that RequestTimingMiddleware logs.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        # Handler.handle() already holds self.lock here.
+        self.lines.append(json.loads(record.getMessage()))
+
+    def take(self):
+        with self.lock:
+            lines, self.lines = self.lines, []
+        return lines
+
+
+class EndpointStats:
+    """
+    Latency, query counts, status codes and stage timings for one endpoint.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.statuses = {}
+        self.stages = {}
+        self.cache_hits = 0
+
+    def record(self, response, seconds, queries=None):
+        self.latencies.append(seconds * 1000)
+        if queries is not None:
+            self.queries.append(queries)
+        self.statuses[str(response.status_code)] = self.statuses.get(str(response.status_code), 0) + 1
+        if response.get("Content-Type", "").startswith("application/json"):
+            body = response.json()
+            if isinstance(body, dict) and body.get("cache_hit"):
+                self.cache_hits += 1
+
+    def add_timings(self, lines):
+        for line in lines:
+            for stage, seconds in line.get("stages", {}).items():
+                self.stages.setdefault(stage, []).append(seconds * 1000)
+
+    def as_dict(self):
+        result = {
+            "latency_ms": summarize(self.latencies),
+            "status_codes": self.statuses,
+            "stages_ms": {stage: summarize(values) for stage, values in sorted(self.stages.items())},
+        }
+        if self.queries:
+            result["db_queries"] = summarize(self.queries)
+        if self.cache_hits:
+            result["cache_hit_rate"] = round(self.cache_hits / len(self.latencies), 3)
+        return result
+
+
+def max_rss_kb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if platform.system() == "Darwin" else rss
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def authenticated_client(user):
+    return Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+
+def timed(call, capture_queries=True):
+    """
+    Runs call() and returns (response, seconds, query count). Queries are only
+    counted on the calling thread's connection.
+    """
+    if not capture_queries:
+        started = time.perf_counter()
+        response = call()
+        return response, time.perf_counter() - started, None
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = call()
+        seconds = time.perf_counter() - started
+    return response, seconds, len(queries.captured_queries)
+
+
+# -------------------------------
+# BENCHMARK
+# -------------------------------
+def run_benchmark(resumes, job_descriptions, requests_per_client=10, concurrency=(1, 4, 16),
+                  trace_memory=False, log=print):
+    """
+    Runs every phase against the current database and returns the results as a dict:
+    upload, analyze (cold, then repeated for cache hits) and history measured one
+    request at a time, then analyze throughput at each concurrency level.
+    """
+    collector = TimingCollector()
+    timing_logger = logging.getLogger("core.timing")
+    timing_logger.addHandler(collector)
+    propagate, level = timing_logger.propagate, timing_logger.level
+    timing_logger.propagate = False
+    timing_logger.setLevel(logging.INFO)
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        user = User.objects.create_user(username="benchmark", password="benchmark-password")
+        client = authenticated_client(user)
+        results = {"endpoints": {}, "throughput": [], "memory": {}}
+
+        def phase(name, calls):
+            stats = EndpointStats()
+            collector.take()
+            for call in calls:
+                response, seconds, queries = timed(call)
+                stats.record(response, seconds, queries)
+            stats.add_timings(collector.take())
+            results["endpoints"][name] = stats.as_dict()
+            results["memory"][f"max_rss_kb_after_{name}"] = max_rss_kb()
+            log(f"{name}: p50 {stats.as_dict()['latency_ms'].get('p50')} ms over {len(stats.latencies)} requests")
+            return stats
+
+        resume_ids = []
+
+        def upload(name, data):
+            def call():
+                upload_file = SimpleUploadedFile(name, data, content_type="application/pdf")
+                response = client.post("/api/resumes/upload/", {"file": upload_file})
+                resume_ids.append(response.json().get("id"))
+                return response
+            return call
+
+        phase("upload", [upload(name, data) for name, data, _ in resumes])
+
+        def analyze(resume_id, jd_text):
+            return lambda: client.post(
+                "/api/analyze/", {"resume_id": resume_id, "jd_text": jd_text, "mode": "full"},
+                content_type="application/json",
+            )
+
+        pairs = [(resume_ids[i % len(resume_ids)], jd) for i, jd in enumerate(job_descriptions)]
+        phase("analyze_cold", [analyze(resume_id, jd) for resume_id, jd in pairs])
+        phase("analyze_cached", [analyze(resume_id, jd) for resume_id, jd in pairs])
+        phase("history", [lambda: client.get("/api/history/")] * 10)
+        phase("history_summary", [lambda: client.get("/api/history/?summary=true")] * 10)
+
+        for clients in concurrency:
+            results["throughput"].append(
+                measure_throughput(user, clients, requests_per_client, resume_ids, job_descriptions, collector)
+            )
+            last = results["throughput"][-1]
+            log(f"analyze with {clients} client(s): {last['requests_per_second']} req/s")
+
+        results["memory"]["max_rss_kb"] = max_rss_kb()
+        if trace_memory:
+            results["memory"]["python_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        return results
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        timing_logger.removeHandler(collector)
+        timing_logger.propagate = propagate
+        timing_logger.setLevel(level)
+
+
+def measure_throughput(user, clients, requests_per_client, resume_ids, job_descriptions, collector):
+    """
+    Runs `clients` concurrent clients for `user`, each sending requests_per_client analyses
+    of job descriptions nobody analyzed yet (so every request reaches the LLM).
+    """
+    stats = EndpointStats()
+    lock = threading.Lock()
+
+    def client_loop(index):
+        api_client = authenticated_client(user)
+        try:
+            for n in range(requests_per_client):
+                jd_text = f"{job_descriptions[n % len(job_descriptions)]}\nReference {clients}-{index}-{n}"
+                resume_id = resume_ids[(index + n) % len(resume_ids)]
+                response, seconds, _ = timed(
+                    lambda: api_client.post(
+                        "/api/analyze/", {"resume_id": resume_id, "jd_text": jd_text, "mode": "full"},
+                        content_type="application/json",
+                    ),
+                    capture_queries=False,
+                )
+                with lock:
+                    stats.record(response, seconds)
+        finally:
+            if clients > 1:
+                connection.close()
+
+    collector.take()
+    started = time.perf_counter()
+    if clients == 1:
+        client_loop(0)
+    else:
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            list(pool.map(client_loop, range(clients)))
+    elapsed = time.perf_counter() - started
+    stats.add_timings(collector.take())
+
+    summary = stats.as_dict()
+    return {
+        "clients": clients,
+        "requests": len(stats.latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(stats.latencies) / elapsed, 2) if elapsed else None,
+        **summary,
+    }
+
+
+def environment_info(options):
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "options": options,
+    }
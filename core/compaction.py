@@ -0,0 +1,105 @@
+import logging
+import re
+
+# Shrinks resume and job description text before it is pasted into the LLM prompt:
+# normalizes whitespace, removes boilerplate and repeated lines, and trims to a token budget.
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for English text with LLaMA-style tokenizers.
+CHARS_PER_TOKEN = 4
+
+# Section headings whose content rarely helps the analysis. A dropped section
+# runs until the next line that looks like any known heading.
+LOW_VALUE_HEADINGS = {
+    "references", "referees", "declaration", "hobbies", "interests", "hobbies and interests",
+    "personal details", "personal information", "personal profile",
+    "equal opportunity", "equal employment opportunity", "eeo statement", "about us", "about the company",
+}
+KNOWN_HEADINGS = LOW_VALUE_HEADINGS | {
+    "summary", "profile", "objective", "career objective", "professional summary", "experience",
+    "work experience", "professional experience", "employment history", "education", "skills",
+    "technical skills", "key skills", "projects", "certifications", "achievements", "awards",
+    "publications", "languages", "responsibilities", "requirements", "qualifications",
+    "preferred qualifications", "what you'll do", "what we're looking for", "benefits", "perks",
+}
+
+# Individual lines that are boilerplate wherever they appear.
+BOILERPLATE_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r"equal (employment )?opportunity",
+        r"without regard to (race|color|religion|sex|gender|age|national origin)",
+        r"reasonable accommodation",
+        r"references (are )?available (up)?on request",
+        r"^\s*(address|addr\.?)\s*[:\-]",
+        r"^\s*(phone|mobile|tel|email|e-mail)\s*[:\-]",
+        r"i hereby declare",
+    )
+]
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize_heading(line):
+    return re.sub(r"[^a-z' ]", "", line.lower()).strip()
+
+
+def is_heading(line):
+    return len(line.split()) <= 5 and normalize_heading(line) in KNOWN_HEADINGS
+
+
+def compact_lines(text):
+    """
+    Yields the lines worth keeping: whitespace collapsed, blank lines and repeats
+    (page headers/footers) removed, boilerplate lines and low-value sections dropped.
+    """
+    seen = set()
+    skipping = False
+    for raw_line in text.splitlines():
+        line = " ".join(raw_line.split())
+        if not line:
+            continue
+
+        if is_heading(line):
+            skipping = normalize_heading(line) in LOW_VALUE_HEADINGS
+            if skipping:
+                continue
+        elif skipping:
+            continue
+
+        if any(pattern.search(line) for pattern in BOILERPLATE_PATTERNS):
+            continue
+
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        yield line
+
+
+def compact(text, token_budget, label="text"):
+    """
+    Returns `text` compacted for the prompt and trimmed, at a line boundary where
+    possible, to at most `token_budget` tokens. Logs token counts before and after.
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    kept = []
+    size = 0
+    for line in compact_lines(text):
+        if size + len(line) + 1 > max_chars:
+            remaining = max_chars - size
+            # Keep part of an over-long first line rather than returning nothing.
+            if not kept and remaining > 0:
+                kept.append(line[:remaining])
+            break
+        kept.append(line)
+        size += len(line) + 1
+
+    compacted = "\n".join(kept)
+    logger.info(
+        "Prompt compaction for %s: %d -> %d tokens (budget %d)",
+        label, estimate_tokens(text), estimate_tokens(compacted), token_budget,
+    )
+    return compacted
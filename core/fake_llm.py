@@ -0,0 +1,152 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A stand-in for the Groq chat completions API, for tests and local load testing.
+# Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port> and no real quota is used.
+
+DEFAULT_ANALYSIS = {
+    "suitability_score": 72,
+    "matching_skills": ["Python", "Django"],
+    "missing_skills": ["Kubernetes"],
+    "suggested_title": "Backend Developer",
+    "tailored_suggestions": "Quantify the impact of your recent projects.",
+}
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server.requests.append(body)
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        # Fail the first `fail_first` requests, then a random `error_rate` share of the rest.
+        if len(server.requests) <= server.fail_first or server.random.random() < server.error_rate:
+            headers = {"Retry-After": str(server.retry_after)} if server.retry_after is not None else None
+            self.send_json(server.error_status, {"error": {"message": "fake provider error"}}, headers)
+            return
+
+        content = json.dumps(server.analysis)
+        if body.get("stream"):
+            self.send_stream(body, content)
+            return
+
+        prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+        payload = {
+            "id": f"chatcmpl-fake-{len(server.requests)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            # Whitespace-separated word counts are close enough to tokens for a fake.
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(content.split()),
+                "total_tokens": len(prompt.split()) + len(content.split()),
+            },
+        }
+        self.send_json(200, payload)
+
+    def send_stream(self, body, content, chunk_size=16):
+        # OpenAI-style streaming: one SSE "data:" line per chunk, then [DONE].
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for start in range(0, len(content), chunk_size):
+            chunk = {
+                "id": "chatcmpl-fake-stream",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {"index": 0, "delta": {"content": content[start:start + chunk_size]}, "finish_reason": None}
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+        # Like Groq, report token usage on a final chunk under "x_groq".
+        prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+        usage_chunk = {
+            "id": "chatcmpl-fake-stream",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "x_groq": {"usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(content.split()),
+                "total_tokens": len(prompt.split()) + len(content.split()),
+            }},
+        }
+        self.wfile.write(f"data: {json.dumps(usage_chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep test and benchmark output quiet.
+        pass
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    A threaded fake Groq server. Use as a context manager; `url` is the base URL to give the client.
+
+    Errors can be injected deterministically (`fail_first`) or randomly (`error_rate`,
+    seeded by `seed`), answered with `error_status` and an optional Retry-After header.
+    Streaming requests are answered in small chunks, `chunk_delay` seconds apart.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, analysis=None,
+                 fail_first=0, error_rate=0.0, error_status=503, retry_after=None, seed=None, chunk_delay=0.0):
+        super().__init__((host, port), FakeLLMHandler)
+        self.latency = latency
+        self.analysis = analysis or DEFAULT_ANALYSIS
+        self.fail_first = fail_first
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.chunk_delay = chunk_delay
+        self.requests = []
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,619 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+from groq import AsyncGroq, Groq
+
+from .fake_llm import DEFAULT_ANALYSIS
+
+# Pluggable LLM backends, and a router that spreads calls over them.
+# A backend is one model at one provider behind a small interface: complete(prompt),
+# acomplete(prompt) and astream(prompt). LLMRouter ranks the configured backends by
+# the latency and error rate it has observed, sends a hedged second request when the
+# first has not answered within its usual (p95) latency, keeps the first reply and
+# drops the other. Every backend type can be run offline: Groq and OpenAI-compatible
+# backends against core/fake_llm.py's server, and FakeBackend entirely in process.
+# Like scoring.py, this module does not import Django; services.py builds the router
+# from settings.LLM_BACKENDS.
+
+# One model reply: the text, the provider's token usage (an SDK object or a dict),
+# and the name of the backend that produced it.
+LLMReply = namedtuple("LLMReply", "content usage backend")
+
+
+class BackendError(Exception):
+    """
+    A backend call failed. `response` is the HTTP response, if there was one (for Retry-After).
+    """
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class TransientBackendError(BackendError):
+    """
+    A failure worth retrying or routing around: network errors, timeouts, 429s and 5xx responses.
+    """
+
+
+class BackendStats:
+    """
+    Latencies of the last `window` successful calls of a backend, and the outcomes of its last `window` calls.
+    """
+
+    def __init__(self, window=200):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self.lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(seconds)
+
+    def calls(self):
+        return len(self.outcomes)
+
+    def percentile(self, p):
+        """
+        Returns the p-th percentile of the recorded latencies, or None before the first success.
+        """
+        with self.lock:
+            values = sorted(self.latencies)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+    def error_rate(self):
+        with self.lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class LLMBackend:
+    """
+    One model at one provider. Subclasses implement complete, acomplete and astream.
+    """
+    # Whether the backend talks to the network (and so takes timeout and connection limits).
+    remote = True
+
+    def __init__(self, name, model, temperature=0.3):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.stats = BackendStats()
+
+    def request(self, prompt, **extra):
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            **extra,
+        }
+
+    def complete(self, prompt):
+        """
+        Returns the LLMReply for one prompt.
+        """
+        raise NotImplementedError
+
+    async def acomplete(self, prompt):
+        raise NotImplementedError
+
+    async def astream(self, prompt):
+        """
+        Opens a streaming completion and returns an async iterator of (text delta, usage) pairs;
+        usage is None except on the chunk that reports it.
+        """
+        raise NotImplementedError
+
+    async def aclose(self):
+        """
+        Closes the connections this backend opened on the running event loop.
+        """
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name} ({self.model})>"
+
+
+class GroqBackend(LLMBackend):
+    """
+    A model served by Groq, or by anything that speaks its API (such as core/fake_llm.py).
+    Errors are the Groq SDK's own (groq.APIConnectionError, groq.RateLimitError, ...).
+    """
+
+    def __init__(self, name, model, api_key=None, base_url=None, timeout=60, max_connections=32, temperature=0.3):
+        super().__init__(name, model, temperature)
+        self.client_options = {
+            "api_key": api_key or os.getenv("GROQ_API_KEY"),
+            "base_url": base_url or None,
+            "timeout": timeout,
+            "max_retries": 0,
+        }
+        self.max_connections = max_connections
+        self.client = Groq(**self.client_options)
+        # httpx clients belong to the event loop that created them, so keep one per loop.
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            client = self._async_clients[loop] = AsyncGroq(
+                **self.client_options, http_client=httpx.AsyncClient(limits=limits)
+            )
+        return client
+
+    def complete(self, prompt):
+        response = self.client.chat.completions.create(**self.request(prompt))
+        return LLMReply(response.choices[0].message.content, response.usage, self.name)
+
+    async def acomplete(self, prompt):
+        response = await self.async_client().chat.completions.create(**self.request(prompt))
+        return LLMReply(response.choices[0].message.content, response.usage, self.name)
+
+    async def astream(self, prompt):
+        stream = await self.async_client().chat.completions.create(**self.request(prompt, stream=True))
+        return self.chunks(stream)
+
+    async def chunks(self, stream):
+        async for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            # Groq reports token usage on the last chunk, under x_groq.
+            usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+            yield text, usage
+
+    async def aclose(self):
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    A model behind any OpenAI-style /chat/completions endpoint (OpenAI, Together, vLLM, Ollama, ...).
+    `base_url` is the API root, e.g. "https://api.openai.com/v1".
+    """
+
+    def __init__(self, name, model, base_url, api_key=None, timeout=60, max_connections=32, temperature=0.3):
+        super().__init__(name, model, temperature)
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = httpx.Client(timeout=timeout, limits=self.limits)
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return client
+
+    def check(self, response):
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientBackendError(f"{self.name} answered HTTP {response.status_code}", response)
+        if response.status_code >= 400:
+            raise BackendError(f"{self.name} answered HTTP {response.status_code}", response)
+        return response
+
+    def reply(self, data):
+        return LLMReply(data["choices"][0]["message"]["content"], data.get("usage"), self.name)
+
+    def complete(self, prompt):
+        try:
+            response = self.client.post(self.url, json=self.request(prompt), headers=self.headers)
+        except httpx.TransportError as e:
+            raise TransientBackendError(f"{self.name}: {e}") from e
+        return self.reply(self.check(response).json())
+
+    async def acomplete(self, prompt):
+        try:
+            response = await self.async_client().post(self.url, json=self.request(prompt), headers=self.headers)
+        except httpx.TransportError as e:
+            raise TransientBackendError(f"{self.name}: {e}") from e
+        return self.reply(self.check(response).json())
+
+    async def astream(self, prompt):
+        client = self.async_client()
+        request = client.build_request("POST", self.url, json=self.request(prompt, stream=True), headers=self.headers)
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TransportError as e:
+            raise TransientBackendError(f"{self.name}: {e}") from e
+        if response.status_code >= 400:
+            await response.aclose()
+            self.check(response)
+        return self.chunks(response)
+
+    async def chunks(self, response):
+        # Server-Sent Events: one "data:" line per chunk, then "data: [DONE]".
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                choices = chunk.get("choices") or []
+                text = (choices[0].get("delta") or {}).get("content") if choices else None
+                yield text, chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+        except httpx.TransportError as e:
+            raise TransientBackendError(f"{self.name}: {e}") from e
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class FakeBackend(LLMBackend):
+    """
+    An in-process stand-in for a backend, for tests and offline development. Answers with
+    `analysis` as JSON after `latency` seconds (plus up to `jitter` more) and fails a random
+    `error_rate` share of calls with TransientBackendError. Counts its calls, and the async
+    calls that were cancelled (e.g. losing a hedge) before they finished.
+    """
+    remote = False
+
+    def __init__(self, name="fake", model="fake", latency=0.0, jitter=0.0, error_rate=0.0, analysis=None,
+                 seed=None, temperature=0.3):
+        super().__init__(name, model, temperature)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.analysis = analysis or DEFAULT_ANALYSIS
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.cancelled = 0
+
+    def draw(self):
+        # Returns (delay, fail) for the next call.
+        with self.lock:
+            self.calls += 1
+            return self.latency + self.random.random() * self.jitter, self.random.random() < self.error_rate
+
+    def reply(self, prompt, fail):
+        if fail:
+            raise TransientBackendError(f"{self.name}: injected failure")
+        content = json.dumps(self.analysis)
+        # Whitespace-separated word counts are close enough to tokens for a fake.
+        prompt_tokens, completion_tokens = len(prompt.split()), len(content.split())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return LLMReply(content, usage, self.name)
+
+    def complete(self, prompt):
+        delay, fail = self.draw()
+        time.sleep(delay)
+        return self.reply(prompt, fail)
+
+    async def acomplete(self, prompt):
+        delay, fail = self.draw()
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            with self.lock:
+                self.cancelled += 1
+            raise
+        return self.reply(prompt, fail)
+
+    async def astream(self, prompt):
+        delay, fail = self.draw()
+        await asyncio.sleep(delay)
+        return self.chunks(self.reply(prompt, fail))
+
+    async def chunks(self, reply, chunk_size=16):
+        for start in range(0, len(reply.content), chunk_size):
+            yield reply.content[start:start + chunk_size], None
+        yield None, reply.usage
+
+
+BACKEND_TYPES = {
+    "groq": GroqBackend,
+    "openai": OpenAICompatibleBackend,
+    "fake": FakeBackend,
+}
+
+
+def build_backend(config, **remote_defaults):
+    """
+    Builds a backend from one settings.LLM_BACKENDS entry: "type" picks the class, "api_key_env"
+    names the environment variable holding its API key, and the remaining keys are passed to
+    the class. `remote_defaults` (timeout, max_connections) apply to backends that use the network.
+    """
+    options = dict(config)
+    backend_type = BACKEND_TYPES[options.pop("type", "groq")]
+    api_key_env = options.pop("api_key_env", None)
+    if api_key_env:
+        options["api_key"] = os.getenv(api_key_env)
+    options.setdefault("name", options.get("model", backend_type.__name__))
+    if backend_type.remote:
+        options = {**remote_defaults, **options}
+    return backend_type(**options)
+
+
+class LLMRouter:
+    """
+    Sends each call to the backend expected to answer fastest, and hedges slow calls.
+
+    Backends are ranked by their median latency divided by their success rate over recent
+    calls. Backends with fewer than `min_samples` calls come first (in configured order), so
+    each one gets measured. If the chosen backend has not answered after its
+    `hedge_percentile` latency (at least `hedge_min_delay` seconds; `hedge_default_delay`
+    until it has `min_samples` successes), one hedged request goes to the next-ranked backend.
+    A hedge never goes back to the same backend, so with a single backend nothing is hedged.
+    The first reply wins. In the async path the other request is cancelled; in the sync path
+    a request already running in a thread cannot be interrupted, so it finishes in the
+    background. Either way its tokens are billed: every reply that completes is passed to
+    `on_reply`, the loser's too, possibly after the call has returned. A backend that fails
+    is routed around at once. Once every backend has failed, the last error is raised.
+    hedge_percentile=0 (the default) turns hedging off.
+
+    `on_event(event, backend, seconds)` is called with "ok" or "error" after each backend
+    call, "hedge" when a hedged request is sent and "hedge_won" when one beats the original.
+    """
+
+    def __init__(self, backends, hedge_percentile=0, hedge_min_delay=0.5, hedge_default_delay=5.0,
+                 min_samples=20, max_workers=32, on_event=None):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend.")
+        self.backends = list(backends)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self.on_event = on_event
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def model_key(self):
+        """
+        Identifies the models that may answer a call, for analysis cache keys.
+        """
+        return "+".join(sorted({backend.model for backend in self.backends}))
+
+    def expected_seconds(self, backend):
+        if backend.stats.calls() < self.min_samples:
+            return 0.0
+        median = backend.stats.percentile(50)
+        if median is None:
+            return float("inf")
+        return median / max(0.05, 1 - backend.stats.error_rate())
+
+    def ranked(self):
+        """
+        Returns the backends, the one expected to answer fastest first.
+        """
+        order = {id(backend): i for i, backend in enumerate(self.backends)}
+        return sorted(self.backends, key=lambda backend: (self.expected_seconds(backend), order[id(backend)]))
+
+    def hedge_delay(self, backend):
+        """
+        Seconds to wait for `backend` before sending a hedged request, or None when hedging is off
+        (or there is no other backend to hedge to).
+        """
+        if not self.hedge_percentile or len(self.backends) < 2:
+            return None
+        if len(backend.stats.latencies) < self.min_samples:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, backend.stats.percentile(self.hedge_percentile))
+
+    def event(self, event, backend, seconds=None):
+        if self.on_event:
+            self.on_event(event, backend.name, seconds)
+
+    def call(self, backend, prompt):
+        started = time.perf_counter()
+        try:
+            reply = backend.complete(prompt)
+        except Exception:
+            self.record(backend, time.perf_counter() - started, ok=False)
+            raise
+        self.record(backend, time.perf_counter() - started, ok=True)
+        return reply
+
+    async def acall(self, backend, prompt):
+        started = time.perf_counter()
+        try:
+            reply = await backend.acomplete(prompt)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.record(backend, time.perf_counter() - started, ok=False)
+            raise
+        self.record(backend, time.perf_counter() - started, ok=True)
+        return reply
+
+    def record(self, backend, seconds, ok):
+        backend.stats.record(seconds, ok)
+        self.event("ok" if ok else "error", backend, seconds)
+
+    @property
+    def executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+            return self._executor
+
+    def complete(self, prompt, on_reply=None):
+        """
+        Returns the first LLMReply any backend produces for the prompt.
+        `on_reply` is called with every reply that completes (see the class docstring).
+        """
+        on_reply = on_reply or (lambda reply: None)
+        ranked = self.ranked()
+        if self.hedge_delay(ranked[0]) is None:
+            # Without hedging there is nothing to race: try the backends in turn, in this thread.
+            for backend in ranked:
+                try:
+                    reply = self.call(backend, prompt)
+                except Exception as e:
+                    error = e
+                    continue
+                on_reply(reply)
+                return reply
+            raise error
+
+        runs = Race(self, ranked)
+        in_flight = {}
+
+        def launch(backend, hedge=False):
+            in_flight[self.executor.submit(self.call, backend, prompt)] = (backend, hedge)
+            runs.launched(backend, hedge)
+
+        launch(runs.next_backend())
+        while in_flight:
+            done, _ = wait(in_flight, timeout=runs.wait_time(), return_when=FIRST_COMPLETED)
+            if not done:
+                launch(runs.hedge_backend(), hedge=True)
+                continue
+            for future in done:
+                backend, hedge = in_flight.pop(future)
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    runs.error = e
+                    if runs.remaining:
+                        launch(runs.next_backend())
+                    continue
+                on_reply(reply)
+                for other in in_flight:
+                    # Not started yet: dropped. Already running: it cannot be stopped, so its reply
+                    # is still passed to on_reply when it arrives (from the executor thread).
+                    if not other.cancel():
+                        other.add_done_callback(lambda future: future.exception() or on_reply(future.result()))
+                runs.won(backend, hedge)
+                return reply
+        raise runs.error
+
+    async def acomplete(self, prompt, on_reply=None):
+        """
+        Async version of complete; the losing request is cancelled.
+        """
+        on_reply = on_reply or (lambda reply: None)
+        ranked = self.ranked()
+        if self.hedge_delay(ranked[0]) is None:
+            for backend in ranked:
+                try:
+                    reply = await self.acall(backend, prompt)
+                except Exception as e:
+                    error = e
+                    continue
+                on_reply(reply)
+                return reply
+            raise error
+
+        runs = Race(self, ranked)
+        in_flight = {}
+
+        def launch(backend, hedge=False):
+            in_flight[asyncio.ensure_future(self.acall(backend, prompt))] = (backend, hedge)
+            runs.launched(backend, hedge)
+
+        launch(runs.next_backend())
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, timeout=runs.wait_time(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch(runs.hedge_backend(), hedge=True)
+                    continue
+                winner = None
+                for task in done:
+                    backend, hedge = in_flight.pop(task)
+                    if task.exception() is not None:
+                        runs.error = task.exception()
+                        if runs.remaining:
+                            launch(runs.next_backend())
+                        continue
+                    # Both requests may finish in the same step; each reply was billed.
+                    on_reply(task.result())
+                    if winner is None:
+                        winner = task
+                        runs.won(backend, hedge)
+                if winner is not None:
+                    return winner.result()
+            raise runs.error
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def astream(self, prompt):
+        """
+        Opens a stream on the best-ranked backend that accepts it; returns (backend, chunk iterator).
+        Streams are not hedged: the reply is relayed as it is written, so there is no second one to race.
+        """
+        for backend in self.ranked():
+            try:
+                return backend, await backend.astream(prompt)
+            except Exception as e:
+                backend.stats.record(0.0, ok=False)
+                self.event("error", backend)
+                error = e
+        raise error
+
+    async def aclose(self):
+        for backend in self.backends:
+            await backend.aclose()
+
+
+class Race:
+    """
+    Bookkeeping for one hedged call in LLMRouter: which backends are left to try,
+    when the hedge is due, and the last error seen.
+    """
+
+    def __init__(self, router, ranked):
+        self.router = router
+        self.remaining = list(ranked)
+        self.primary = ranked[0]
+        self.hedged = False
+        self.hedge_at = None
+        self.error = None
+
+    def next_backend(self):
+        return self.remaining.pop(0)
+
+    def hedge_backend(self):
+        # Always a different backend than the one being waited on.
+        return self.remaining.pop(0)
+
+    def launched(self, backend, hedge):
+        if hedge:
+            self.hedged = True
+            self.router.event("hedge", backend)
+        else:
+            # A failover restarts the hedge timer, for the backend now being waited on.
+            self.primary = backend
+            self.hedge_at = time.monotonic() + self.router.hedge_delay(backend)
+
+    def wait_time(self):
+        # After one hedge, or with no other backend left to hedge to, just wait for the first reply.
+        if self.hedged or not self.remaining:
+            return None
+        return max(0.0, self.hedge_at - time.monotonic())
+
+    def won(self, backend, hedge):
+        if hedge:
+            self.router.event("hedge_won", backend)
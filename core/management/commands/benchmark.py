@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core import benchmarks, services
+from core.fake_llm import FakeLLMServer
+
+
+# Benchmarks upload, analyze and history end to end against a throwaway test database
+# and a local fake Groq server, then writes the results as JSON so runs can be compared:
+#   python manage.py benchmark --output bench.json --concurrency 1,4,16 --llm-latency 0.3
+class Command(BaseCommand):
+    help = "Runs the upload/analyze/history benchmark against a fake LLM and writes the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="File to write the JSON results to (default: stdout).")
+        parser.add_argument('--seed', type=int, default=1, help="Seed for the corpus and the fake LLM's errors.")
+        parser.add_argument('--resumes', type=int, default=12, help="Number of generated resumes.")
+        parser.add_argument('--max-pages', type=int, default=4, help="Resumes have 1 to this many pages.")
+        parser.add_argument('--job-descriptions', type=int, default=12, help="Number of generated job descriptions.")
+        parser.add_argument('--concurrency', default='1,4,16',
+                            help="Comma-separated numbers of concurrent clients for the throughput runs.")
+        parser.add_argument('--requests-per-client', type=int, default=10,
+                            help="Analyze requests each client sends in a throughput run.")
+        parser.add_argument('--llm-latency', type=float, default=0.05, help="Seconds the fake LLM takes per call.")
+        parser.add_argument('--llm-error-rate', type=float, default=0.0,
+                            help="Fraction of fake LLM calls answered with a 503.")
+        parser.add_argument('--trace-memory', action='store_true',
+                            help="Also report peak Python allocations (tracemalloc; slows the run down).")
+
+    def handle(self, *args, **options):
+        try:
+            concurrency = [int(n) for n in options['concurrency'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers.")
+        if not concurrency or min(concurrency) < 1:
+            raise CommandError("--concurrency needs at least one positive number.")
+
+        resumes, job_descriptions = benchmarks.generate_corpus(
+            options['seed'], options['resumes'], options['max_pages'], options['job_descriptions']
+        )
+        params = {key: options[key] for key in (
+            'seed', 'resumes', 'max_pages', 'job_descriptions', 'requests_per_client',
+            'llm_latency', 'llm_error_rate', 'trace_memory',
+        )}
+        params['concurrency'] = concurrency
+        report = {'meta': benchmarks.environment_info(params)}
+
+        work_dir = tempfile.mkdtemp(prefix='resume-benchmark-')
+        # SQLite's default in-memory test database does not hold up under concurrent clients,
+        # and its deferred transactions fail instead of waiting when two of them start writing.
+        database = settings.DATABASES['default']
+        if connection.vendor == 'sqlite':
+            test_settings = database.setdefault('TEST', {})
+            test_settings['NAME'] = test_settings.get('NAME') or os.path.join(work_dir, 'benchmark.sqlite3')
+            database.setdefault('OPTIONS', {}).update(transaction_mode='IMMEDIATE', timeout=30)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Errors injected into the fake LLM are expected; keep them out of the output.
+        core_logger = logging.getLogger('core')
+        log_level = core_logger.level
+        if options['verbosity'] < 2:
+            core_logger.setLevel(logging.CRITICAL)
+
+        try:
+            with FakeLLMServer(latency=options['llm_latency'], error_rate=options['llm_error_rate'],
+                               seed=options['seed']) as server, override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                MEDIA_ROOT=os.path.join(work_dir, 'media'),
+                VECTOR_INDEX_DIR=os.path.join(work_dir, 'vector_index'),
+                ANALYZE_RATE_PER_MINUTE=10 ** 9, ANALYZE_BURST=10 ** 9,
+                ANALYZE_GLOBAL_RATE_PER_MINUTE=10 ** 9, ANALYZE_GLOBAL_BURST=10 ** 9,
+                LLM_DAILY_TOKEN_LIMIT=0, LLM_DAILY_REQUEST_LIMIT=0,
+            ):
+                fake_router = services.build_llm_router([{
+                    'type': 'groq', 'name': 'fake-groq', 'model': services.MODEL_NAME,
+                    'base_url': server.url, 'api_key': 'benchmark',
+                }])
+                caches['analysis'].clear()
+                with mock.patch.object(services, 'llm_router', fake_router):
+                    report.update(benchmarks.run_benchmark(
+                        resumes, job_descriptions,
+                        requests_per_client=options['requests_per_client'],
+                        concurrency=concurrency,
+                        trace_memory=options['trace_memory'],
+                        log=self.stderr.write if options['verbosity'] else lambda message: None,
+                    ))
+                report['llm_calls'] = len(server.requests)
+        finally:
+            core_logger.setLevel(log_level)
+            caches['analysis'].clear()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(f"Wrote benchmark results to {options['output']}.")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core import services
+from core.models import JobDescription, Resume
+
+
+# Rebuilds the semantic matching indexes from the database.
+# Needed once for data stored before the index existed, after bumping
+# vector_index.EMBEDDING_VERSION, or to reclaim space left by deletions.
+class Command(BaseCommand):
+    help = "Rebuilds the resume and job description vector indexes from scratch."
+
+    def handle(self, *args, **options):
+        resumes = services.get_vector_index('resumes')
+        resumes.clear()
+        for resume in Resume.objects.select_related('blob').iterator():
+            services.index_resume(resume)
+        self.stdout.write(f"Indexed {len(resumes)} resume(s).")
+
+        job_descriptions = services.get_vector_index('job_descriptions')
+        job_descriptions.clear()
+        for job_description in JobDescription.objects.order_by('pk').iterator():
+            services.index_job_description(job_description)
+        self.stdout.write(f"Indexed {len(job_descriptions)} job description(s).")
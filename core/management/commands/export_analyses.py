@@ -0,0 +1,119 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from core.models import Analysis
+from core.services import parse_since
+
+# Columns of every exported row; "result" is the full analysis JSON.
+COLUMNS = (
+    'id', 'user_id', 'username', 'resume_id', 'job_description_id', 'analyzed_at',
+    'suitability_score', 'suggested_title', 'cache_key', 'result',
+)
+
+
+# Streams analysis results out as JSON Lines or Parquet, without loading the table into memory:
+#   python manage.py export_analyses --output analyses.parquet --since 2025-01-01
+# Rows are read with a server-side cursor (QuerySet.iterator) and written batch by batch.
+class Command(BaseCommand):
+    help = "Exports analyses as JSON Lines (.jsonl) or Parquet (.parquet), streaming them in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-',
+                            help="Output file; its extension picks the format. Default: JSON Lines on stdout.")
+        parser.add_argument('--format', choices=('jsonl', 'parquet'),
+                            help="Overrides the format implied by --output.")
+        parser.add_argument('--user', help="Only export this username's analyses.")
+        parser.add_argument('--since', help="Only export analyses made on or after this date or datetime (ISO 8601).")
+        parser.add_argument('--include-jd-text', action='store_true',
+                            help="Add the job description text as a jd_text column.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows fetched and written at a time.")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or ('parquet' if output.endswith('.parquet') else 'jsonl')
+        if fmt == 'parquet' and output == '-':
+            raise CommandError("Parquet output needs a file name (--output results.parquet).")
+
+        analyses = Analysis.objects.order_by('pk')
+        if options['user']:
+            analyses = analyses.filter(user__username=options['user'])
+        if options['since']:
+            since = parse_since(options['since'])
+            if since is None:
+                raise CommandError("--since must be an ISO 8601 date or datetime.")
+            analyses = analyses.filter(analyzed_at__gte=since)
+
+        columns = list(COLUMNS)
+        if options['include_jd_text']:
+            columns.append('jd_text')
+            analyses = analyses.annotate(jd_text=F('job_description__text'))
+        rows = analyses.annotate(username=F('user__username')).values(
+            'id', 'user_id', 'username', 'resume_id', 'job_description_id', 'analyzed_at',
+            'suitability_score', 'suggested_title', 'cache_key', 'result',
+            *(['jd_text'] if options['include_jd_text'] else []),
+        ).iterator(chunk_size=options['batch_size'])
+
+        write = self.write_parquet if fmt == 'parquet' else self.write_jsonl
+        count = write(output, (self.flatten(row) for row in rows), columns, max(1, options['batch_size']))
+        if output != '-':
+            self.stdout.write(f"Exported {count} analyses to {output}.")
+
+    def flatten(self, row):
+        row['analyzed_at'] = row['analyzed_at'].isoformat()
+        row['result'] = json.dumps(row['result'] or {})
+        return row
+
+    def write_jsonl(self, output, rows, columns, batch_size):
+        f = sys.stdout if output == '-' else open(output, 'w', encoding='utf-8')
+        count = 0
+        try:
+            for row in rows:
+                f.write(json.dumps({column: row[column] for column in columns}) + '\n')
+                count += 1
+        finally:
+            if f is not sys.stdout:
+                f.close()
+        return count
+
+    def write_parquet(self, output, rows, columns, batch_size):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise CommandError("Parquet export needs pyarrow (pip install pyarrow).")
+
+        types = {
+            'id': pa.int64(), 'user_id': pa.int64(), 'resume_id': pa.int64(), 'job_description_id': pa.int64(),
+            'suitability_score': pa.int64(), 'analyzed_at': pa.string(),
+        }
+        schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+        count = 0
+        with pq.ParquetWriter(output, schema) as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    writer.write_batch(self.record_batch(pa, schema, batch))
+                    count += len(batch)
+                    batch = []
+            if batch or not count:
+                writer.write_batch(self.record_batch(pa, schema, batch))
+                count += len(batch)
+        return count
+
+    def record_batch(self, pa, schema, batch):
+        return pa.RecordBatch.from_pydict(
+            {field.name: [self.coerce(row[field.name], field.type, pa) for row in batch] for field in schema},
+            schema=schema,
+        )
+
+    def coerce(self, value, type_, pa):
+        # Scores come from the typed column already; this keeps any stray value from breaking the writer.
+        if value is None or not pa.types.is_integer(type_):
+            return value if value is None or not pa.types.is_string(type_) else str(value)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
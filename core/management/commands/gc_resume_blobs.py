@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, ProtectedError
+from django.utils import timezone
+
+from core.models import Resume, ResumeBlob, ResumeUpload
+from core.uploads import discard_upload
+
+
+# Garbage-collects resume blobs that no Resume references any more.
+# Run it periodically, e.g. from cron: python manage.py gc_resume_blobs
+class Command(BaseCommand):
+    help = "Deletes stored resume blobs (rows and files) that no resume references, and abandoned chunked uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=3600,
+                            help="Only collect blobs older than this many seconds, so in-flight uploads are safe.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would be deleted without deleting anything.")
+
+    def handle(self, *args, **options):
+        # Repair any drift in the stored counts from the real number of referencing resumes.
+        drifted = ResumeBlob.objects.annotate(refs=Count('resumes')).exclude(ref_count=F('refs'))
+        for blob in drifted:
+            self.stdout.write(f"Fixing ref_count of blob {blob.sha256[:12]}: {blob.ref_count} -> {blob.refs}")
+            if not options['dry_run']:
+                ResumeBlob.objects.filter(pk=blob.pk).update(ref_count=blob.refs)
+
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        orphans = ResumeBlob.objects.filter(created_at__lt=cutoff).annotate(refs=Count('resumes')).filter(refs=0)
+
+        deleted = 0
+        freed = 0
+        for blob in orphans:
+            deleted += 1
+            freed += blob.size
+            if options['dry_run']:
+                continue
+            name = blob.file.name
+            # Re-checked under the row lock that services.add_blob_reference takes before attaching
+            # a resume, so a blob cannot gain a reference between the check and the delete.
+            with transaction.atomic():
+                locked = ResumeBlob.objects.select_for_update().filter(pk=blob.pk, ref_count__lte=0).first()
+                removed = 0
+                if locked is not None and not Resume.objects.filter(blob=locked).exists():
+                    try:
+                        removed, _ = ResumeBlob.objects.filter(pk=blob.pk).delete()
+                    except ProtectedError:
+                        removed = 0
+            if not removed:
+                deleted -= 1
+                freed -= blob.size
+                continue
+            # Blobs adopted from pre-dedup uploads may share their file with a legacy resume row.
+            if not Resume.objects.filter(file=name).exists():
+                default_storage.delete(name)
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(f"{verb} {deleted} orphaned blob(s), {freed} bytes.")
+
+        # Chunked uploads the client gave up on.
+        expired = ResumeUpload.objects.filter(
+            updated_at__lt=timezone.now() - timedelta(seconds=settings.RESUME_UPLOAD_EXPIRY)
+        )
+        abandoned = 0
+        for upload in expired:
+            abandoned += 1
+            if not options['dry_run']:
+                discard_upload(upload)
+        self.stdout.write(f"{verb} {abandoned} abandoned chunked upload(s).")
@@ -0,0 +1,128 @@
+import hashlib
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import pdf_extraction, services
+from core.models import User
+from core.uploads import PDF_MAGIC
+
+
+# Bulk-loads historical resumes for one user from a directory (searched recursively)
+# or a .zip of PDFs, e.g. when onboarding a client:
+#   python manage.py import_resumes /data/resumes.zip --user acme --workers 8
+# Text is extracted in parallel worker processes and rows are written in batches,
+# so the files end up exactly as if each had been uploaded and pre-warmed.
+class Command(BaseCommand):
+    help = "Imports a directory or zip of PDF resumes for a user, extracting their text in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="A directory of PDFs, or a .zip file containing them.")
+        parser.add_argument('--user', required=True, help="Username of the account that will own the resumes.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Processes used for text extraction (0 = extract in this process).")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Files read, extracted and written per batch.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}.")
+
+        source = options['source']
+        if os.path.isdir(source):
+            archive = None
+            names = sorted(
+                os.path.join(root, name)
+                for root, _, files in os.walk(source)
+                for name in files if name.lower().endswith('.pdf')
+            )
+        elif zipfile.is_zipfile(source):
+            archive = zipfile.ZipFile(source)
+            names = sorted(
+                info.filename for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith('.pdf')
+            )
+        else:
+            raise CommandError(f"{source} is neither a directory nor a zip file.")
+
+        extract = partial(
+            pdf_extraction.extract_text_from_bytes,
+            max_pages=settings.PDF_MAX_PAGES,
+            max_chars=settings.PDF_MAX_CHARS,
+            time_budget=settings.PDF_EXTRACT_TIME_BUDGET,
+        )
+        pool = None
+        if options['workers'] > 0:
+            pool = ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'))
+
+        totals = {'created': 0, 'duplicates': 0, 'rejected': 0, 'no_text': 0}
+        started = time.monotonic()
+        batch_size = max(1, options['batch_size'])
+        try:
+            for offset in range(0, len(names), batch_size):
+                files = []
+                for name in names[offset:offset + batch_size]:
+                    data = self.read(archive, name)
+                    if len(data) > settings.RESUME_MAX_UPLOAD_BYTES or not data.startswith(PDF_MAGIC):
+                        totals['rejected'] += 1
+                        self.stderr.write(f"Skipping {name}: not a PDF or larger than RESUME_MAX_UPLOAD_BYTES.")
+                        continue
+                    files.append((hashlib.sha256(data).hexdigest(), name, data))
+
+                texts = self.extract_all(pool, extract, [data for _, _, data in files])
+                batch = [(sha256, name, data, text) for (sha256, name, data), text in zip(files, texts)]
+                totals['no_text'] += sum(1 for *_, text in batch if not text)
+
+                created = services.bulk_store_resumes(user, batch)
+                totals['created'] += created
+                totals['duplicates'] += len(batch) - created
+
+                done = min(offset + batch_size, len(names))
+                rate = done / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f"{done}/{len(names)} files: {totals['created']} imported, {totals['duplicates']} duplicate, "
+                    f"{totals['rejected']} rejected ({rate:.1f} files/s)"
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+            if archive:
+                archive.close()
+
+        self.stdout.write(
+            f"Imported {totals['created']} resume(s) for {user.username}; {totals['duplicates']} duplicate(s), "
+            f"{totals['rejected']} rejected, {totals['no_text']} without extractable text."
+        )
+
+    def extract_all(self, pool, extract, datas):
+        """
+        Returns the text of each PDF, or None for files that could not be parsed
+        (they are stored anyway, like an upload whose extraction fails).
+        """
+        if pool:
+            futures = [pool.submit(extract, data) for data in datas]
+            results = (future.result for future in futures)
+        else:
+            results = (partial(extract, data) for data in datas)
+
+        texts = []
+        for result in results:
+            try:
+                texts.append(result())
+            except Exception:
+                texts.append(None)
+        return texts
+
+    def read(self, archive, name):
+        if archive:
+            return archive.read(name)
+        with open(name, 'rb') as f:
+            return f.read()
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.services import process_next_job, purge_analysis_requests, requeue_stale_jobs
+
+
+# Runs a pool of worker threads that drain the AnalysisJob queue.
+# Start it next to gunicorn: python manage.py run_analysis_worker --workers 4
+class Command(BaseCommand):
+    help = "Processes queued analysis jobs with a pool of background worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.ANALYSIS_WORKERS,
+                            help="Number of jobs to process concurrently.")
+        parser.add_argument('--poll-interval', type=float, default=settings.ANALYSIS_WORKER_POLL_INTERVAL,
+                            help="Seconds an idle worker waits before checking the queue again.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is empty instead of polling forever.")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs(settings.ANALYSIS_JOB_STALE_AFTER)
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+        purged = purge_analysis_requests()
+        if purged:
+            self.stdout.write(f"Purged {purged} finished analysis request record(s).")
+
+        workers = [
+            threading.Thread(target=self.work, args=(options['poll_interval'], options['once']), daemon=True)
+            for _ in range(max(1, options['workers']))
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} analysis worker(s).")
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping analysis workers.")
+
+    def work(self, poll_interval, once):
+        # Each thread gets its own database connection; drop it on exit so it isn't leaked.
+        try:
+            while True:
+                close_old_connections()
+                job = process_next_job()
+                if job is not None:
+                    self.stdout.write(f"Job {job.pk}: {job.status}")
+                    continue
+                if once:
+                    return
+                time.sleep(poll_interval)
+        finally:
+            connection.close()
@@ -0,0 +1,373 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Lightweight, dependency-free metrics for the analyze pipeline.
+# Counters and histograms live in process memory and are rendered in the Prometheus
+# text format by the /metrics view. With several worker processes, set METRICS_DIR:
+# each process then also writes its values there (at most once a second, when it
+# records something, and when it exits) and /metrics adds up those of live processes.
+# Stage timings are also collected per request and logged as one JSON line
+# (see RequestTimingMiddleware).
+
+logger = logging.getLogger("core.timing")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 20000, 50000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000)
+
+# How often a process rewrites its file in METRICS_DIR, at most.
+SNAPSHOT_INTERVAL = 1.0
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        REGISTRY[name] = self
+
+    def label_key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        snapshot_soon()
+
+
+class Histogram(Metric):
+    """
+    A histogram with fixed buckets; each label set stores [bucket counts..., count, sum].
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.label_key(labels)
+        with self.lock:
+            series = self.values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+        snapshot_soon()
+
+
+REGISTRY = {}
+
+STAGE_SECONDS = Histogram(
+    "analysis_stage_seconds", "Time spent in each stage of an analysis.", ["stage"]
+)
+ANALYSES = Counter(
+    "analysis_requests_total", "Analyses by mode and outcome.", ["mode", "outcome"]
+)
+SINGLE_FLIGHT = Counter(
+    "analysis_single_flight_total",
+    "Analyze requests that ran the analysis (led), waited for an identical one (coalesced) or were replayed.",
+    ["result"],
+)
+CACHE_LOOKUPS = Counter(
+    "analysis_cache_lookups_total", "Analysis result cache lookups.", ["result"]
+)
+LLM_CALLS = Counter(
+    "llm_calls_total", "LLM calls by outcome.", ["outcome"]
+)
+LLM_BACKEND_CALLS = Counter(
+    "llm_backend_calls_total", "Requests to each LLM backend by outcome, hedges included.", ["backend", "outcome"]
+)
+LLM_BACKEND_SECONDS = Histogram(
+    "llm_backend_seconds", "Latency of each LLM backend's successful requests.", ["backend"]
+)
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total", "Hedged LLM requests sent, and how many beat the original.", ["backend", "result"]
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "LLM tokens reported by the provider.", ["kind"]
+)
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Prompt size per LLM call, in provider tokens.", buckets=TOKEN_BUCKETS
+)
+PDF_PAGES = Histogram(
+    "pdf_pages_extracted", "Pages read per PDF extraction.", buckets=PAGE_BUCKETS
+)
+TEXT_CHARS = Histogram(
+    "analysis_text_chars", "Length of resume, job description and prompt text.", ["kind"], buckets=SIZE_BUCKETS
+)
+
+
+# -------------------------------
+# PER-REQUEST STAGE TIMINGS
+# -------------------------------
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+# Batch analyses add to one request's timings from several pool threads.
+_request_timings_lock = threading.Lock()
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        with _request_timings_lock:
+            timings[stage] = round(timings.get(stage, 0) + seconds, 4)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times the enclosed block as one stage of the current analysis.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def annotate(**fields):
+    """
+    Adds fields (mode, cache hit, token counts...) to the current request's timing log line.
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.setdefault("_fields", {}).update(fields)
+
+
+def log_request_timings(request, response, timings, total):
+    fields = timings.pop("_fields", {})
+    logger.info(json.dumps({
+        "event": "request_timings",
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "user": getattr(getattr(request, "user", None), "pk", None),
+        "total_seconds": round(total, 4),
+        "stages": timings,
+        **fields,
+    }, default=str))
+
+
+class RequestTimingMiddleware:
+    """
+    Collects the stage timings of each request and, if any stage ran, logs them as one JSON line.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request_timings.set({})
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            timings = _request_timings.get()
+        finally:
+            _request_timings.reset(token)
+        if timings:
+            log_request_timings(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        token = _request_timings.set({})
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            timings = _request_timings.get()
+        finally:
+            _request_timings.reset(token)
+        if timings:
+            log_request_timings(request, response, timings, time.perf_counter() - started)
+        return response
+
+
+# -------------------------------
+# MULTI-PROCESS SNAPSHOTS
+# -------------------------------
+_last_snapshot = 0.0
+_snapshot_lock = threading.Lock()
+# (timer, pid) of the pending deferred write; the pid check ignores a timer inherited over fork.
+_pending_flush = (None, None)
+_pending_flush_lock = threading.Lock()
+
+
+def snapshot():
+    values = {}
+    for name, metric in REGISTRY.items():
+        with metric.lock:
+            values[name] = [[list(key), list(value) if isinstance(value, list) else value]
+                            for key, value in metric.values.items()]
+    return values
+
+
+def write_snapshot(blocking=True):
+    """
+    Writes this process's values to METRICS_DIR/<pid>.json now.
+    """
+    global _last_snapshot
+    directory = getattr(settings, "METRICS_DIR", "")
+    if not directory or not _snapshot_lock.acquire(blocking=blocking):
+        return
+    try:
+        _last_snapshot = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot(), f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.warning("Could not write metrics snapshot: %s", e)
+    finally:
+        _snapshot_lock.release()
+
+
+def flush_pending():
+    global _pending_flush
+    with _pending_flush_lock:
+        _pending_flush = (None, None)
+    write_snapshot()
+
+
+def snapshot_soon():
+    """
+    Writes this process's values to METRICS_DIR, at most every SNAPSHOT_INTERVAL seconds.
+    Updates that arrive sooner are written by a timer at the end of the interval, so the
+    last ones before the process goes idle are not lost.
+    """
+    global _pending_flush
+    if not getattr(settings, "METRICS_DIR", ""):
+        return
+    wait = SNAPSHOT_INTERVAL - (time.monotonic() - _last_snapshot)
+    if wait <= 0:
+        write_snapshot(blocking=False)
+        return
+    with _pending_flush_lock:
+        timer, pid = _pending_flush
+        if timer is not None and pid == os.getpid():
+            return
+        timer = threading.Timer(wait, flush_pending)
+        timer.daemon = True
+        _pending_flush = (timer, os.getpid())
+    timer.start()
+
+
+# Whatever was recorded since the last write is flushed when the worker exits normally.
+atexit.register(write_snapshot)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        # PermissionError: the pid exists but belongs to someone else. OSError: unknown; keep the file.
+        return True
+    return True
+
+
+def merged_values():
+    """
+    Returns {metric name: {label key: value}} summed over the snapshots of every live
+    process, using this process's live values in place of its own file. Snapshots of
+    processes that are gone are deleted.
+    """
+    merged = {name: {} for name in REGISTRY}
+    sources = [snapshot()]
+    directory = getattr(settings, "METRICS_DIR", "")
+    if directory and os.path.isdir(directory):
+        own = f"{os.getpid()}.json"
+        for file_name in os.listdir(directory):
+            if not file_name.endswith(".json") or file_name == own:
+                continue
+            pid = file_name[:-len(".json")]
+            if pid.isdigit() and not process_alive(int(pid)):
+                # A worker that exited: its totals leave the sums (Prometheus reads that as a
+                # counter reset), and a new process reusing the pid starts from a clean file.
+                try:
+                    os.remove(os.path.join(directory, file_name))
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(os.path.join(directory, file_name)) as f:
+                    sources.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    for source in sources:
+        for name, series in source.items():
+            if name not in merged:
+                continue
+            for key, value in series:
+                key = tuple(key)
+                current = merged[name].get(key)
+                if current is None:
+                    merged[name][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    merged[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[name][key] = current + value
+    return merged
+
+
+# -------------------------------
+# PROMETHEUS TEXT FORMAT
+# -------------------------------
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for name, values in merged_values().items():
+        metric = REGISTRY[name]
+        lines.append(f"# HELP {name} {metric.help_text}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(values.items()):
+            if metric.kind == "counter":
+                lines.append(f"{name}{format_labels(metric.labelnames, key)} {value}")
+                continue
+            for bound, count in zip(metric.buckets, value):
+                lines.append(f"{name}_bucket{format_labels(metric.labelnames, key, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{format_labels(metric.labelnames, key, [('le', '+Inf')])} {value[-2]}")
+            lines.append(f"{name}_count{format_labels(metric.labelnames, key)} {value[-2]}")
+            lines.append(f"{name}_sum{format_labels(metric.labelnames, key)} {value[-1]}")
+    return "\n".join(lines) + "\n"
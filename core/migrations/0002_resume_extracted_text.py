@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='extracted_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='extractor_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_resume_extracted_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysis',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
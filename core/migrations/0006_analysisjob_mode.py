@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_analysisbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='mode',
+            field=models.CharField(default='full', max_length=10),
+        ),
+    ]
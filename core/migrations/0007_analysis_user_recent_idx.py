@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_analysisjob_mode'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='analysis',
+            index=models.Index(fields=['user', '-analyzed_at'], name='analysis_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_cached_text_to_blobs(apps, schema_editor):
+    # Resumes extracted before blobs existed already know their content hash;
+    # give each distinct hash a blob that adopts the first copy's file and cached text.
+    # Resumes without a hash get a blob attached lazily on first use.
+    Resume = apps.get_model('core', 'Resume')
+    ResumeBlob = apps.get_model('core', 'ResumeBlob')
+    blobs = {}
+    for resume in Resume.objects.exclude(content_hash='').order_by('uploaded_at'):
+        blob = blobs.get(resume.content_hash)
+        if blob is None:
+            blob = blobs[resume.content_hash] = ResumeBlob.objects.create(
+                sha256=resume.content_hash,
+                file=resume.file.name,
+                extracted_text=resume.extracted_text,
+                extractor_version=resume.extractor_version,
+            )
+        blob.ref_count += 1
+        resume.blob = blob
+        resume.save(update_fields=['blob'])
+    for blob in blobs.values():
+        blob.save(update_fields=['ref_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_analysis_user_recent_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(upload_to='uploads/blobs/')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('extracted_text', models.TextField(blank=True, default='')),
+                ('extractor_version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='resume',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='resumes', to='core.resumeblob'),
+        ),
+        migrations.RunPython(move_cached_text_to_blobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='resume',
+            name='extracted_text',
+        ),
+        migrations.RemoveField(
+            model_name='resume',
+            name='extractor_version',
+        ),
+    ]
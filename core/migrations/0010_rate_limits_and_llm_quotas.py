@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_resumeupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserQuota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_token_limit', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('daily_request_limit', models.PositiveIntegerField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='llm_quota', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LLMUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('total_tokens', models.PositiveBigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='llm_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='llm_usage_user_day_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_rate_limits_and_llm_quotas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumeblob',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
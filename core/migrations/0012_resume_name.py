@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:48
+
+import posixpath
+
+from django.db import migrations, models
+
+
+def name_existing_resumes(apps, schema_editor):
+    # Resumes stored before content addressing (and files adopted by their blobs) still
+    # carry the uploaded file name in their path; blob paths are just the hash.
+    Resume = apps.get_model('core', 'Resume')
+    for resume in Resume.objects.exclude(file__startswith='uploads/blobs/').only('id', 'file'):
+        resume.name = posixpath.basename(resume.file.name)[:255]
+        resume.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_resumeblob_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='resume',
+            index=models.Index(fields=['user', '-uploaded_at'], name='resume_user_recent_idx'),
+        ),
+        migrations.RunPython(name_existing_resumes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:50
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_text(text):
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def merge_duplicate_job_descriptions(apps, schema_editor):
+    # Until now every analysis stored its own copy of the JD. Keep the oldest row of each
+    # user's identical texts, point the analyses of the copies at it and drop the copies.
+    # The copies were never in the vector index (only the first of each text was indexed).
+    JobDescription = apps.get_model('core', 'JobDescription')
+    Analysis = apps.get_model('core', 'Analysis')
+    kept = {}
+    duplicates = {}
+    for jd in JobDescription.objects.order_by('pk').only('id', 'user_id', 'text').iterator(chunk_size=500):
+        content_hash = hash_text(jd.text)
+        key = (jd.user_id, content_hash)
+        if key in kept:
+            duplicates.setdefault(kept[key], []).append(jd.pk)
+        else:
+            kept[key] = jd.pk
+            JobDescription.objects.filter(pk=jd.pk).update(content_hash=content_hash)
+    for kept_pk, duplicate_pks in duplicates.items():
+        Analysis.objects.filter(job_description_id__in=duplicate_pks).update(job_description_id=kept_pk)
+        JobDescription.objects.filter(pk__in=duplicate_pks).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_resume_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobdescription',
+            name='content_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(merge_duplicate_job_descriptions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='jobdescription',
+            constraint=models.UniqueConstraint(fields=('user', 'content_hash'), name='jd_user_content_unique'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copies of Analysis.parse_score and Skill.normalize as of this migration.
+def parse_score(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        score = round(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return score if 0 <= score <= 100 else None
+
+
+def normalize(label):
+    return " ".join(label.split()).lower()[:100] if isinstance(label, str) else ''
+
+
+def backfill_columns_and_skills(apps, schema_editor):
+    # Fills the new score/title columns and skill links of existing analyses, a chunk at a time.
+    Analysis = apps.get_model('core', 'Analysis')
+    Skill = apps.get_model('core', 'Skill')
+    AnalysisSkill = apps.get_model('core', 'AnalysisSkill')
+    chunk = []
+
+    def flush():
+        links = []
+        labels = {}
+        for analysis in chunk:
+            result = analysis.result if isinstance(analysis.result, dict) else {}
+            analysis.suitability_score = parse_score(result.get('suitability_score'))
+            title = result.get('suggested_title')
+            analysis.suggested_title = str(title)[:255] if title else ''
+            for kind in ('matching', 'missing'):
+                for label in result.get(f'{kind}_skills') or []:
+                    name = normalize(label)
+                    if name:
+                        labels.setdefault(name, " ".join(label.split())[:100])
+                        links.append((analysis.pk, kind, name))
+        Analysis.objects.bulk_update(chunk, ['suitability_score', 'suggested_title'])
+        Skill.objects.bulk_create([Skill(name=name, label=label) for name, label in labels.items()], ignore_conflicts=True)
+        skill_ids = dict(Skill.objects.filter(name__in=labels).values_list('name', 'id'))
+        AnalysisSkill.objects.bulk_create(
+            [AnalysisSkill(analysis_id=pk, kind=kind, skill_id=skill_ids[name]) for pk, kind, name in set(links)],
+            ignore_conflicts=True,
+        )
+        chunk.clear()
+
+    for analysis in Analysis.objects.order_by('pk').only('id', 'result').iterator(chunk_size=500):
+        chunk.append(analysis)
+        if len(chunk) == 500:
+            flush()
+    if chunk:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_jobdescription_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('matching', 'Matching'), ('missing', 'Missing')], max_length=8)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('label', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='analysis',
+            name='suggested_title',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='analysis',
+            name='suitability_score',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='analysis',
+            index=models.Index(fields=['job_description', '-suitability_score'], name='analysis_jd_score_idx'),
+        ),
+        migrations.AddField(
+            model_name='analysisskill',
+            name='analysis',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_links', to='core.analysis'),
+        ),
+        migrations.AddField(
+            model_name='analysisskill',
+            name='skill',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_links', to='core.skill'),
+        ),
+        migrations.AddConstraint(
+            model_name='analysisskill',
+            constraint=models.UniqueConstraint(fields=('analysis', 'kind', 'skill'), name='analysis_skill_unique'),
+        ),
+        migrations.RunPython(backfill_columns_and_skills, migrations.RunPython.noop),
+    ]
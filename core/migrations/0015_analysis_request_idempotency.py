@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_analysis_columns_and_skills'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=300)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('cache_hit', models.BooleanField(default=False)),
+                ('created', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, default='')),
+                ('retry_after', models.FloatField(blank=True, null=True)),
+                ('started_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='analysisjob',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='analysis_job_idempotency_key_unique'),
+        ),
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='analysis',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.analysis'),
+        ),
+        migrations.AddField(
+            model_name='analysisrequest',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='analysisrequest',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='analysis_request_user_key_unique'),
+        ),
+    ]
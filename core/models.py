@@ -1,3 +1,6 @@
+import hashlib
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
@@ -6,6 +9,28 @@ from django.contrib.auth.models import AbstractUser
 class User(AbstractUser):
     pass
 
+# Defines one stored PDF, addressed by the SHA-256 of its bytes.
+# Identical uploads share a single blob (one file on disk, one cached extraction).
+# ref_count tracks how many Resume rows point at it; gc_resume_blobs deletes blobs nobody uses.
+class ResumeBlob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='uploads/blobs/')
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Cached output of the PDF text extractor, so repeat analyses of the same file skip PyPDF2.
+    # The cache is only trusted while extractor_version matches services.EXTRACTOR_VERSION.
+    extracted_text = models.TextField(blank=True, default='')
+    extractor_version = models.PositiveIntegerField(default=0)
+    # Condensed profile of the extracted text (see core/profiles.py), sent to the LLM instead of the text
+    # when ANALYSIS_RESUME_PROFILE is on.
+    # Cleared whenever the text is re-extracted; rebuilt when it is not profiles.is_current.
+    profile = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"Resume blob {self.sha256[:12]} ({self.ref_count} refs)"
+
 # Defines the database model for storing uploaded resumes.
 
 class Resume(models.Model):
@@ -13,19 +38,76 @@ class Resume(models.Model):
     file = models.FileField(upload_to='uploads/resumes/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # The deduplicated file behind this resume; `file` points at the blob's file.
+    # Resumes uploaded before blobs existed get one attached on first use.
+    blob = models.ForeignKey(ResumeBlob, null=True, blank=True, on_delete=models.PROTECT, related_name='resumes')
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    # The file name the user uploaded it under, so they can pick it again from their resume library.
+    name = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        # Serves the resume library (one user's resumes, newest first) as an index range scan.
+        indexes = [
+            models.Index(fields=['user', '-uploaded_at'], name='resume_user_recent_idx'),
+        ]
+
     def __str__(self):
         # Provides a human-readable name for the object, useful in the Django admin panel.
         return f"Resume for {self.user.username} uploaded at {self.uploaded_at.strftime('%Y-%m-%d')}"
 
+# Defines an in-progress chunked upload (see core/uploads.py).
+# Chunks are appended to a partial file until `received` reaches `total_size`;
+# a client that lost its connection asks for `received` and continues from there.
+class ResumeUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255, blank=True, default='')
+    total_size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.pk} for {self.user.username} ({self.received}/{self.total_size} bytes)"
+
 # Defines the model for storing job descriptions that users paste.
+# Each user stores a given JD once: rows are unique per (user, content_hash), so every
+# analysis of the same JD points at the same row and clients can refer to it by id.
 class JobDescription(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # SHA-256 of the whitespace-normalized text (see hash_text); filled in on save.
+    content_hash = models.CharField(max_length=64, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_hash'], name='jd_user_content_unique'),
+        ]
+
+    @staticmethod
+    def hash_text(text):
+        # Formatting-only differences (line breaks, indentation) hash the same,
+        # like services.normalize_text does for analysis cache keys.
+        return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+    def save(self, *args, **kwargs):
+        if not self.content_hash:
+            self.content_hash = self.hash_text(self.text)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         # Returns the first 50 characters of the JD for a concise representation.
         return f"JD for {self.user.username}: {self.text[:50]}..."
 
+# Groups the analyses created by one call to the batch endpoint under a single id.
+class AnalysisBatch(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Analysis batch {self.pk} for {self.user.username} on {self.created_at.strftime('%Y-%m-%d')}"
+
 # Defines the model to store the results of the AI analysis.
 class Analysis(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -36,5 +118,212 @@ class Analysis(models.Model):
     result = models.JSONField()
     analyzed_at = models.DateTimeField(auto_now_add=True)
 
+    # Hash of the normalized inputs, model and prompt version (see services.analysis_cache_key).
+    # Lets a repeat submission reuse this result instead of calling the LLM again.
+    cache_key = models.CharField(max_length=64, blank=True, default='', db_index=True)
+
+    # Set when the analysis was created through the batch endpoint.
+    batch = models.ForeignKey(AnalysisBatch, null=True, blank=True, on_delete=models.SET_NULL, related_name='analyses')
+
+    # Copies of result fields as typed columns, so ranking and filtering run in SQL; filled in on save.
+    # The score is None when the LLM did not return a usable number.
+    suitability_score = models.SmallIntegerField(null=True, blank=True)
+    suggested_title = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # Serves the history page (one user's analyses, newest first) as an index range scan.
+            models.Index(fields=['user', '-analyzed_at'], name='analysis_user_recent_idx'),
+            # Serves a job description's leaderboard (its analyses, best score first).
+            models.Index(fields=['job_description', '-suitability_score'], name='analysis_jd_score_idx'),
+        ]
+
+    @staticmethod
+    def parse_score(value):
+        # LLM output is not always well-typed: accept 85, 85.0 and "85", but not "high" or 850.
+        if isinstance(value, bool):
+            return None
+        try:
+            score = round(float(value))
+        except (TypeError, ValueError, OverflowError):
+            return None
+        return score if 0 <= score <= 100 else None
+
+    def fill_result_columns(self):
+        """
+        Copies the score and suggested title out of `result`. Called by save();
+        call it yourself before bulk_create, which skips save().
+        """
+        result = self.result if isinstance(self.result, dict) else {}
+        self.suitability_score = self.parse_score(result.get('suitability_score'))
+        title = result.get('suggested_title')
+        self.suggested_title = str(title)[:255] if title else ''
+
+    def result_skills(self):
+        """
+        Yields (kind, name, label) for each distinct skill in the result's skill lists.
+        """
+        result = self.result if isinstance(self.result, dict) else {}
+        for kind in AnalysisSkill.Kind:
+            seen = set()
+            for label in result.get(f'{kind.value}_skills') or []:
+                name = Skill.normalize(label)
+                if name and name not in seen:
+                    seen.add(name)
+                    yield kind.value, name, " ".join(label.split())[:100]
+
+    def save(self, *args, **kwargs):
+        self.fill_result_columns()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Analysis for {self.user.username} on {self.analyzed_at.strftime('%Y-%m-%d')}"
+
+
+# Defines one skill named in analysis results ("Python", "Kubernetes"), shared by all analyses.
+# `name` is the normalized form used for matching; `label` keeps the spelling it was first seen with.
+class Skill(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    label = models.CharField(max_length=100)
+
+    @staticmethod
+    def normalize(label):
+        return " ".join(label.split()).lower()[:100] if isinstance(label, str) else ''
+
+    def __str__(self):
+        return self.label
+
+
+# Links an analysis to the skills its result lists as matching or missing, so
+# questions like "most common missing skills this month" are GROUP BY queries.
+class AnalysisSkill(models.Model):
+    class Kind(models.TextChoices):
+        MATCHING = 'matching'
+        MISSING = 'missing'
+
+    analysis = models.ForeignKey(Analysis, on_delete=models.CASCADE, related_name='skill_links')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='analysis_links')
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['analysis', 'kind', 'skill'], name='analysis_skill_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.skill} ({self.kind}) in analysis {self.analysis_id}"
+
+
+# Defines a queued analysis request, processed by the run_analysis_worker management command.
+# The database doubles as the queue, so async analysis needs no external broker.
+class AnalysisJob(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE)
+    jd_text = models.TextField()
+    mode = models.CharField(max_length=10, default='full')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, db_index=True)
+
+    # Filled in by the worker once the job finishes.
+    analysis = models.ForeignKey(Analysis, null=True, blank=True, on_delete=models.SET_NULL)
+    cache_hit = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default='')
+
+    # The Idempotency-Key header of the request that queued the job; resending it returns this job.
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='analysis_job_idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"Analysis job {self.pk} for {self.user.username} ({self.status})"
+
+
+# Claims one analysis computation so identical concurrent requests share it, in every gunicorn
+# worker process (see SingleFlight in core/services.py). The first request inserts the row and runs
+# the analysis; the others poll the row until it is done and return the same outcome.
+# Rows keyed by an Idempotency-Key header stay done until expires_at, so a client's retry gets
+# the original result back; the others can be claimed again as soon as they finish.
+class AnalysisRequest(models.Model):
+    class Status(models.TextChoices):
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # "flight:<fingerprint>" or "idempotency:<header value>".
+    key = models.CharField(max_length=300)
+    # sha256 of the resume, the job description's content hash and the mode.
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+
+    # The outcome every waiter shares.
+    analysis = models.ForeignKey(Analysis, null=True, blank=True, on_delete=models.CASCADE)
+    cache_hit = models.BooleanField(default=False)
+    created = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default='')
+    retry_after = models.FloatField(null=True, blank=True)
+
+    # When the current leader claimed the row; a waiter takes over once this is too long ago.
+    started_at = models.DateTimeField()
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='analysis_request_user_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"Analysis request {self.key[:40]} for user {self.user_id} ({self.status})"
+
+
+# A token bucket used for rate limiting (see core/throttling.py).
+# Stored in the database so every gunicorn worker draws from the same bucket.
+class RateLimitBucket(models.Model):
+    key = models.CharField(max_length=100, unique=True)
+    tokens = models.FloatField()
+    # time.time() of the last refill.
+    updated_at = models.FloatField()
+
+    def __str__(self):
+        return f"Rate limit bucket {self.key} ({self.tokens:.1f} tokens)"
+
+
+# One user's LLM usage for one day, summed from the `usage` field of each provider response.
+class LLMUsage(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='llm_usage')
+    day = models.DateField()
+    requests = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    total_tokens = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='llm_usage_user_day_unique'),
+        ]
+
+    def __str__(self):
+        return f"LLM usage for {self.user.username} on {self.day}: {self.total_tokens} tokens"
+
+
+# Per-user daily LLM limits. Users without a row, or with a limit left empty,
+# get LLM_DAILY_TOKEN_LIMIT / LLM_DAILY_REQUEST_LIMIT from settings; 0 means unlimited.
+class UserQuota(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='llm_quota')
+    daily_token_limit = models.PositiveBigIntegerField(null=True, blank=True)
+    daily_request_limit = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"LLM quota for {self.user.username}"
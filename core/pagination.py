@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+# Cursor pagination for the analysis history, newest first.
+# Cursors stay stable while new analyses are added, and each page is a bounded index scan
+# instead of an OFFSET that grows with the page number.
+class AnalysisHistoryPagination(CursorPagination):
+    ordering = '-analyzed_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+# Cursor pagination for a user's resume library, newest first.
+class ResumeListPagination(CursorPagination):
+    ordering = '-uploaded_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
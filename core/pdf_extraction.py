@@ -0,0 +1,60 @@
+import io
+import time
+
+from PyPDF2 import PdfReader
+
+# Page-streaming PDF text extraction.
+# This module must not import Django: extract_text_from_bytes runs inside
+# process-pool workers (see services.extract_resume_text), which only import this file.
+
+
+def iter_page_text(file_object, max_pages=None, deadline=None):
+    """
+    Yields the text of each page in turn, stopping after `max_pages` pages
+    or once time.monotonic() passes `deadline`.
+    """
+    reader = PdfReader(file_object)
+    for index, page in enumerate(reader.pages):
+        if max_pages is not None and index >= max_pages:
+            return
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        yield page.extract_text() or ""
+
+
+def extract_text(file_object, max_pages=None, max_chars=None, time_budget=None, stats=None):
+    """
+    Extracts text page by page, stopping early once `max_chars` characters have been
+    collected (the prompt cannot use more), after `max_pages` pages, or when
+    `time_budget` seconds have been spent. Returns whatever was collected.
+    If a `stats` dict is given, the number of pages read is stored under "pages".
+    """
+    deadline = time.monotonic() + time_budget if time_budget else None
+    parts = []
+    total = 0
+    for page_text in iter_page_text(file_object, max_pages=max_pages, deadline=deadline):
+        parts.append(page_text)
+        total += len(page_text)
+        if max_chars is not None and total >= max_chars:
+            break
+
+    if stats is not None:
+        stats["pages"] = len(parts)
+    text = "\n".join(parts).strip()
+    return text[:max_chars] if max_chars is not None else text
+
+
+def extract_text_from_bytes(data, max_pages=None, max_chars=None, time_budget=None):
+    """
+    Process-pool entry point: extract_text over an in-memory PDF.
+    """
+    return extract_text(io.BytesIO(data), max_pages=max_pages, max_chars=max_chars, time_budget=time_budget)
+
+
+def extract_text_and_page_count_from_bytes(data, max_pages=None, max_chars=None, time_budget=None):
+    """
+    Like extract_text_from_bytes, but returns (text, pages read) so the caller can record page counts.
+    """
+    stats = {}
+    text = extract_text(io.BytesIO(data), max_pages=max_pages, max_chars=max_chars, time_budget=time_budget, stats=stats)
+    return text, stats.get("pages", 0)
@@ -0,0 +1,167 @@
+import re
+from datetime import date
+
+from .compaction import compact_lines, is_heading
+from .scoring import extract_skills, tokenize
+
+# Condenses resume text into a small structured profile (titles, years of experience,
+# skills and key achievements) with local heuristics, no LLM call. The rendered
+# profile goes into the analysis prompt in place of the full resume text, so
+# analyzing one resume against many job descriptions re-sends a few hundred
+# characters instead of the whole resume. Like scoring.py, this module does not import Django.
+
+# Bump whenever build_profile or render_profile changes, so stored profiles are rebuilt.
+# Profiles are also rebuilt when the year changes (see is_current), since years of
+# experience counts "2019 - Present" up to the current year.
+PROFILE_VERSION = 2
+
+MAX_TITLES = 4
+MAX_ACHIEVEMENTS = 6
+# Only a vocabulary of known skills is recognized (see scoring.py), so a resume whose
+# skills lie outside it yields a thin profile; below these the text is sent instead.
+MIN_USEFUL_SKILLS = 5
+
+ROLE_WORDS = frozenset("""
+engineer developer programmer architect manager lead analyst scientist designer consultant administrator
+specialist director officer coordinator technician researcher intern head founder cto ceo vp
+""".split())
+ACTION_VERBS = frozenset("""
+built designed led launched delivered reduced cut increased improved grew saved automated migrated
+scaled shipped created developed implemented optimized managed mentored owned drove introduced
+rebuilt redesigned streamlined won achieved
+""".split())
+
+BULLET_RE = re.compile(r"^[•▪●‣⁃*\-–·>]+\s*")
+TITLE_SPLIT_RE = re.compile(r"\s+(?:at|@)\s+|\s*[|,(–—]\s*|\s+-\s+")
+YEARS_RE = re.compile(r"\b(\d{1,2})\+?\s*(?:years?|yrs?)\b", re.IGNORECASE)
+DATE_RANGE_RE = re.compile(
+    r"\b((?:19|20)\d{2})\s*(?:-|–|—|to)\s*((?:19|20)\d{2}|present|current|now|today)\b", re.IGNORECASE
+)
+METRIC_RE = re.compile(r"\d")
+# Date ranges on these lines are studies, not work experience.
+EDUCATION_RE = re.compile(
+    r"\b(?:university|college|school|academy|institute|degree|bachelor|master|ph\.?d|b\.?sc|m\.?sc|b\.?a|m\.?a|mba)\b",
+    re.IGNORECASE,
+)
+
+
+def find_titles(lines):
+    """
+    Returns the job titles found at the start of short lines, such as "Senior Backend Engineer at Acme".
+    """
+    titles = []
+    for line in lines:
+        candidate = TITLE_SPLIT_RE.split(BULLET_RE.sub("", line), maxsplit=1)[0].strip(" :.")
+        words = candidate.split()
+        if not 1 <= len(words) <= 6 or not ROLE_WORDS & set(tokenize(candidate)):
+            continue
+        if words[0].lower() in ACTION_VERBS or candidate.lower() in (t.lower() for t in titles):
+            continue
+        titles.append(candidate)
+        if len(titles) == MAX_TITLES:
+            break
+    return titles
+
+
+def years_of_experience(text, current_year=None):
+    """
+    Returns the larger of the longest stated "N years" and the years covered by
+    date ranges such as "2019 - Present" outside education lines (overlaps counted once), or None.
+    """
+    current_year = current_year or date.today().year
+    stated = [int(n) for n in YEARS_RE.findall(text) if int(n) <= 50]
+
+    spans = []
+    for line in text.splitlines():
+        if EDUCATION_RE.search(line):
+            continue
+        for start, end in DATE_RANGE_RE.findall(line):
+            end = current_year if not end[0].isdigit() else int(end)
+            if int(start) <= end <= current_year:
+                spans.append((int(start), end))
+    covered = 0
+    last_end = None
+    for start, end in sorted(spans):
+        if last_end is not None and start < last_end:
+            start = last_end
+        if end > start:
+            covered += end - start
+        last_end = end if last_end is None else max(last_end, end)
+
+    best = max(stated + [covered])
+    return best or None
+
+
+def find_achievements(lines):
+    """
+    Returns up to MAX_ACHIEVEMENTS lines that read like accomplishments: ones with
+    numbers and ones that open with an action verb score highest. Original order is kept.
+    """
+    scored = []
+    for position, line in enumerate(lines):
+        text = BULLET_RE.sub("", line)
+        words = text.split()
+        if not 5 <= len(words) <= 45 or YEARS_RE.search(text):
+            continue
+        score = 0
+        if METRIC_RE.search(text) and not DATE_RANGE_RE.search(text):
+            score += 2
+        if "%" in text or "$" in text:
+            score += 1
+        if words[0].lower().strip(",.") in ACTION_VERBS:
+            score += 1
+        if score:
+            scored.append((score, position, text))
+    best = sorted(scored, key=lambda item: (-item[0], item[1]))[:MAX_ACHIEVEMENTS]
+    return [text for _, _, text in sorted(best, key=lambda item: item[1])]
+
+
+def build_profile(text, current_year=None):
+    """
+    Returns the condensed profile of a resume's text as a JSON-serializable dict.
+    """
+    lines = [line for line in compact_lines(text) if not is_heading(line)]
+    current_year = current_year or date.today().year
+    return {
+        "version": PROFILE_VERSION,
+        "year": current_year,
+        "titles": find_titles(lines),
+        "years_experience": years_of_experience(text, current_year),
+        "skills": sorted(extract_skills(tokenize(text))),
+        "achievements": find_achievements(lines),
+    }
+
+
+def is_current(profile, current_year=None):
+    """
+    True if the profile was built by this PROFILE_VERSION during the current year.
+    """
+    current_year = current_year or date.today().year
+    return profile.get("version") == PROFILE_VERSION and profile.get("year") == current_year
+
+
+def is_useful(profile):
+    """
+    Only a profile with several recognized skills, plus titles or achievements, says
+    enough to replace the resume text.
+    """
+    return len(profile.get("skills") or []) >= MIN_USEFUL_SKILLS and bool(
+        profile.get("titles") or profile.get("achievements")
+    )
+
+
+def render_profile(profile):
+    """
+    Returns the profile as the short text block that goes into the prompt.
+    """
+    lines = []
+    if profile.get("titles"):
+        lines.append("Titles: " + "; ".join(profile["titles"]))
+    if profile.get("years_experience"):
+        lines.append(f"Years of experience: {profile['years_experience']}")
+    if profile.get("skills"):
+        lines.append("Skills: " + ", ".join(profile["skills"]))
+    if profile.get("achievements"):
+        lines.append("Key achievements:")
+        lines += [f"- {achievement}" for achievement in profile["achievements"]]
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+# Local, CPU-only pre-scoring of a resume against a job description.
+# Produces the same JSON fields as the LLM analysis, in a few milliseconds,
+# so obvious mismatches can be answered without spending an LLM call.
+
+# Bump whenever the scoring changes, so cached pre-scores are not reused.
+SCORER_VERSION = 1
+
+SKILLS_FILE = Path(__file__).resolve().parent / "data" / "skills.txt"
+
+# Weight of skill coverage versus TF-IDF text similarity in the final score.
+SKILL_WEIGHT = 0.6
+
+TOKEN_RE = re.compile(r"[a-z0-9.+#/-]+")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each etc few for from further had has
+have having he her here hers him his how i if in into is it its itself just me more most my no nor
+not of off on once only or other our ours out over own same she should so some such than that the
+their them then there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your yours
+""".split())
+
+
+def tokenize(text):
+    """
+    Lowercases and splits text into tokens, keeping skill punctuation such as c++, c#, node.js and ci/cd.
+    """
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        token = token.strip("-/").rstrip(".")
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+@lru_cache(maxsize=1)
+def load_skills():
+    """
+    Loads the bundled vocabulary as {pattern token tuple: display name}.
+    """
+    patterns = {}
+    for line in SKILLS_FILE.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, *aliases = line.split("|")
+        for alias in aliases or [name]:
+            tokens = tuple(tokenize(alias))
+            if tokens:
+                patterns[tokens] = name
+    return patterns
+
+
+def extract_skills(tokens):
+    """
+    Returns the set of vocabulary skills mentioned in a token list, matching multi-word skills too.
+    """
+    patterns = load_skills()
+    max_len = max(len(pattern) for pattern in patterns)
+    found = set()
+    for n in range(1, max_len + 1):
+        for i in range(len(tokens) - n + 1):
+            name = patterns.get(tuple(tokens[i:i + n]))
+            if name:
+                found.add(name)
+    return found
+
+
+def tfidf_cosine(tokens_a, tokens_b):
+    """
+    Cosine similarity of the two documents' TF-IDF vectors, ignoring stopwords.
+    IDF is computed over the pair, so terms both documents share count for less
+    than terms distinctive to one of them, as in a smoothed two-document corpus.
+    """
+    tokens_a = [t for t in tokens_a if t not in STOPWORDS]
+    tokens_b = [t for t in tokens_b if t not in STOPWORDS]
+    vocabulary = {token: i for i, token in enumerate(set(tokens_a) | set(tokens_b))}
+    if not tokens_a or not tokens_b:
+        return 0.0
+
+    counts = np.vstack([
+        np.bincount([vocabulary[t] for t in tokens_a], minlength=len(vocabulary)),
+        np.bincount([vocabulary[t] for t in tokens_b], minlength=len(vocabulary)),
+    ]).astype(np.float64)
+    tf = counts / counts.sum(axis=1, keepdims=True)
+    df = (counts > 0).sum(axis=0)
+    idf = np.log((1 + 2) / (1 + df)) + 1
+    weights = tf * idf
+
+    norms = np.linalg.norm(weights, axis=1)
+    return float(weights[0] @ weights[1] / (norms[0] * norms[1]))
+
+
+def guess_title(job_description_text):
+    """
+    Job descriptions usually open with the role name; use a short first line as the title.
+    """
+    for line in job_description_text.splitlines():
+        line = line.strip(" \t:-*#")
+        if line:
+            return line if len(line) <= 60 else ""
+    return ""
+
+
+def resume_features(resume_text):
+    """
+    Returns the resume-side inputs of prescore(), which can be computed once per resume.
+    """
+    tokens = tokenize(resume_text)
+    return {"tokens": tokens, "skills": extract_skills(tokens)}
+
+
+def prescore(resume_text, job_description_text, features=None):
+    """
+    Scores a resume against a job description without the LLM. Pass `features`
+    (see resume_features) to skip the resume-side work.
+    Returns a dict in the analysis JSON schema, marked with "preliminary": True.
+    """
+    features = features or resume_features(resume_text)
+    resume_tokens = features["tokens"]
+    resume_skills = features["skills"]
+    jd_tokens = tokenize(job_description_text)
+
+    jd_skills = extract_skills(jd_tokens)
+    matching = sorted(jd_skills & resume_skills)
+    missing = sorted(jd_skills - resume_skills)
+
+    similarity = tfidf_cosine(resume_tokens, jd_tokens)
+    if jd_skills:
+        coverage = len(matching) / len(jd_skills)
+        score = SKILL_WEIGHT * coverage + (1 - SKILL_WEIGHT) * similarity
+    else:
+        score = similarity
+
+    if missing:
+        suggestions = "Consider adding evidence of these skills from the job description: " + ", ".join(missing) + "."
+    else:
+        suggestions = "Your resume covers the skills this job description asks for."
+
+    return {
+        "suitability_score": int(round(100 * score)),
+        "matching_skills": matching,
+        "missing_skills": missing,
+        "suggested_title": guess_title(job_description_text),
+        "tailored_suggestions": suggestions,
+        "preliminary": True,
+    }
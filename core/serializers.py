@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import User, Resume, Analysis, JobDescription
+from .models import User, Resume, ResumeUpload, Analysis, JobDescription, AnalysisJob, AnalysisBatch
 
 # A serializer for our custom User model.
 class UserSerializer(serializers.ModelSerializer):
@@ -21,15 +22,66 @@ class UserSerializer(serializers.ModelSerializer):
 class ResumeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Resume
-        fields = ('id', 'user', 'file', 'uploaded_at')
+        fields = ('id', 'user', 'file', 'name', 'uploaded_at')
         # We make the user field read-only because it will be set automatically based on the logged-in user.
-        read_only_fields = ('user',)
+        # The name is taken from the uploaded file.
+        read_only_fields = ('user', 'name')
+
+# A serializer for chunked upload sessions.
+# The client declares the file size up front, so oversized files are refused before any chunk is sent.
+class ResumeUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumeUpload
+        fields = ('id', 'file_name', 'total_size', 'received', 'created_at')
+        read_only_fields = ('received',)
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('File is empty.')
+        if value > settings.RESUME_MAX_UPLOAD_BYTES:
+            raise serializers.ValidationError(f'File is larger than {settings.RESUME_MAX_UPLOAD_BYTES} bytes.')
+        return value
 
 # A serializer for the Analysis model.
 # To convert the results of our AI analysis into a clean JSON format to be sent to the frontend.
 class AnalysisSerializer(serializers.ModelSerializer):
     job_description_text = serializers.CharField(source='job_description.text', read_only=True)
+    # Send this back as job_description_id to analyze the same JD again without resending its text.
+    job_description_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Analysis
+        fields = ('id', 'result', 'analyzed_at', 'job_description_id', 'job_description_text')
+
+# A slimmed-down serializer for the history list in summary mode.
+# Only the score, title and a JD snippet are sent; the full result and JD text stay in the database.
+class AnalysisSummarySerializer(serializers.ModelSerializer):
+    job_description_snippet = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Analysis
+        fields = ('id', 'analyzed_at', 'suitability_score', 'suggested_title', 'job_description_snippet')
+
+# A serializer for queued analysis jobs.
+# The frontend polls this to follow a job from "queued" to "done" (or "failed"), then reads the nested analysis.
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    analysis = AnalysisSerializer(read_only=True)
+
+    class Meta:
+        model = AnalysisJob
+        fields = ('id', 'status', 'analysis', 'cache_hit', 'error', 'created_at', 'started_at', 'finished_at')
 
+# A compact serializer for analyses inside a batch.
+# The JD text is identical across the batch, so only ids are sent instead of repeating it per row.
+class BatchAnalysisSerializer(serializers.ModelSerializer):
     class Meta:
         model = Analysis
-        fields = ('id', 'result', 'analyzed_at', 'job_description_text')
+        fields = ('id', 'resume', 'job_description', 'result', 'analyzed_at')
+
+# A serializer for a batch and every analysis it produced.
+class AnalysisBatchSerializer(serializers.ModelSerializer):
+    analyses = BatchAnalysisSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = AnalysisBatch
+        fields = ('id', 'created_at', 'analyses')
@@ -1,14 +1,83 @@
+import io
 import os
+import logging
+import re
 import json
+import time
+import contextvars
+import asyncio
+import hashlib
+import weakref
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait as wait_for_futures
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import partial
+from asgiref.sync import sync_to_async
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-from groq import Groq
+import groq
+from tenacity import AsyncRetrying, Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import compaction, llm_backends, metrics, pdf_extraction, profiles, scoring, streaming, vector_index
+from .models import (
+    Analysis, AnalysisBatch, AnalysisJob, AnalysisRequest, AnalysisSkill, JobDescription, LLMUsage, Resume, ResumeBlob,
+    Skill
+)
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Bump this whenever extract_text_from_pdf changes its output,
+# so text cached on Resume rows is re-extracted on next use.
+EXTRACTOR_VERSION = 2
+
+# The models that may answer (see llm_router.model_key) and the prompt are part of every
+# analysis cache key. Bump PROMPT_VERSION whenever the prompt changes, so stale results are not reused.
+# MODEL_NAME is the model of the default backend, used when settings.LLM_BACKENDS is empty.
+MODEL_NAME = "llama-3.1-8b-instant"
+PROMPT_VERSION = 2
+
+
+# -------------------------------
+# ERRORS
+# -------------------------------
+class AnalysisError(Exception):
+    """
+    Raised when the pipeline cannot produce an analysis; the message is safe to show users.
+    """
+
+
+class LLMUnavailableError(AnalysisError):
+    """
+    Raised without calling the LLM while the circuit breaker is open.
+    `retry_after` is the number of seconds until the next call will be attempted.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("AI service is temporarily unavailable. Please try again shortly.")
+        self.retry_after = retry_after
+
+
+class IdempotencyKeyReused(AnalysisError):
+    """
+    Raised when an Idempotency-Key header is sent again with a different resume, job description or mode.
+    """
+
+    def __init__(self):
+        super().__init__("This Idempotency-Key was already used for a different request.")
 
 
 # -------------------------------
@@ -16,32 +85,288 @@ client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 # -------------------------------
 def extract_text_from_pdf(file_object):
     """
-    Extracts text from a given PDF file object.
+    Extracts text from a given PDF file object, page by page, within the
+    PDF_MAX_PAGES / PDF_MAX_CHARS / PDF_EXTRACT_TIME_BUDGET limits.
     """
+    stats = {}
     try:
-        reader = PdfReader(file_object)
-        text = ""
+        text = pdf_extraction.extract_text(
+            file_object,
+            max_pages=settings.PDF_MAX_PAGES,
+            max_chars=settings.PDF_MAX_CHARS,
+            time_budget=settings.PDF_EXTRACT_TIME_BUDGET,
+            stats=stats,
+        )
+
+    except Exception as e:
+        logger.error("❌ Error extracting text from PDF: %s", e)
+        return None
 
-        for page in reader.pages:
-            text += page.extract_text() or ""
+    metrics.PDF_PAGES.observe(stats.get("pages", 0))
+    return text
 
-        return text.strip()
 
-    except Exception as e:
-        print(f"❌ Error extracting text from PDF: {e}")
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+
+def get_extraction_pool():
+    """
+    Returns the shared process pool for PDF extraction, creating it on first use.
+    "spawn" keeps workers free of the parent's threads and Django state.
+    """
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extraction_pool
+
+
+def reset_extraction_pool(pool):
+    """
+    Kills the pool's worker processes and drops it, so the next extraction gets a fresh pool.
+    A page that hangs cannot be cancelled inside its worker: terminating the worker is the
+    only way to get it back. Extractions still running on the old pool fail and are retried.
+    """
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is pool:
+            _extraction_pool = None
+    # ProcessPoolExecutor has no public way to reach its processes.
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Extra seconds given past PDF_EXTRACT_TIME_BUDGET before a worker is considered stuck.
+PDF_EXTRACT_GRACE_SECONDS = 5
+
+
+def extract_resume_text(data):
+    """
+    Extracts text from PDF bytes in the bounded process pool, so a huge upload
+    uses a pool process instead of the request thread. Runs in-process when
+    PDF_EXTRACT_WORKERS is 0. Returns None on failure or if the time budget is blown.
+    """
+    if not settings.PDF_EXTRACT_WORKERS:
+        return extract_text_from_pdf(io.BytesIO(data))
+
+    for attempt in range(2):
+        pool = get_extraction_pool()
+        try:
+            future = pool.submit(
+                pdf_extraction.extract_text_and_page_count_from_bytes,
+                data,
+                max_pages=settings.PDF_MAX_PAGES,
+                max_chars=settings.PDF_MAX_CHARS,
+                time_budget=settings.PDF_EXTRACT_TIME_BUDGET,
+            )
+            # The worker stops itself at the time budget between pages; the grace period
+            # only matters when a single page hangs.
+            text, pages = future.result(timeout=settings.PDF_EXTRACT_TIME_BUDGET + PDF_EXTRACT_GRACE_SECONDS)
+            break
+        except FuturesTimeoutError:
+            logger.error("❌ PDF extraction timed out; restarting the extraction pool")
+            reset_extraction_pool(pool)
+            return None
+        except BrokenProcessPool as e:
+            # Another request's hung extraction got the pool killed under this one: try once on a fresh pool.
+            reset_extraction_pool(pool)
+            if attempt:
+                logger.error("❌ Error extracting text from PDF: %s", e)
+                return None
+        except Exception as e:
+            logger.error("❌ Error extracting text from PDF: %s", e)
+            return None
+
+    metrics.PDF_PAGES.observe(pages)
+    return text
+
+
+# -------------------------------
+# CONTENT-ADDRESSED RESUME STORAGE
+# -------------------------------
+def hash_uploaded_file(uploaded_file):
+    """
+    Returns the SHA-256 hex digest of an uploaded file, reading it chunk by chunk.
+    """
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_path(sha256):
+    return f"uploads/blobs/{sha256[:2]}/{sha256}.pdf"
+
+
+def get_or_create_blob(sha256, uploaded_file=None, existing_name=None, size=0):
+    """
+    Returns the ResumeBlob for `sha256`, storing `uploaded_file` (or adopting the
+    already-stored file `existing_name`) only if no blob exists yet.
+    """
+    blob = ResumeBlob.objects.filter(sha256=sha256).first()
+    if blob:
+        return blob
+
+    name = existing_name or default_storage.save(blob_path(sha256), uploaded_file)
+    try:
+        with transaction.atomic():
+            return ResumeBlob.objects.create(sha256=sha256, file=name, size=size)
+    except IntegrityError:
+        # A concurrent upload of the same file won the race; keep its blob and drop our copy.
+        if not existing_name:
+            default_storage.delete(name)
+        return ResumeBlob.objects.get(sha256=sha256)
+
+
+def add_blob_reference(resume, blob, update_fields=None):
+    """
+    Points `resume` at `blob`, counts the reference and saves the resume, all in one transaction.
+    The blob row is locked first, as gc_resume_blobs does before deleting one, so a blob the
+    collector is removing cannot gain a resume. Returns False, changing nothing, if the blob
+    was collected since it was looked up; the caller should get or create it again.
+    """
+    with transaction.atomic():
+        blob = ResumeBlob.objects.select_for_update().filter(pk=blob.pk).first()
+        if blob is None:
+            return False
+        resume.blob = blob
+        resume.content_hash = blob.sha256
+        resume.file.name = blob.file.name
+        resume.save(update_fields=update_fields)
+        ResumeBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+    return True
+
+
+def store_resume(user, uploaded_file, sha256=None):
+    """
+    Stores an uploaded resume content-addressed. Returns (resume, created): when the user
+    already uploaded identical bytes their existing Resume is returned, and identical
+    files from different users share one blob on disk. Pass `sha256` when the upload
+    was already hashed while it streamed in.
+    """
+    sha256 = sha256 or hash_uploaded_file(uploaded_file)
+
+    existing = Resume.objects.filter(user=user, content_hash=sha256).order_by("-uploaded_at").first()
+    if existing:
+        return existing, False
+
+    resume = Resume(user=user, name=os.path.basename(uploaded_file.name or "")[:255])
+    while not add_blob_reference(resume, get_or_create_blob(sha256, uploaded_file=uploaded_file, size=uploaded_file.size)):
+        pass
+    return resume, True
+
+
+def get_resume_blob(resume):
+    """
+    Returns the resume's blob, attaching one to resumes stored before blobs existed.
+    """
+    if resume.blob_id:
+        return resume.blob
+
+    with resume.file.open("rb") as f:
+        data = f.read()
+    sha256 = hashlib.sha256(data).hexdigest()
+    while not add_blob_reference(
+        resume, get_or_create_blob(sha256, existing_name=resume.file.name, size=len(data)),
+        update_fields=["blob", "content_hash", "file"],
+    ):
+        pass
+    return resume.blob
+
+
+# -------------------------------
+# CACHED RESUME TEXT
+# -------------------------------
+def get_resume_text(resume, wait_for_prewarm=True):
+    """
+    Returns the text of a Resume, extracting and storing it on its blob only when
+    there is no cached text for the current EXTRACTOR_VERSION. Every resume with
+    the same file shares the one extraction. If this process is pre-warming the
+    file (see prewarm_resume), waits for that extraction instead of starting another.
+    """
+    blob = get_resume_blob(resume)
+    if blob.extractor_version == EXTRACTOR_VERSION and blob.extracted_text:
+        return blob.extracted_text
+
+    pending = _prewarming.get(blob.sha256) if wait_for_prewarm else None
+    if pending is not None:
+        with metrics.stage("prewarm_wait"):
+            wait_for_futures([pending], timeout=settings.PDF_EXTRACT_TIME_BUDGET + 5)
+        blob.refresh_from_db(fields=["extracted_text", "extractor_version"])
+        if blob.extractor_version == EXTRACTOR_VERSION and blob.extracted_text:
+            return blob.extracted_text
+
+    with metrics.stage("pdf_extract"):
+        with blob.file.open("rb") as f:
+            data = f.read()
+        text = extract_resume_text(data)
+
+    if not text:
         return None
+    metrics.TEXT_CHARS.observe(len(text), kind="resume")
+
+    blob.extracted_text = text
+    blob.extractor_version = EXTRACTOR_VERSION
+    # The profile was built from the old text.
+    blob.profile = {}
+    blob.save(update_fields=["extracted_text", "extractor_version", "profile"])
+    return text
 
 
 # -------------------------------
-# RESUME ANALYSIS USING GROQ
+# CONDENSED RESUME PROFILES
 # -------------------------------
-def analyze_resume_with_llama(resume_text, job_description_text):
+def get_resume_profile(resume, resume_text=None):
+    """
+    Returns the resume's condensed profile (see core/profiles.py), building it once
+    per file and storing it on the blob next to the extracted text. Returns None
+    if there is no text.
+    """
+    blob = get_resume_blob(resume)
+    if profiles.is_current(blob.profile):
+        return blob.profile
+
+    resume_text = resume_text or get_resume_text(resume)
+    if not resume_text:
+        return None
+    blob.profile = profiles.build_profile(resume_text)
+    blob.save(update_fields=["profile"])
+    return blob.profile
+
+
+def get_resume_prompt_text(resume, resume_text):
     """
-    Analyzes resume against a job description using Groq (LLaMA).
-    Returns structured JSON only.
+    Returns what the LLM is shown of a resume: its rendered profile, or the text itself
+    when ANALYSIS_RESUME_PROFILE is off or the profile is too thin to stand in for it.
+    Analysis cache keys are built from this, since it is what the result depends on.
     """
+    if settings.ANALYSIS_RESUME_PROFILE:
+        profile = get_resume_profile(resume, resume_text)
+        if profile and profiles.is_useful(profile):
+            return profiles.render_profile(profile)
+    return resume_text
 
-    prompt = f"""
+
+# -------------------------------
+# RESUME ANALYSIS USING GROQ
+# -------------------------------
+def build_prompt(resume_text, job_description_text):
+    """
+    Builds the analysis prompt from compacted, token-budgeted inputs.
+    Changing it (or the compaction rules) requires bumping PROMPT_VERSION.
+    """
+    metrics.TEXT_CHARS.observe(len(job_description_text), kind="job_description")
+    resume_text = get_compacted_resume(resume_text)
+    job_description_text = compaction.compact(
+        job_description_text, settings.PROMPT_JD_TOKEN_BUDGET, label="job description"
+    )
+    return f"""
 You are an AI Resume Analyzer.
 
 Analyze the following resume against the provided job description.
@@ -65,30 +390,1386 @@ Job Description:
 ---
 """
 
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",  # Free + fast (recommended)
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
 
-        content = response.choices[0].message.content.strip()
+def repair_json(content):
+    """
+    Best-effort fix for almost-valid JSON from the model: drops text around the object,
+    smart quotes and trailing commas, and closes strings, lists and objects left open
+    by a truncated response.
+    """
+    start = content.find("{")
+    if start == -1:
+        return content
+
+    closers = []
+    in_string = False
+    escaped = False
+    end = len(content)
+    for i in range(start, len(content)):
+        ch = content[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]" and closers:
+            closers.pop()
+            if not closers:
+                end = i + 1
+                break
+
+    text = content[start:end].replace("\u201c", '"').replace("\u201d", '"')
+    if in_string:
+        text += '"'
+    text = re.sub(r",\s*$", "", text.rstrip())
+    text += "".join(reversed(closers))
+    return re.sub(r",\s*([}\]])", r"\1", text)
 
-        # Debug log
-        print("Raw Groq response:", content)
 
-        # Remove accidental markdown fences
-        if content.startswith("```"):
-            content = content.strip("`").replace("json", "", 1).strip()
+def parse_analysis_response(content):
+    """
+    Turns the raw model output into the analysis dict, running repair_json over
+    output that is almost valid rather than paying for a new generation.
+    Raises json.JSONDecodeError if the output cannot be parsed even after repair.
+    """
+    content = content.strip()
+
+    # Debug log
+    # Whole model outputs are only worth their I/O when debugging.
+    logger.debug("Raw Groq response: %s", content)
+
+    # Remove accidental markdown fences
+    if content.startswith("```"):
+        content = content.strip("`").replace("json", "", 1).strip()
 
+    try:
         return json.loads(content)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(content))
+
+
+# -------------------------------
+# RETRIES AND CIRCUIT BREAKER
+# -------------------------------
+# Errors worth retrying: network failures, timeouts, rate limits and 5xx responses.
+TRANSIENT_LLM_ERRORS = (
+    groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError, llm_backends.TransientBackendError
+)
+# Any error a backend may raise.
+LLM_ERRORS = (groq.GroqError, llm_backends.BackendError)
 
+
+def retry_after_seconds(exc):
+    """
+    Returns the delay requested by a Retry-After header on an API error, or None.
+    """
+    response = getattr(exc, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    if not header:
+        return None
+    try:
+        return max(0.0, float(header))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def wait_for_retry(retry_state):
+    """
+    Tenacity wait strategy: honor Retry-After when the provider sends it,
+    otherwise use jittered exponential backoff.
+    """
+    retry_after = retry_after_seconds(retry_state.outcome.exception())
+    if retry_after is not None:
+        return min(retry_after, settings.LLM_RETRY_MAX_WAIT)
+    backoff = wait_random_exponential(multiplier=settings.LLM_RETRY_BACKOFF, max=settings.LLM_RETRY_MAX_WAIT)
+    return backoff(retry_state)
+
+
+def llm_retrying(retrying_class=Retrying):
+    """
+    Builds the retry loop used around every LLM call (pass AsyncRetrying for async code).
+    """
+    return retrying_class(
+        retry=retry_if_exception_type(TRANSIENT_LLM_ERRORS),
+        wait=wait_for_retry,
+        stop=stop_after_attempt(settings.LLM_RETRY_ATTEMPTS),
+        reraise=True,
+    )
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failed LLM calls. Once `reset_timeout`
+    seconds have passed, one call is let through as a probe: success closes the circuit,
+    any failure (transient or not) keeps it open for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Raises LLMUnavailableError while the circuit is open.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise LLMUnavailableError(retry_after=remaining)
+            # Let this caller probe the provider; everyone else keeps failing fast meanwhile.
+            self.opened_at = time.monotonic()
+            self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def record_error(self):
+        """
+        Records a non-transient failure. It does not count towards opening the circuit,
+        but a probe that fails this way re-opens it like any other failed probe.
+        """
+        with self._lock:
+            if self.probing:
+                self.probing = False
+                self.opened_at = time.monotonic()
+
+
+llm_circuit = CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_TIMEOUT)
+
+
+# -------------------------------
+# LLM BACKENDS AND ROUTING
+# -------------------------------
+def observe_backend_event(event, backend, seconds):
+    """
+    Feeds LLMRouter's per-backend events into the metrics.
+    """
+    if event in ("ok", "error"):
+        metrics.LLM_BACKEND_CALLS.inc(backend=backend, outcome=event)
+        if event == "ok":
+            metrics.LLM_BACKEND_SECONDS.observe(seconds, backend=backend)
+    else:
+        metrics.LLM_HEDGES.inc(backend=backend, result="sent" if event == "hedge" else "won")
+
+
+def build_llm_router(configs=None):
+    """
+    Builds the LLMRouter for the backends in `configs` (default: settings.LLM_BACKENDS,
+    or one Groq backend running MODEL_NAME when that is empty).
+    """
+    configs = configs or settings.LLM_BACKENDS or [{"type": "groq", "name": "groq", "model": MODEL_NAME}]
+    backends = []
+    for config in configs:
+        if config.get("type", "groq") == "groq":
+            config = {"base_url": settings.GROQ_BASE_URL or None, **config}
+        backends.append(llm_backends.build_backend(
+            config, timeout=settings.LLM_TIMEOUT, max_connections=settings.LLM_MAX_CONNECTIONS
+        ))
+    return llm_backends.LLMRouter(
+        backends,
+        hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+        hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY,
+        hedge_default_delay=settings.LLM_HEDGE_DEFAULT_DELAY,
+        min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+        max_workers=settings.LLM_MAX_CONCURRENCY,
+        on_event=observe_backend_event,
+    )
+
+
+# Retries are handled by llm_retrying, so the backends' own retry loops are disabled.
+llm_router = build_llm_router()
+
+
+def observe_llm_response(usage, on_usage=None, backend=None):
+    """
+    Records a successful LLM call and its token usage in the metrics, then passes the usage to `on_usage`.
+    """
+    metrics.LLM_CALLS.inc(outcome="ok")
+    if backend:
+        metrics.annotate(llm_backend=backend)
+    if not usage:
+        return
+    prompt_tokens = usage_count(usage, "prompt_tokens")
+    completion_tokens = usage_count(usage, "completion_tokens")
+    metrics.LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+    metrics.LLM_TOKENS.inc(completion_tokens, kind="completion")
+    metrics.PROMPT_TOKENS.observe(prompt_tokens)
+    metrics.annotate(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    if on_usage:
+        on_usage(usage)
+
+
+def observe_llm_reply(reply, on_usage=None):
+    observe_llm_response(reply.usage, on_usage, reply.backend)
+
+
+def parse_llm_content(content):
+    """
+    Parses a model reply into the analysis dict, or returns None if it is not valid JSON.
+    """
+    try:
+        with metrics.stage("json_parse"):
+            return parse_analysis_response(content)
     except json.JSONDecodeError as e:
-        print("❌ JSON parsing error:", e)
+        logger.error("❌ JSON parsing error: %s", e)
+        return None
+
+
+def analyze_resume_with_llama(resume_text, job_description_text, on_usage=None, router=None):
+    """
+    Analyzes resume against a job description on the configured LLM backends (see llm_router).
+    Returns structured JSON only, or None if the call or parsing fails.
+    Transient errors are retried; raises LLMUnavailableError while the circuit is open.
+    `on_usage` is called with the token usage of every response, including a hedged
+    request's that lost the race (see record_llm_usage).
+    """
+    router = router or llm_router
+    prompt = build_prompt(resume_text, job_description_text)
+    llm_circuit.check()
+    on_reply = partial(observe_llm_reply, on_usage=on_usage)
+
+    try:
+        with metrics.stage("llm_generation"):
+            for attempt in llm_retrying():
+                with attempt:
+                    reply = router.complete(prompt, on_reply=on_reply)
+
+    except TRANSIENT_LLM_ERRORS as e:
+        llm_circuit.record_failure()
+        metrics.LLM_CALLS.inc(outcome="error")
+        logger.error("❌ LLM API error: %s", e)
+        return None
+
+    except Exception as e:
+        llm_circuit.record_error()
+        metrics.LLM_CALLS.inc(outcome="error")
+        logger.error("❌ LLM API error: %s", e)
+        return None
+
+    llm_circuit.record_success()
+    return parse_llm_content(reply.content)
+
+
+# -------------------------------
+# ASYNC RESUME ANALYSIS
+# -------------------------------
+class AsyncLLMPool:
+    """
+    A semaphore capping how many analyses may wait on the LLM at once on one event loop.
+    The backends keep their own size-limited connection pools (LLM_MAX_CONNECTIONS).
+    """
+
+    def __init__(self, max_concurrency=None):
+        self.semaphore = asyncio.Semaphore(max_concurrency or settings.LLM_MAX_CONCURRENCY)
+
+
+# asyncio objects belong to the event loop that created them, so keep one pool per loop.
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_llm_pool():
+    """
+    Returns the AsyncLLMPool for the running event loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = _async_pools[loop] = AsyncLLMPool()
+    return pool
+
+
+async def analyze_resume_with_llama_async(resume_text, job_description_text, pool=None, on_usage=None, router=None):
+    """
+    Async version of analyze_resume_with_llama, with the same retries and circuit breaker.
+    Waits for a free slot in the pool's semaphore, so at most LLM_MAX_CONCURRENCY calls
+    run at once per event loop.
+    """
+    pool = pool or get_async_llm_pool()
+    router = router or llm_router
+    prompt = build_prompt(resume_text, job_description_text)
+    llm_circuit.check()
+    on_reply = partial(observe_llm_reply, on_usage=on_usage)
+
+    try:
+        async for attempt in llm_retrying(AsyncRetrying):
+            with attempt:
+                queued = time.perf_counter()
+                async with pool.semaphore:
+                    metrics.observe_stage("llm_queue_wait", time.perf_counter() - queued)
+                    with metrics.stage("llm_generation"):
+                        reply = await router.acomplete(prompt, on_reply=on_reply)
+
+    except TRANSIENT_LLM_ERRORS as e:
+        llm_circuit.record_failure()
+        metrics.LLM_CALLS.inc(outcome="error")
+        logger.error("❌ LLM API error: %s", e)
+        return None
+
+    except Exception as e:
+        llm_circuit.record_error()
+        metrics.LLM_CALLS.inc(outcome="error")
+        logger.error("❌ LLM API error: %s", e)
+        return None
+
+    llm_circuit.record_success()
+    return parse_llm_content(reply.content)
+
+
+async def stream_resume_analysis_with_llama(resume_text, job_description_text, pool=None, on_usage=None, router=None):
+    """
+    Streams the model output for an analysis, yielding text deltas as they arrive.
+    Only opening the stream is retried; once tokens are flowing, an error ends the stream.
+    Raises LLMUnavailableError while the circuit is open and AnalysisError on failure.
+    Token usage arrives on the last chunk; it is passed to `on_usage`.
+    """
+    pool = pool or get_async_llm_pool()
+    router = router or llm_router
+    prompt = build_prompt(resume_text, job_description_text)
+    llm_circuit.check()
+
+    queued = time.perf_counter()
+    async with pool.semaphore:
+        metrics.observe_stage("llm_queue_wait", time.perf_counter() - queued)
+        started = time.perf_counter()
+        try:
+            async for attempt in llm_retrying(AsyncRetrying):
+                with attempt:
+                    backend, stream = await router.astream(prompt)
+            metrics.observe_stage("llm_first_token", time.perf_counter() - started)
+
+            async for text, usage in stream:
+                if text:
+                    yield text
+                if usage:
+                    observe_llm_response(usage, on_usage, backend.name)
+
+        except TRANSIENT_LLM_ERRORS as e:
+            llm_circuit.record_failure()
+            metrics.LLM_CALLS.inc(outcome="error")
+            logger.error("❌ LLM API error: %s", e)
+            raise AnalysisError("Failed to get analysis from AI service.")
+
+        except LLM_ERRORS as e:
+            llm_circuit.record_error()
+            metrics.LLM_CALLS.inc(outcome="error")
+            logger.error("❌ LLM API error: %s", e)
+            raise AnalysisError("Failed to get analysis from AI service.")
+
+        metrics.observe_stage("llm_generation", time.perf_counter() - started)
+
+    llm_circuit.record_success()
+
+
+# -------------------------------
+# LLM USAGE ACCOUNTING
+# -------------------------------
+def usage_count(usage, name):
+    # The SDK returns a model object, but usage from a raw stream chunk may be a plain dict.
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return value or 0
+
+
+def record_llm_usage(user, usage):
+    """
+    Adds one LLM response's token usage to the user's total for today (checked by core/throttling.py).
+    """
+    today = timezone.localdate()
+    LLMUsage.objects.get_or_create(user=user, day=today)
+    LLMUsage.objects.filter(user=user, day=today).update(
+        requests=F("requests") + 1,
+        prompt_tokens=F("prompt_tokens") + usage_count(usage, "prompt_tokens"),
+        completion_tokens=F("completion_tokens") + usage_count(usage, "completion_tokens"),
+        total_tokens=F("total_tokens") + usage_count(usage, "total_tokens"),
+    )
+
+
+# -------------------------------
+# ANALYSIS RESULT CACHE
+# -------------------------------
+def normalize_text(text):
+    """
+    Collapses all runs of whitespace so formatting-only differences hash the same.
+    """
+    return " ".join(text.split())
+
+
+def analysis_cache_key(resume_text, job_description_text, model=None, version=PROMPT_VERSION):
+    """
+    Returns a content hash identifying one analysis: inputs, model(s) and prompt version.
+    """
+    model = model or llm_router.model_key
+    digest = hashlib.sha256()
+    for part in (model, str(version), normalize_text(resume_text), normalize_text(job_description_text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_cached_analysis(cache_key):
+    """
+    Looks up a previous result in the analysis cache, falling back to stored Analysis rows.
+    """
+    cache = caches["analysis"]
+    result = cache.get(cache_key)
+    if result is not None:
+        metrics.CACHE_LOOKUPS.inc(result="hit")
+        return result
+
+    result = (
+        Analysis.objects.filter(cache_key=cache_key)
+        .order_by("-analyzed_at")
+        .values_list("result", flat=True)
+        .first()
+    )
+    if result is not None:
+        cache.set(cache_key, result)
+    metrics.CACHE_LOOKUPS.inc(result="miss" if result is None else "database")
+    return result
+
+
+def analyze_resume_cached(resume_text, job_description_text, on_usage=None):
+    """
+    Returns (result, cache_hit, cache_key), only calling the LLM when no previous result exists.
+    """
+    cache_key = analysis_cache_key(resume_text, job_description_text)
+    result = get_cached_analysis(cache_key)
+    if result is not None:
+        return result, True, cache_key
+
+    result = analyze_resume_with_llama(resume_text, job_description_text, on_usage=on_usage)
+    if result:
+        caches["analysis"].set(cache_key, result)
+    return result, False, cache_key
+
+
+# -------------------------------
+# SEMANTIC MATCHING INDEX
+# -------------------------------
+# One VectorIndex of resume texts and one of job description texts (see core/vector_index.py),
+# kept up to date as resumes are uploaded and job descriptions are stored.
+_vector_indexes = {}
+_vector_indexes_lock = threading.Lock()
+
+
+def get_vector_index(name):
+    """
+    Returns this process's VectorIndex called `name` ("resumes" or "job_descriptions").
+    """
+    key = (settings.VECTOR_INDEX_DIR, name)
+    with _vector_indexes_lock:
+        if key not in _vector_indexes:
+            _vector_indexes[key] = vector_index.VectorIndex(settings.VECTOR_INDEX_DIR, name)
+        return _vector_indexes[key]
+
+
+def index_resume(resume, text=None):
+    text = text or get_resume_text(resume)
+    if not text:
+        return
+    try:
+        get_vector_index("resumes").add(resume.pk, resume.user_id, vector_index.embed(text))
+    except OSError as e:
+        logger.error("❌ Could not index resume %s: %s", resume.pk, e)
+
+
+def index_resumes(resumes_and_texts):
+    """
+    Indexes many (resume, text) pairs at once, e.g. after a bulk import.
+    """
+    rows = [(resume.pk, resume.user_id, vector_index.embed(text)) for resume, text in resumes_and_texts if text]
+    try:
+        get_vector_index("resumes").add_many(rows)
+    except OSError as e:
+        logger.error("❌ Could not index %d resumes: %s", len(rows), e)
+
+
+def index_job_description(job_description):
+    try:
+        get_vector_index("job_descriptions").add(
+            job_description.pk, job_description.user_id, vector_index.embed(job_description.text)
+        )
+    except OSError as e:
+        logger.error("❌ Could not index job description %s: %s", job_description.pk, e)
+
+
+def get_job_description(user, jd_text):
+    """
+    Returns the user's JobDescription row for this text, creating and indexing it the first
+    time the text is seen. Texts that differ only in whitespace share one row.
+    """
+    job_description, created = JobDescription.objects.get_or_create(
+        user=user, content_hash=JobDescription.hash_text(jd_text), defaults={"text": jd_text}
+    )
+    if created:
+        index_job_description(job_description)
+    return job_description
+
+
+def match_job_descriptions(resume, k):
+    """
+    Returns up to k (JobDescription, similarity) pairs of the resume owner's stored job
+    descriptions, most similar first. No LLM call is made.
+    """
+    resume_text = get_resume_text(resume)
+    if not resume_text:
+        raise AnalysisError("Could not extract text from PDF.")
+    hits = get_vector_index("job_descriptions").search(vector_index.embed(resume_text), k, owner_id=resume.user_id)
+    found = JobDescription.objects.in_bulk([item_id for item_id, _ in hits])
+    return [(found[item_id], score) for item_id, score in hits if item_id in found]
+
+
+def match_resumes(job_description, k):
+    """
+    Returns up to k (Resume, similarity) pairs of the JD owner's resumes, most similar first.
+    """
+    hits = get_vector_index("resumes").search(
+        vector_index.embed(job_description.text), k, owner_id=job_description.user_id
+    )
+    found = Resume.objects.in_bulk([item_id for item_id, _ in hits])
+    return [(found[item_id], score) for item_id, score in hits if item_id in found]
+
+
+# -------------------------------
+# BULK IMPORT
+# -------------------------------
+def bulk_store_resumes(user, files):
+    """
+    Stores a batch of already-read resumes for `user` with a few bulk queries, the
+    bulk counterpart of store_resume followed by prepare_resume. `files` is a list of
+    (sha256, file name, PDF bytes, extracted text or None). Files the user already has,
+    and repeats within the batch, are skipped. Returns the number of resumes created.
+    """
+    by_hash = {}
+    names = {}
+    for sha256, name, data, text in files:
+        by_hash.setdefault(sha256, (data, text))
+        names.setdefault(sha256, os.path.basename(name)[:255])
+    existing = set(Resume.objects.filter(user=user, content_hash__in=by_hash).values_list("content_hash", flat=True))
+    new = {sha256: item for sha256, item in by_hash.items() if sha256 not in existing}
+    if not new:
+        return 0
+
+    blobs = ResumeBlob.objects.in_bulk(new, field_name="sha256")
+    stored = {}
+    missing = []
+    for sha256, (data, text) in new.items():
+        if sha256 in blobs:
+            continue
+        stored[sha256] = default_storage.save(blob_path(sha256), ContentFile(data))
+        missing.append(ResumeBlob(
+            sha256=sha256,
+            file=stored[sha256],
+            size=len(data),
+            extracted_text=text or "",
+            extractor_version=EXTRACTOR_VERSION if text else 0,
+            profile=profiles.build_profile(text) if text else {},
+        ))
+    ResumeBlob.objects.bulk_create(missing, ignore_conflicts=True)
+    blobs = ResumeBlob.objects.in_bulk(new, field_name="sha256")
+    for sha256, name in stored.items():
+        # A concurrent upload created this blob first; keep its file and drop ours.
+        if blobs[sha256].file.name != name:
+            default_storage.delete(name)
+
+    with transaction.atomic():
+        # Locked like add_blob_reference does; a blob collected since the lookup above means starting over.
+        locked = list(ResumeBlob.objects.select_for_update().filter(sha256__in=new).values_list("pk", flat=True))
+        collected = len(locked) < len(new)
+        if not collected:
+            resumes = Resume.objects.bulk_create([
+                Resume(user=user, blob=blobs[sha256], content_hash=sha256, file=blobs[sha256].file.name, name=names[sha256])
+                for sha256 in new
+            ])
+            ResumeBlob.objects.filter(sha256__in=new).update(ref_count=F("ref_count") + 1)
+    if collected:
+        return bulk_store_resumes(user, files)
+
+    texts = {sha256: text or blobs[sha256].extracted_text for sha256, (_, text) in new.items()}
+    index_resumes([(resume, texts[resume.content_hash]) for resume in resumes])
+    return len(resumes)
+
+
+# -------------------------------
+# RESUME PRE-WARMING
+# -------------------------------
+# Everything an analysis needs from the resume alone is prepared right after upload,
+# in a background thread, while the user is still pasting the job description:
+# the extracted text, the vector index entry, the pre-scorer's tokens and skills, and
+# the condensed profile with its compacted prompt text. Analyze is then left with the job-description side.
+_prewarm_pool = None
+_prewarm_pool_lock = threading.Lock()
+# Pre-warms running in this process, by blob hash (see get_resume_text).
+_prewarming = {}
+_prewarming_lock = threading.Lock()
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def get_resume_features(resume_text):
+    """
+    Returns scoring.resume_features(resume_text), cached per text.
+    """
+    key = f"resume-features:{scoring.SCORER_VERSION}:{text_digest(resume_text)}"
+    features = caches["default"].get(key)
+    if features is None:
+        features = scoring.resume_features(resume_text)
+        caches["default"].set(key, features, settings.RESUME_PREWARM_TTL)
+    return features
+
+
+def get_compacted_resume(resume_text):
+    """
+    Returns the resume text as compacted for the prompt, cached per text.
+    """
+    budget = settings.PROMPT_RESUME_TOKEN_BUDGET
+    key = f"resume-compacted:{PROMPT_VERSION}:{budget}:{text_digest(resume_text)}"
+    compacted = caches["default"].get(key)
+    if compacted is None:
+        compacted = compaction.compact(resume_text, budget, label="resume")
+        caches["default"].set(key, compacted, settings.RESUME_PREWARM_TTL)
+    return compacted
+
+
+def prepare_resume(resume):
+    """
+    Does the resume-side work of an analysis ahead of time. Returns the resume text,
+    or None if it could not be extracted.
+    """
+    text = get_resume_text(resume, wait_for_prewarm=False)
+    if not text:
+        return None
+    index_resume(resume, text)
+    get_resume_features(text)
+    get_compacted_resume(get_resume_prompt_text(resume, text))
+    return text
+
+
+def get_prewarm_pool():
+    global _prewarm_pool
+    with _prewarm_pool_lock:
+        if _prewarm_pool is None:
+            _prewarm_pool = ThreadPoolExecutor(
+                max_workers=settings.RESUME_PREWARM_WORKERS, thread_name_prefix="prewarm"
+            )
+        return _prewarm_pool
+
+
+def run_prewarm(resume_id, content_hash):
+    try:
+        resume = Resume.objects.select_related("blob").filter(pk=resume_id).first()
+        if resume:
+            prepare_resume(resume)
+    except Exception:
+        logger.exception("❌ Could not pre-warm resume %s", resume_id)
+    finally:
+        with _prewarming_lock:
+            _prewarming.pop(content_hash, None)
+        # Pool threads outlive their tasks; don't keep a database connection open in each.
+        connection.close()
+
+
+def prewarm_resume(resume):
+    """
+    Runs prepare_resume in the background once the current transaction commits.
+    With RESUME_PREWARM_WORKERS = 0 it runs right away, in the caller's thread.
+    """
+    if not settings.RESUME_PREWARM_WORKERS:
+        prepare_resume(resume)
+        return
+
+    def submit():
+        with _prewarming_lock:
+            if resume.content_hash in _prewarming:
+                return
+            future = get_prewarm_pool().submit(run_prewarm, resume.pk, resume.content_hash)
+            if resume.content_hash:
+                _prewarming[resume.content_hash] = future
+
+    transaction.on_commit(submit)
+
+
+# -------------------------------
+# ANALYSIS PIPELINE
+# -------------------------------
+# "full" always asks the LLM, "fast" returns the local pre-score immediately,
+# and "gated" only asks the LLM when the pre-score reaches PRESCORE_LLM_THRESHOLD.
+ANALYSIS_MODES = ("full", "fast", "gated")
+
+
+def count_analysis(mode, outcome):
+    metrics.ANALYSES.inc(mode=mode, outcome=outcome)
+    metrics.annotate(mode=mode, outcome=outcome)
+
+
+def prescore_cache_key(resume_text, job_description_text):
+    return analysis_cache_key(resume_text, job_description_text, model="local-prescore", version=scoring.SCORER_VERSION)
+
+
+def gate_with_prescore(resume_text, jd_text):
+    """
+    Returns (result, cache_key) for a local pre-score below PRESCORE_LLM_THRESHOLD,
+    meaning the LLM call can be skipped, or None if the pair deserves a full analysis.
+    """
+    with metrics.stage("prescore"):
+        result = scoring.prescore(resume_text, jd_text, get_resume_features(resume_text))
+    if result["suitability_score"] >= settings.PRESCORE_LLM_THRESHOLD:
+        return None
+    return result, prescore_cache_key(resume_text, jd_text)
+
+
+def run_prescore(resume, jd_text):
+    """
+    Returns the local pre-score for a resume ("fast" mode). Nothing is stored.
+    """
+    resume_text = get_resume_text(resume)
+    if not resume_text:
+        raise AnalysisError("Could not extract text from PDF.")
+    with metrics.stage("prescore"):
+        result = scoring.prescore(resume_text, jd_text, get_resume_features(resume_text))
+    count_analysis("fast", "prescored")
+    return result
+
+
+def save_analysis(user, resume, jd_text, result, cache_hit, cache_key):
+    """
+    Persists an analysis result. Returns (analysis, cache_hit, created); created is False
+    when an identical earlier analysis of this resume is returned instead of writing a new row.
+    """
+    existing = (
+        Analysis.objects.filter(user=user, resume=resume, cache_key=cache_key)
+        .select_related("job_description")
+        .order_by("-analyzed_at")
+        .first()
+    )
+    if existing:
+        return existing, cache_hit, False
+
+    with metrics.stage("jd_insert"):
+        job_description = get_job_description(user, jd_text)
+    with metrics.stage("analysis_insert"):
+        analysis = Analysis.objects.create(
+            user=user,
+            resume=resume,
+            job_description=job_description,
+            result=result,
+            cache_key=cache_key,
+        )
+        record_analysis_skills([analysis])
+    return analysis, cache_hit, True
+
+
+def record_analysis_skills(analyses):
+    """
+    Stores the matching and missing skills of saved analyses as AnalysisSkill rows,
+    creating Skill rows for names not seen before. A fixed number of queries per call.
+    """
+    links = []
+    labels = {}
+    for analysis in analyses:
+        for kind, name, label in analysis.result_skills():
+            links.append((analysis.pk, kind, name))
+            labels.setdefault(name, label)
+    if not links:
+        return
+    Skill.objects.bulk_create([Skill(name=name, label=label) for name, label in labels.items()], ignore_conflicts=True)
+    skill_ids = dict(Skill.objects.filter(name__in=labels).values_list("name", "id"))
+    AnalysisSkill.objects.bulk_create(
+        [AnalysisSkill(analysis_id=pk, kind=kind, skill_id=skill_ids[name]) for pk, kind, name in links],
+        ignore_conflicts=True,
+    )
+
+
+def parse_since(value):
+    """
+    Parses the start of a reporting period: an ISO 8601 datetime, or a date meaning
+    its midnight in the current time zone. Returns None if the value is neither.
+    """
+    try:
+        day = parse_date(value)
+        moment = datetime.combine(day, datetime.min.time()) if day else parse_datetime(value)
+    except ValueError:
         return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
 
+
+# -------------------------------
+# SINGLE-FLIGHT AND IDEMPOTENCY
+# -------------------------------
+def analysis_fingerprint(resume, jd_text, mode):
+    """
+    Identifies an analyze request by what it asks for: the resume, the job description's content and the mode.
+    """
+    digest = hashlib.sha256()
+    for part in (str(resume.pk), JobDescription.hash_text(jd_text), mode):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def claim_analysis_request(user, key, fingerprint):
+    """
+    Returns (row, leader) for an AnalysisRequest key. leader is True when the caller inserted the row,
+    or took over one that failed, expired or was left running by a leader that died, and must now
+    run the analysis. The unique (user, key) constraint and conditional UPDATEs make sure only
+    one caller in any process wins.
+    """
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                return AnalysisRequest.objects.create(user=user, key=key, fingerprint=fingerprint, started_at=now), True
+        except IntegrityError:
+            pass
+
+        row = AnalysisRequest.objects.filter(user=user, key=key).first()
+        if row is None:
+            # Purged in between; try the insert again.
+            continue
+        stale = now - timedelta(seconds=settings.ANALYSIS_SINGLE_FLIGHT_STALE_AFTER)
+        if (
+            row.status == AnalysisRequest.Status.FAILED
+            or (row.status == AnalysisRequest.Status.DONE and row.expires_at <= now)
+            or (row.status == AnalysisRequest.Status.RUNNING and row.started_at < stale)
+        ):
+            taken = AnalysisRequest.objects.filter(pk=row.pk, status=row.status, started_at=row.started_at).update(
+                status=AnalysisRequest.Status.RUNNING, fingerprint=fingerprint, started_at=now, expires_at=None,
+                analysis=None, cache_hit=False, created=False, error="", retry_after=None,
+            )
+            if taken:
+                row.refresh_from_db()
+                return row, True
+            continue
+        if row.fingerprint != fingerprint:
+            raise IdempotencyKeyReused()
+        return row, False
+
+
+class SingleFlight:
+    """
+    Coalesces identical analyze requests onto one computation, across processes.
+
+    Each request claims an AnalysisRequest row per key: its Idempotency-Key, if it sent one, then
+    the fingerprint of what it asks for. A request that claims every key leads: it runs the analysis
+    and records the outcome on its rows. Any other request polls the row it could not claim and
+    returns the leader's outcome, error included, instead of calling the LLM a second time.
+
+        flight = SingleFlight(user, resume, jd_text, mode, idempotency_key)
+        analysis, cache_hit, created = flight.run(lambda: run_analysis(user, resume, jd_text, mode))
+    """
+
+    def __init__(self, user, resume, jd_text, mode, idempotency_key=None):
+        self.user = user
+        self.fingerprint = analysis_fingerprint(resume, jd_text, mode)
+        self.keys = [f"flight:{self.fingerprint}"]
+        if idempotency_key:
+            self.keys.insert(0, f"idempotency:{idempotency_key}")
+        self.held = []
+        self.waiting = None
+        self.outcome = None
+        self.delay = 0.05
+
+    def joined(self):
+        """
+        Makes one round of progress. Returns False while waiting on another request, and True
+        once this request leads every key or has taken the outcome (self.outcome) of another.
+        """
+        if self.waiting is not None:
+            row = AnalysisRequest.objects.filter(pk=self.waiting.pk).select_related("analysis__job_description").first()
+            stale = timezone.now() - timedelta(seconds=settings.ANALYSIS_SINGLE_FLIGHT_STALE_AFTER)
+            if row is not None and row.status != AnalysisRequest.Status.RUNNING:
+                self.share(row, "coalesced")
+                return True
+            if row is not None and row.started_at == self.waiting.started_at and row.started_at >= stale:
+                return False
+            # Its leader died, or another request took it over: claim the key again.
+            self.waiting = None
+
+        while len(self.held) < len(self.keys):
+            row, leader = claim_analysis_request(self.user, self.keys[len(self.held)], self.fingerprint)
+            if leader:
+                self.held.append(row)
+            elif row.status == AnalysisRequest.Status.DONE:
+                self.share(row, "replayed")
+                return True
+            else:
+                self.waiting = row
+                return False
+        metrics.SINGLE_FLIGHT.inc(result="led")
+        return True
+
+    def share(self, row, result):
+        """Takes the outcome recorded on another request's row, and records it on the rows this request holds."""
+        metrics.SINGLE_FLIGHT.inc(result=result)
+        if row.status == AnalysisRequest.Status.FAILED:
+            self.outcome = LLMUnavailableError(row.retry_after) if row.retry_after is not None else AnalysisError(row.error)
+            self.fail(self.outcome)
+            return
+        # An idempotent retry gets the original response; a request that merely coincided did not create the analysis.
+        created = row.created and row.key.startswith("idempotency:")
+        self.outcome = (row.analysis, row.cache_hit, created)
+        self.finish(*self.outcome)
+
+    def next_delay(self):
+        delay = self.delay
+        self.delay = min(self.delay * 2, settings.ANALYSIS_SINGLE_FLIGHT_POLL_INTERVAL)
+        return delay
+
+    def shared_outcome(self):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+    def join(self):
+        """
+        Waits until this request leads or another one's outcome is known. Returns that shared
+        (analysis, cache_hit, created), raising its error, or None when this request must compute it.
+        """
+        while not self.joined():
+            time.sleep(self.next_delay())
+        return self.shared_outcome()
+
+    async def ajoin(self):
+        while not await sync_to_async(self.joined)():
+            await asyncio.sleep(self.next_delay())
+        return self.shared_outcome()
+
+    def update_held(self, **fields):
+        # Only rows still running under this request's claim: a waiter may have taken over a stale one.
+        for row in self.held:
+            AnalysisRequest.objects.filter(
+                pk=row.pk, status=AnalysisRequest.Status.RUNNING, started_at=row.started_at
+            ).update(**fields)
+
+    def finish(self, analysis, cache_hit, created):
+        now = timezone.now()
+        for row in self.held:
+            ttl = settings.IDEMPOTENCY_KEY_TTL if row.key.startswith("idempotency:") else 0
+            AnalysisRequest.objects.filter(
+                pk=row.pk, status=AnalysisRequest.Status.RUNNING, started_at=row.started_at
+            ).update(
+                status=AnalysisRequest.Status.DONE, analysis=analysis, cache_hit=cache_hit, created=created,
+                expires_at=now + timedelta(seconds=ttl),
+            )
+
+    def fail(self, exc):
+        # Failures are shared with current waiters but not kept: the next request tries again.
+        if isinstance(exc, AnalysisError):
+            error, retry_after = str(exc), getattr(exc, "retry_after", None)
+        else:
+            error, retry_after = "Unexpected error while analyzing resume.", None
+        self.update_held(status=AnalysisRequest.Status.FAILED, error=error, retry_after=retry_after,
+                         expires_at=timezone.now())
+
+    def run(self, compute):
+        """Returns the shared outcome, or leads: returns compute()'s (analysis, cache_hit, created) and records it."""
+        shared = self.join()
+        if shared is not None:
+            return shared
+        try:
+            outcome = compute()
+        except BaseException as e:
+            self.fail(e)
+            raise
+        self.finish(*outcome)
+        return outcome
+
+    async def arun(self, compute):
+        """Async version of run; compute returns an awaitable."""
+        shared = await self.ajoin()
+        if shared is not None:
+            return shared
+        try:
+            outcome = await compute()
+        except BaseException as e:
+            # Also covers a cancelled request (client gone), so its waiters do not wait for the stale timeout.
+            await sync_to_async(self.fail)(e)
+            raise
+        await sync_to_async(self.finish)(*outcome)
+        return outcome
+
+
+def run_analysis_once(user, resume, jd_text, mode="full", idempotency_key=None):
+    """
+    run_analysis, sharing the computation with identical concurrent requests and
+    returning the original outcome when an Idempotency-Key is sent again.
+    """
+    flight = SingleFlight(user, resume, jd_text, mode, idempotency_key)
+    return flight.run(lambda: run_analysis(user, resume, jd_text, mode))
+
+
+async def run_analysis_once_async(user, resume, jd_text, mode="full", idempotency_key=None):
+    flight = SingleFlight(user, resume, jd_text, mode, idempotency_key)
+    return await flight.arun(lambda: run_analysis_async(user, resume, jd_text, mode))
+
+
+def enqueue_analysis_job(user, resume, jd_text, mode, idempotency_key=None):
+    """
+    Queues an analysis job. Returns (job, created); with an Idempotency-Key already used
+    for this request, the job it queued is returned instead, unless that job failed.
+    """
+    if not idempotency_key:
+        return AnalysisJob.objects.create(user=user, resume=resume, jd_text=jd_text, mode=mode), True
+
+    while True:
+        job, created = AnalysisJob.objects.get_or_create(
+            user=user, idempotency_key=idempotency_key, defaults={"resume": resume, "jd_text": jd_text, "mode": mode}
+        )
+        if created:
+            return job, True
+        if (job.resume_id, JobDescription.hash_text(job.jd_text), job.mode) != (
+            resume.pk, JobDescription.hash_text(jd_text), mode
+        ):
+            raise IdempotencyKeyReused()
+        if job.status != AnalysisJob.Status.FAILED:
+            metrics.SINGLE_FLIGHT.inc(result="replayed")
+            return job, False
+        # A retry of a failed job queues a new one; the failed job gives up the key.
+        AnalysisJob.objects.filter(pk=job.pk, idempotency_key=idempotency_key).update(idempotency_key=None)
+
+
+def purge_analysis_requests():
+    """
+    Deletes AnalysisRequest rows that expired, or whose leader died while running them.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.ANALYSIS_SINGLE_FLIGHT_STALE_AFTER)
+    expired = AnalysisRequest.objects.filter(expires_at__lt=now).delete()[0]
+    abandoned = AnalysisRequest.objects.filter(status=AnalysisRequest.Status.RUNNING, started_at__lt=stale).delete()[0]
+    return expired + abandoned
+
+
+def run_analysis(user, resume, jd_text, mode="full"):
+    """
+    Runs extract -> analyze -> persist for one resume and job description.
+    Returns (analysis, cache_hit, created), see save_analysis.
+    """
+    resume_text = get_resume_text(resume)
+    if not resume_text:
+        raise AnalysisError("Could not extract text from PDF.")
+
+    if mode == "gated":
+        gated = gate_with_prescore(resume_text, jd_text)
+        if gated:
+            result, cache_key = gated
+            count_analysis(mode, "prescored")
+            return save_analysis(user, resume, jd_text, result, False, cache_key)
+
+    result, cache_hit, cache_key = analyze_resume_cached(
+        get_resume_prompt_text(resume, resume_text), jd_text, on_usage=lambda usage: record_llm_usage(user, usage)
+    )
+    if not result:
+        count_analysis(mode, "failed")
+        raise AnalysisError("Failed to get analysis from AI service.")
+
+    count_analysis(mode, "cache_hit" if cache_hit else "llm")
+    return save_analysis(user, resume, jd_text, result, cache_hit, cache_key)
+
+
+async def run_analysis_async(user, resume, jd_text, mode="full"):
+    """
+    Async version of run_analysis. Database and PDF work run in worker threads;
+    the LLM call runs on the event loop so many analyses can wait on it at once.
+    """
+    resume_text = await sync_to_async(get_resume_text)(resume)
+    if not resume_text:
+        raise AnalysisError("Could not extract text from PDF.")
+
+    if mode == "gated":
+        gated = gate_with_prescore(resume_text, jd_text)
+        if gated:
+            result, cache_key = gated
+            count_analysis(mode, "prescored")
+            return await sync_to_async(save_analysis)(user, resume, jd_text, result, False, cache_key)
+
+    prompt_text = await sync_to_async(get_resume_prompt_text)(resume, resume_text)
+    cache_key = analysis_cache_key(prompt_text, jd_text)
+    result = await sync_to_async(get_cached_analysis)(cache_key)
+    cache_hit = result is not None
+    if not cache_hit:
+        # Usage is collected on the event loop and written to the database afterwards, off the loop.
+        usages = []
+        result = await analyze_resume_with_llama_async(prompt_text, jd_text, on_usage=usages.append)
+        for usage in usages:
+            await sync_to_async(record_llm_usage)(user, usage)
+        if not result:
+            count_analysis(mode, "failed")
+            raise AnalysisError("Failed to get analysis from AI service.")
+        await caches["analysis"].aset(cache_key, result)
+
+    count_analysis(mode, "cache_hit" if cache_hit else "llm")
+    return await sync_to_async(save_analysis)(user, resume, jd_text, result, cache_hit, cache_key)
+
+
+async def stream_analysis(user, resume, jd_text, idempotency_key=None):
+    """
+    Async generator behind the streaming analyze endpoint. Yields ("field", {name: value})
+    as each top-level result field completes, then ("result", (analysis, cache_hit, created))
+    once the analysis is stored. A cached result, or the outcome of an identical request
+    (see SingleFlight), is replayed field by field immediately.
+    """
+    flight = SingleFlight(user, resume, jd_text, "full", idempotency_key)
+    shared = await flight.ajoin()
+    if shared is not None:
+        for name, value in shared[0].result.items():
+            yield "field", {name: value}
+        yield "result", shared
+        return
+
+    try:
+        async for event, payload in stream_new_analysis(user, resume, jd_text):
+            if event == "result":
+                await sync_to_async(flight.finish)(*payload)
+            yield event, payload
+    except BaseException as e:
+        # Includes the client closing the stream early.
+        await sync_to_async(flight.fail)(e)
+        raise
+
+
+async def stream_new_analysis(user, resume, jd_text):
+    resume_text = await sync_to_async(get_resume_text)(resume)
+    if not resume_text:
+        raise AnalysisError("Could not extract text from PDF.")
+
+    prompt_text = await sync_to_async(get_resume_prompt_text)(resume, resume_text)
+    cache_key = analysis_cache_key(prompt_text, jd_text)
+    result = await sync_to_async(get_cached_analysis)(cache_key)
+    cache_hit = result is not None
+
+    if cache_hit:
+        for name, value in result.items():
+            yield "field", {name: value}
+    else:
+        parser = streaming.JSONFieldStreamParser()
+        parts = []
+        usages = []
+        async for delta in stream_resume_analysis_with_llama(prompt_text, jd_text, on_usage=usages.append):
+            parts.append(delta)
+            fields = parser.feed(delta)
+            for name, value in fields.items():
+                yield "field", {name: value}
+        for usage in usages:
+            await sync_to_async(record_llm_usage)(user, usage)
+
+        result = parse_llm_content("".join(parts))
+        if result is None:
+            count_analysis("stream", "failed")
+            raise AnalysisError("Failed to get analysis from AI service.")
+        await caches["analysis"].aset(cache_key, result)
+
+    count_analysis("stream", "cache_hit" if cache_hit else "llm")
+    saved = await sync_to_async(save_analysis)(user, resume, jd_text, result, cache_hit, cache_key)
+    yield "result", saved
+
+
+def run_queued(queued_at, func, *args, **kwargs):
+    """
+    Runs func in a pool thread, recording how long it waited for a free thread.
+    """
+    metrics.observe_stage("llm_queue_wait", time.perf_counter() - queued_at)
+    return func(*args, **kwargs)
+
+
+def run_batch_analysis(user, resumes, jd_texts, parallelism, top_k=None):
+    """
+    Analyzes every resume against every job description and stores the results under one AnalysisBatch.
+
+    Identical JD texts share the user's single JobDescription row for that text. Cache lookups and all database
+    work stay on the calling thread; only the LLM calls for cache misses run concurrently,
+    at most `parallelism` at a time. With `top_k`, each job description is only analyzed
+    against its top_k most similar resumes (see vector_index.shortlist). Returns
+    (batch, errors), where errors lists the resume/JD pairs that could not be analyzed.
+    """
+    unique_jd_texts = {}
+    for text in jd_texts:
+        unique_jd_texts.setdefault(JobDescription.hash_text(text), text)
+    stored = JobDescription.objects.filter(user=user, content_hash__in=unique_jd_texts)
+    existing = set(stored.values_list("content_hash", flat=True))
+    JobDescription.objects.bulk_create(
+        [
+            JobDescription(user=user, text=text, content_hash=content_hash)
+            for content_hash, text in unique_jd_texts.items() if content_hash not in existing
+        ],
+        ignore_conflicts=True,
+    )
+    found = {job_description.content_hash: job_description for job_description in stored.all()}
+    job_descriptions = [found[content_hash] for content_hash in unique_jd_texts]
+    for job_description in job_descriptions:
+        if job_description.content_hash not in existing:
+            index_job_description(job_description)
+
+    extracted = []
+    errors = []
+    for resume in resumes:
+        resume_text = get_resume_text(resume)
+        if not resume_text:
+            errors.append({"resume_id": resume.pk, "error": "Could not extract text from PDF."})
+            continue
+        extracted.append((resume, resume_text, get_resume_prompt_text(resume, resume_text)))
+
+    if top_k:
+        shortlists = vector_index.shortlist(
+            [job_description.text for job_description in job_descriptions], [text for _, text, _ in extracted], top_k
+        )
+    else:
+        shortlists = [range(len(extracted))] * len(job_descriptions)
+
+    pairs = []
+    for job_description, shortlisted in zip(job_descriptions, shortlists):
+        for i in shortlisted:
+            resume, _, prompt_text = extracted[i]
+            cache_key = analysis_cache_key(prompt_text, job_description.text)
+            pairs.append((resume, prompt_text, job_description, cache_key))
+
+    results = {}
+    misses = {}
+    for _, prompt_text, job_description, cache_key in pairs:
+        if cache_key in results:
+            continue
+        results[cache_key] = get_cached_analysis(cache_key)
+        if results[cache_key] is None:
+            misses[cache_key] = (prompt_text, job_description.text)
+
+    # Pool threads only collect token usage; it is written to the database below, on this thread.
+    # Each call runs in a copy of this thread's context, so its stage timings reach the request's timing log.
+    usages = []
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as pool:
+        futures = {
+            cache_key: pool.submit(
+                contextvars.copy_context().run, run_queued, time.perf_counter(),
+                analyze_resume_with_llama, prompt_text, jd_text, on_usage=usages.append
+            )
+            for cache_key, (prompt_text, jd_text) in misses.items()
+        }
+        for cache_key, future in futures.items():
+            try:
+                results[cache_key] = future.result()
+            except LLMUnavailableError:
+                results[cache_key] = None
+            if results[cache_key]:
+                caches["analysis"].set(cache_key, results[cache_key])
+
+    for usage in usages:
+        record_llm_usage(user, usage)
+
+    batch = AnalysisBatch.objects.create(user=user)
+    analyses = []
+    for resume, _, job_description, cache_key in pairs:
+        if not results[cache_key]:
+            count_analysis("batch", "failed")
+            errors.append({
+                "resume_id": resume.pk,
+                "job_description_id": job_description.pk,
+                "error": "Failed to get analysis from AI service.",
+            })
+            continue
+        count_analysis("batch", "llm" if cache_key in misses else "cache_hit")
+        analysis = Analysis(
+            user=user,
+            resume=resume,
+            job_description=job_description,
+            result=results[cache_key],
+            cache_key=cache_key,
+            batch=batch,
+        )
+        analysis.fill_result_columns()
+        analyses.append(analysis)
+    Analysis.objects.bulk_create(analyses, batch_size=500)
+    record_analysis_skills(analyses)
+    return batch, errors
+
+
+# -------------------------------
+# DATABASE-BACKED JOB QUEUE
+# -------------------------------
+def claim_next_job():
+    """
+    Atomically moves the oldest queued job to "running" and returns it, or None if the queue is empty.
+    The conditional UPDATE means two workers can never claim the same job.
+    """
+    while True:
+        job = AnalysisJob.objects.filter(status=AnalysisJob.Status.QUEUED).order_by("created_at").first()
+        if job is None:
+            return None
+
+        claimed = AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.Status.QUEUED).update(
+            status=AnalysisJob.Status.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def process_job(job):
+    """
+    Runs the analysis pipeline for a claimed job and records the outcome on it.
+    """
+    if job.started_at:
+        metrics.observe_stage("job_queue_wait", (job.started_at - job.created_at).total_seconds())
+    try:
+        # Duplicate jobs (a double-clicked submit) share one analysis, even when different workers claim them.
+        analysis, cache_hit, _ = run_analysis_once(job.user, job.resume, job.jd_text, job.mode)
+        job.analysis = analysis
+        job.cache_hit = cache_hit
+        job.status = AnalysisJob.Status.DONE
+    except AnalysisError as e:
+        job.error = str(e)
+        job.status = AnalysisJob.Status.FAILED
     except Exception as e:
-        print("❌ Groq API error:", e)
+        logger.error("❌ Analysis job %s failed: %s", job.pk, e)
+        job.error = "Unexpected error while analyzing resume."
+        job.status = AnalysisJob.Status.FAILED
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["analysis", "cache_hit", "error", "status", "finished_at"])
+    return job
+
+
+def process_next_job():
+    """
+    Claims and processes one job. Returns the job, or None if nothing was queued.
+    """
+    job = claim_next_job()
+    if job is None:
         return None
+    return process_job(job)
+
+
+def requeue_stale_jobs(stale_after_seconds):
+    """
+    Puts "running" jobs back on the queue if their worker died before finishing them.
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after_seconds)
+    return AnalysisJob.objects.filter(status=AnalysisJob.Status.RUNNING, started_at__lt=cutoff).update(
+        status=AnalysisJob.Status.QUEUED, started_at=None
+    )
@@ -0,0 +1,25 @@
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import services
+from .models import JobDescription, Resume, ResumeBlob
+
+
+# Releases a deleted resume's reference on its blob, including deletes cascaded from a User.
+# Blobs that drop to zero references are removed later by the gc_resume_blobs command.
+@receiver(post_delete, sender=Resume)
+def release_resume_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        ResumeBlob.objects.filter(pk=instance.blob_id).update(ref_count=F('ref_count') - 1)
+
+
+# Keeps deleted resumes and job descriptions out of the semantic matching index.
+@receiver(post_delete, sender=Resume)
+def unindex_resume(sender, instance, **kwargs):
+    services.get_vector_index('resumes').remove(instance.pk)
+
+
+@receiver(post_delete, sender=JobDescription)
+def unindex_job_description(sender, instance, **kwargs):
+    services.get_vector_index('job_descriptions').remove(instance.pk)
@@ -0,0 +1,70 @@
+import json
+
+# Helpers for streaming an analysis to the client as Server-Sent Events
+# while the LLM is still generating it.
+
+
+class JSONFieldStreamParser:
+    """
+    Incrementally parses a streamed JSON object and reports each top-level field
+    as soon as its value is complete, e.g. "suitability_score" long before
+    "tailored_suggestions" has finished generating. Text before the opening brace
+    (such as a markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.segment_start = None
+        self.closed = False
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of model output and returns a dict of the fields completed by it.
+        """
+        self.buffer += chunk
+        fields = {}
+        while self.position < len(self.buffer) and not self.closed:
+            ch = self.buffer[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.depth > 0
+            elif ch in "{[":
+                self.depth += 1
+                if self.depth == 1:
+                    self.segment_start = self.position + 1
+            elif ch in "}]" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    fields.update(self._parse_segment(self.position))
+                    self.closed = True
+            elif ch == "," and self.depth == 1:
+                fields.update(self._parse_segment(self.position))
+                self.segment_start = self.position + 1
+            self.position += 1
+        return fields
+
+    def _parse_segment(self, end):
+        segment = self.buffer[self.segment_start:end].strip()
+        if not segment:
+            return {}
+        try:
+            return json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            return {}
+
+
+def sse_event(event, data):
+    """
+    Formats one Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
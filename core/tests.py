@@ -1,3 +1,1399 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import benchmarks, compaction, llm_backends, metrics, pdf_extraction, profiles, scoring, services, vector_index
+
+from .fake_llm import FakeLLMServer, DEFAULT_ANALYSIS
+from .streaming import JSONFieldStreamParser
+from .models import (
+    User, Resume, ResumeBlob, ResumeUpload, JobDescription, Analysis, AnalysisJob, AnalysisRequest, LLMUsage, UserQuota
+)
+
+# A tiny stand-in for a PDF upload. Text extraction is mocked in these tests,
+# so the bytes only need to look like a PDF to the code paths that hash or sniff them.
+FAKE_PDF = b"%PDF-1.4\n% fake resume for tests\n%%EOF\n"
+
+FAKE_RESULT = {
+    'suitability_score': 80,
+    'matching_skills': ['Python'],
+    'missing_skills': ['Kubernetes'],
+    'suggested_title': 'Backend Engineer',
+    'tailored_suggestions': 'Mention your Django projects.',
+}
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def fake_server_router(server):
+    """An LLM router with one Groq backend pointed at a FakeLLMServer."""
+    return services.build_llm_router([
+        {'type': 'groq', 'name': 'fake-groq', 'model': services.MODEL_NAME, 'base_url': server.url, 'api_key': 'test'}
+    ])
+
+
+def build_pdf(pages):
+    """Builds a minimal but valid PDF with one line of Helvetica text per page."""
+    return benchmarks.build_pdf([[text] for text in pages])
+
+
+# Base class that stores uploaded files (and the vector index) in a throwaway directory instead of the repo's folders.
+# Uploads are pre-warmed inline, since a background thread cannot see the test's transaction.
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, VECTOR_INDEX_DIR=os.path.join(MEDIA_ROOT, 'vector_index'),
+                   RESUME_PREWARM_WORKERS=0)
+class MediaTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pw-12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        caches['analysis'].clear()
+        caches['default'].clear()
+        for name in ('resumes', 'job_descriptions'):
+            services.get_vector_index(name).clear()
+
+    def make_resume(self, content=FAKE_PDF, name='resume.pdf', user=None):
+        resume, _ = services.store_resume(user or self.user, SimpleUploadedFile(name, content))
+        return resume
+
+    def make_extracted_resume(self, text='Python developer with Django experience'):
+        # Distinct text gets distinct bytes, so each resume has its own blob and cached text.
+        resume = self.make_resume(FAKE_PDF + text.encode())
+        resume.blob.extracted_text = text
+        resume.blob.extractor_version = services.EXTRACTOR_VERSION
+        resume.blob.save()
+        return resume
+
+
+class ResumeTextCacheTests(MediaTestCase):
+    def test_text_is_extracted_once_and_reused(self):
+        resume = self.make_resume()
+        with mock.patch.object(services, 'extract_resume_text', return_value='Python developer') as extract:
+            self.assertEqual(services.get_resume_text(resume), 'Python developer')
+            self.assertEqual(services.get_resume_text(Resume.objects.get(pk=resume.pk)), 'Python developer')
+        self.assertEqual(extract.call_count, 1)
+
+        resume.refresh_from_db()
+        self.assertEqual(resume.blob.extractor_version, services.EXTRACTOR_VERSION)
+        self.assertEqual(resume.content_hash, resume.blob.sha256)
+
+    def test_new_extractor_version_invalidates_cached_text(self):
+        resume = self.make_resume()
+        with mock.patch.object(services, 'extract_resume_text', return_value='old text'):
+            services.get_resume_text(resume)
+
+        with mock.patch.object(services, 'EXTRACTOR_VERSION', services.EXTRACTOR_VERSION + 1), \
+                mock.patch.object(services, 'extract_resume_text', return_value='new text') as extract:
+            self.assertEqual(services.get_resume_text(resume), 'new text')
+        extract.assert_called_once()
+
+
+class AnalysisResultCacheTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.resume = self.make_extracted_resume()
+
+    def analyze(self, jd_text='Backend engineer, Python and Kubernetes'):
+        return self.client.post('/api/analyze/', {'resume_id': self.resume.id, 'jd_text': jd_text}, format='json')
+
+    def test_repeat_submission_is_served_from_cache(self):
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as llm:
+            first = self.analyze()
+            second = self.analyze('Backend engineer,   Python and Kubernetes\n')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertFalse(first.data['cache_hit'])
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.data['cache_hit'])
+        self.assertEqual(second.data['id'], first.data['id'])
+        llm.assert_called_once()
+        self.assertEqual(Analysis.objects.count(), 1)
+        self.assertEqual(JobDescription.objects.count(), 1)
+
+    def test_job_description_is_stored_once_and_reusable_by_id(self):
+        other = self.make_extracted_resume('Go developer with Kubernetes experience')
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT):
+            first = self.analyze()
+            second = self.client.post(
+                '/api/analyze/', {'resume_id': other.id, 'job_description_id': first.data['job_description_id']},
+                format='json'
+            )
+        self.assertEqual(second.status_code, 201, second.data)
+        self.assertEqual(second.data['job_description_id'], first.data['job_description_id'])
+        self.assertEqual(JobDescription.objects.count(), 1)
+
+        history = self.client.get(f"/api/history/?job_description_id={first.data['job_description_id']}")
+        self.assertEqual({item['id'] for item in history.data['results']}, {first.data['id'], second.data['id']})
+
+        bob = User.objects.create_user(username='bob', password='pw-12345')
+        self.client.force_authenticate(bob)
+        response = self.client.post(
+            '/api/analyze/', {'resume_id': self.make_resume(user=bob).id, 'job_description_id': first.data['job_description_id']},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_stored_analysis_is_used_when_cache_is_empty(self):
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT):
+            self.analyze()
+        caches['analysis'].clear()
+
+        with mock.patch.object(services, 'analyze_resume_with_llama') as llm:
+            response = self.analyze()
+        llm.assert_not_called()
+        self.assertTrue(response.data['cache_hit'])
+        self.assertEqual(response.data['result'], FAKE_RESULT)
+
+
+class AnalysisJobQueueTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.resume = self.make_extracted_resume()
+
+    def enqueue(self):
+        return self.client.post(
+            '/api/analyze/', {'resume_id': self.resume.id, 'jd_text': 'Python engineer', 'async': True}, format='json'
+        )
+
+    def test_async_request_is_queued_then_processed(self):
+        response = self.enqueue()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        job_url = f"/api/analyze/jobs/{response.data['id']}/"
+
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT):
+            self.assertIsNotNone(services.process_next_job())
+        self.assertIsNone(services.process_next_job())
+
+        job = self.client.get(job_url).data
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['analysis']['result'], FAKE_RESULT)
+
+    def test_failed_analysis_is_reported(self):
+        job_id = self.enqueue().data['id']
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=None):
+            services.process_next_job()
+
+        job = self.client.get(f'/api/analyze/jobs/{job_id}/').data
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Failed to get analysis from AI service.')
+
+    def test_jobs_are_private_to_their_owner(self):
+        job_id = self.enqueue().data['id']
+        other = User.objects.create_user(username='bob', password='pw-12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/analyze/jobs/{job_id}/').status_code, 404)
+
+    def test_stale_running_jobs_are_requeued(self):
+        self.enqueue()
+        job = services.claim_next_job()
+        AnalysisJob.objects.filter(pk=job.pk).update(started_at=job.started_at - timedelta(hours=1))
+
+        self.assertEqual(services.requeue_stale_jobs(600), 1)
+        self.assertEqual(AnalysisJob.objects.get(pk=job.pk).status, AnalysisJob.Status.QUEUED)
+
+
+class SingleFlightTests(MediaTestCase):
+    JD = 'Backend engineer, Python and Kubernetes'
+
+    def setUp(self):
+        super().setUp()
+        self.resume = self.make_extracted_resume()
+
+    def analyze(self, key=None, jd_text=JD, **extra):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post(
+            '/api/analyze/', {'resume_id': self.resume.id, 'jd_text': jd_text, **extra}, format='json', headers=headers
+        )
+
+    def in_flight(self, **fields):
+        """An identical request that another worker process is running."""
+        fingerprint = services.analysis_fingerprint(self.resume, self.JD, 'full')
+        fields.setdefault('started_at', timezone.now())
+        return AnalysisRequest.objects.create(user=self.user, key=f'flight:{fingerprint}', fingerprint=fingerprint, **fields)
+
+    def test_retry_with_idempotency_key_gets_the_original_response(self):
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as llm:
+            first = self.analyze('key-1')
+            retry = self.analyze('key-1')
+            other = self.analyze('key-2')
+        llm.assert_called_once()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.data), (first.status_code, first.data))
+        self.assertEqual(other.status_code, 200)
+        self.assertTrue(other.data['cache_hit'])
+
+        response = self.analyze('key-1', jd_text='Frontend engineer, React')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.analyze('x' * 256).status_code, 400)
+
+    def test_identical_request_waits_for_the_one_in_flight(self):
+        row = self.in_flight()
+
+        def leader_finishes(seconds):
+            # Stands in for the other process: it stores its analysis while this request polls.
+            analysis, _, _ = services.save_analysis(self.user, self.resume, self.JD, FAKE_RESULT, False, 'leader')
+            AnalysisRequest.objects.filter(pk=row.pk).update(
+                status=AnalysisRequest.Status.DONE, analysis=analysis, created=True, expires_at=timezone.now()
+            )
+
+        with mock.patch.object(services.time, 'sleep', side_effect=leader_finishes) as sleep, \
+                mock.patch.object(services, 'analyze_resume_with_llama') as llm:
+            response = self.analyze()
+        llm.assert_not_called()
+        sleep.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['result'], FAKE_RESULT)
+        self.assertEqual(Analysis.objects.count(), 1)
+
+        # Once done, the row is claimed by the next request, which runs its own analysis: the stand-in
+        # leader never filled the cache, so that request calls the LLM again.
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as llm:
+            self.assertEqual(self.analyze().status_code, 201)
+        llm.assert_called_once()
+
+    def test_waiters_share_the_leaders_failure(self):
+        row = self.in_flight()
+
+        def leader_fails(seconds):
+            AnalysisRequest.objects.filter(pk=row.pk).update(
+                status=AnalysisRequest.Status.FAILED, error='unavailable', retry_after=7, expires_at=timezone.now()
+            )
+
+        with mock.patch.object(services.time, 'sleep', side_effect=leader_fails), \
+                mock.patch.object(services, 'analyze_resume_with_llama') as llm:
+            response = self.analyze()
+        llm.assert_not_called()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+
+    def test_request_left_running_by_a_dead_leader_is_taken_over(self):
+        self.in_flight(started_at=timezone.now() - timedelta(hours=1))
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as llm:
+            response = self.analyze()
+        llm.assert_called_once()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AnalysisRequest.objects.get().status, AnalysisRequest.Status.DONE)
+        self.assertEqual(services.purge_analysis_requests(), 1)
+
+    def test_queued_job_is_not_queued_twice_for_one_key(self):
+        first = self.analyze('key-1', **{'async': True})
+        retry = self.analyze('key-1', **{'async': True})
+        self.assertEqual(retry.status_code, 202)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=None):
+            services.process_next_job()
+        # A failed job does not hold on to its key: retrying queues a new one.
+        retry = self.analyze('key-1', **{'async': True})
+        self.assertNotEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(retry.data['status'], 'queued')
+
+
+class BatchAnalyzeTests(MediaTestCase):
+    def test_batch_dedupes_job_descriptions_and_collects_results(self):
+        resumes = [self.make_extracted_resume(f'Resume number {i}') for i in range(3)]
+        jd_texts = ['Python engineer', '  Python   engineer ', 'Data analyst']
+
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as llm:
+            response = self.client.post(
+                '/api/analyze/batch/', {'resume_ids': [r.id for r in resumes], 'jd_texts': jd_texts}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(JobDescription.objects.count(), 2)
+        self.assertEqual(len(response.data['analyses']), 6)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(llm.call_count, 6)
+
+        # A later batch reuses the stored rows, whether it sends the text or the id.
+        jd_ids = sorted({item['job_description'] for item in response.data['analyses']})
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT):
+            again = self.client.post(
+                '/api/analyze/batch/',
+                {'resume_ids': [resumes[0].id], 'jd_texts': ['Python engineer'], 'job_description_ids': jd_ids},
+                format='json'
+            )
+        self.assertEqual(again.status_code, 201, again.data)
+        self.assertEqual(sorted(item['job_description'] for item in again.data['analyses']), jd_ids)
+        self.assertEqual(JobDescription.objects.count(), 2)
+
+        batch = self.client.get(f"/api/analyze/batch/{response.data['id']}/").data
+        self.assertEqual(len(batch['analyses']), 6)
+
+    def test_batch_accepts_only_job_description_ids(self):
+        resume = self.make_extracted_resume()
+        jd = JobDescription.objects.create(user=self.user, text='Python engineer')
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT):
+            response = self.client.post(
+                '/api/analyze/batch/', {'resume_ids': [resume.id], 'job_description_ids': [jd.id]}, format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([item['job_description'] for item in response.data['analyses']], [jd.id])
+
+        response = self.client.post('/api/analyze/batch/', {'resume_ids': [resume.id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('job_description_ids', response.data['error'])
+
+    def test_batch_logs_the_llm_stages_of_its_pairs(self):
+        resumes = [self.make_extracted_resume(f'Resume number {i}') for i in range(2)]
+
+        def analyze(*args, **kwargs):
+            metrics.observe_stage('llm_generation', 0.25)
+            return FAKE_RESULT
+
+        with mock.patch.object(services, 'analyze_resume_with_llama', side_effect=analyze), \
+                self.assertLogs('core.timing', level='INFO') as logs:
+            response = self.client.post(
+                '/api/analyze/batch/', {'resume_ids': [r.id for r in resumes], 'jd_texts': ['Python engineer']},
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, 201, response.data)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['stages']['llm_generation'], 0.5)
+
+    def test_batch_rejects_resume_ids_that_are_not_integers(self):
+        for resume_ids in (['abc'], [True], [1.5]):
+            response = self.client.post(
+                '/api/analyze/batch/', {'resume_ids': resume_ids, 'jd_texts': ['Python engineer']}, format='json'
+            )
+            self.assertEqual(response.status_code, 400, resume_ids)
+
+    def test_batch_rejects_resumes_of_other_users(self):
+        other = User.objects.create_user(username='bob', password='pw-12345')
+        foreign = self.make_resume(user=other)
+        response = self.client.post(
+            '/api/analyze/batch/', {'resume_ids': [foreign.id], 'jd_texts': ['Python engineer']}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncAnalysisTests(MediaTestCase):
+    def test_async_client_caps_concurrent_calls(self):
+        async def run_all(server):
+            pool = services.AsyncLLMPool(max_concurrency=2)
+            router = fake_server_router(server)
+            try:
+                return await asyncio.gather(*[
+                    services.analyze_resume_with_llama_async(f'resume {i}', 'jd', pool=pool, router=router)
+                    for i in range(4)
+                ])
+            finally:
+                await router.aclose()
+
+        with FakeLLMServer(latency=0.2) as server:
+            started = time.monotonic()
+            results = asyncio.run(run_all(server))
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(results, [DEFAULT_ANALYSIS] * 4)
+        self.assertEqual(len(server.requests), 4)
+        # Two at a time with 0.2s each means at least two rounds.
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    async def test_async_view_runs_analysis(self):
+        resume = await sync_to_async(self.make_extracted_resume)()
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+
+        with mock.patch.object(services, 'analyze_resume_with_llama_async', return_value=FAKE_RESULT):
+            response = await self.async_client.post(
+                '/api/analyze/async/',
+                {'resume_id': resume.id, 'jd_text': 'Python engineer'},
+                content_type='application/json',
+                headers={'Authorization': f'Bearer {token}'},
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['result'], FAKE_RESULT)
+        self.assertFalse(response.json()['cache_hit'])
+
+    async def test_async_view_rejects_malformed_bodies(self):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        for body in ([1, 2], {'resume_id': 'abc', 'jd_text': 'Python engineer'}):
+            response = await self.async_client.post(
+                '/api/analyze/async/', body, content_type='application/json',
+                headers={'Authorization': f'Bearer {token}'},
+            )
+            self.assertEqual(response.status_code, 400, body)
+
+    async def test_async_view_requires_authentication(self):
+        response = await self.async_client.post('/api/analyze/async/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class LLMResilienceTests(MediaTestCase):
+    def test_rate_limited_calls_are_retried(self):
+        with FakeLLMServer(fail_first=2, error_status=429, retry_after=0) as server:
+            with mock.patch.object(services, 'llm_router', fake_server_router(server)), \
+                    mock.patch.object(services, 'llm_circuit', services.CircuitBreaker(5, 30)):
+                result = services.analyze_resume_with_llama('resume', 'jd')
+
+        self.assertEqual(result, DEFAULT_ANALYSIS)
+        self.assertEqual(len(server.requests), 3)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        breaker = services.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.check()
+        breaker.record_failure()
+        with self.assertRaises(services.LLMUnavailableError):
+            breaker.check()
+        breaker.record_success()
+        breaker.check()
+
+    def test_probe_that_fails_with_a_non_transient_error_reopens_the_circuit(self):
+        breaker = services.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        breaker.opened_at -= 31
+
+        def slow_failing_probe(prompt, on_reply=None):
+            breaker.opened_at -= 20  # the probe took 20 of the 30 seconds
+            raise ValueError('bad request')
+
+        router = mock.Mock()
+        router.complete.side_effect = slow_failing_probe
+        with mock.patch.object(services, 'llm_circuit', breaker):
+            self.assertIsNone(services.analyze_resume_with_llama('resume', 'jd', router=router))
+
+        self.assertFalse(breaker.probing)
+        with self.assertRaises(services.LLMUnavailableError) as raised:
+            breaker.check()
+        self.assertGreater(raised.exception.retry_after, 29)
+
+        # A non-transient error outside a probe does not count towards opening the circuit.
+        breaker.record_success()
+        breaker.record_error()
+        breaker.check()
+
+    def test_open_circuit_returns_503(self):
+        resume = self.make_extracted_resume()
+        breaker = services.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        with mock.patch.object(services, 'llm_circuit', breaker):
+            response = self.client.post(
+                '/api/analyze/', {'resume_id': resume.id, 'jd_text': 'Python engineer'}, format='json'
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_almost_valid_json_is_repaired(self):
+        self.assertEqual(
+            services.parse_analysis_response('Here you go: {"suitability_score": 70, "matching_skills": ["Python",],} Thanks'),
+            {'suitability_score': 70, 'matching_skills': ['Python']},
+        )
+        self.assertEqual(
+            services.parse_analysis_response('```json\n{"suitability_score": 70, "missing_skills": ["Go", "Rust'),
+            {'suitability_score': 70, 'missing_skills': ['Go', 'Rust']},
+        )
+
+
+class LLMRouterTests(TestCase):
+    def router(self, *backends, **options):
+        options = {'hedge_percentile': 95, 'hedge_min_delay': 0.05, 'min_samples': 1, **options}
+        return llm_backends.LLMRouter(backends, **options)
+
+    def test_slow_call_is_hedged_and_the_faster_reply_wins(self):
+        # "usual" answers in 10ms, so its hedge is due after hedge_min_delay; this call takes a second.
+        usual = llm_backends.FakeBackend('usual', latency=1.0)
+        usual.stats.record(0.01, ok=True)
+        spare = llm_backends.FakeBackend('spare', latency=0.01)
+        spare.stats.record(0.2, ok=True)
+        events = []
+        router = self.router(usual, spare, on_event=lambda event, name, seconds: events.append((event, name)))
+
+        started = time.monotonic()
+        reply = asyncio.run(router.acomplete('prompt'))
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(reply.backend, 'spare')
+        self.assertEqual(json.loads(reply.content), DEFAULT_ANALYSIS)
+        self.assertIn(('hedge', 'spare'), events)
+        self.assertIn(('hedge_won', 'spare'), events)
+        self.assertEqual(usual.cancelled, 1)
+
+    def test_sync_hedge_that_loses_is_still_billed(self):
+        usual = llm_backends.FakeBackend('usual', latency=0.3)
+        spare = llm_backends.FakeBackend('spare', latency=0.01)
+        router = self.router(usual, spare, hedge_default_delay=0.05, min_samples=5)
+        replies = []
+
+        started = time.monotonic()
+        reply = router.complete('prompt', on_reply=replies.append)
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual(reply.backend, 'spare')
+        # The original request cannot be cancelled in its thread; its usage arrives when it finishes.
+        time.sleep(0.4)
+        self.assertEqual(sorted(r.backend for r in replies), ['spare', 'usual'])
+
+    def test_single_backend_is_never_hedged(self):
+        backend = llm_backends.FakeBackend(latency=0.2)
+        router = self.router(backend, hedge_default_delay=0.05, min_samples=5)
+        self.assertIsNone(router.hedge_delay(backend))
+        router.complete('prompt')
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(llm_backends.LLMRouter([backend]).hedge_percentile, 0)
+
+    def test_routing_prefers_healthy_backends_and_fails_over(self):
+        flaky = llm_backends.FakeBackend('flaky', error_rate=1.0)
+        steady = llm_backends.FakeBackend('steady', latency=0.02)
+        router = self.router(flaky, steady, hedge_percentile=0, min_samples=3)
+
+        replies = [router.complete('prompt').backend for _ in range(5)]
+
+        self.assertEqual(replies, ['steady'] * 5)
+        # flaky is tried until it has min_samples calls, then ranked last and left alone.
+        self.assertEqual(flaky.calls, 3)
+        self.assertEqual([backend.name for backend in router.ranked()], ['steady', 'flaky'])
+        with self.assertRaises(llm_backends.TransientBackendError):
+            self.router(flaky).complete('prompt')
+
+    def test_router_is_built_from_settings(self):
+        configs = [
+            {'type': 'fake', 'name': 'local', 'latency': 0.01},
+            {'type': 'openai', 'model': 'gpt-test', 'base_url': 'http://127.0.0.1:1/v1', 'api_key_env': 'NO_SUCH_KEY'},
+        ]
+        with override_settings(LLM_BACKENDS=configs):
+            router = services.build_llm_router()
+        self.assertEqual([type(backend).__name__ for backend in router.backends], ['FakeBackend', 'OpenAICompatibleBackend'])
+        self.assertEqual(router.backends[1].name, 'gpt-test')
+        self.assertEqual(router.model_key, 'fake+gpt-test')
+
+        with mock.patch.object(services, 'llm_router', router), \
+                mock.patch.object(services, 'llm_circuit', services.CircuitBreaker(5, 30)):
+            self.assertEqual(services.analyze_resume_with_llama('resume', 'jd'), DEFAULT_ANALYSIS)
+
+    def test_openai_compatible_backend_against_fake_server(self):
+        with FakeLLMServer(fail_first=1, error_status=503) as server:
+            backend = llm_backends.OpenAICompatibleBackend('compat', 'model', base_url=server.url + '/v1')
+            with self.assertRaises(llm_backends.TransientBackendError):
+                backend.complete('prompt')
+            reply = backend.complete('prompt')
+
+            async def stream():
+                chunks = await backend.astream('prompt')
+                try:
+                    return [pair async for pair in chunks]
+                finally:
+                    await backend.aclose()
+            pairs = asyncio.run(stream())
+
+        self.assertEqual(json.loads(reply.content), DEFAULT_ANALYSIS)
+        self.assertGreater(reply.usage['total_tokens'], 0)
+        self.assertEqual(json.loads(''.join(text for text, _ in pairs if text)), DEFAULT_ANALYSIS)
+        self.assertTrue(pairs[-1][1])
+
+
+class PdfExtractionTests(MediaTestCase):
+    def test_page_and_char_limits(self):
+        pdf = build_pdf([f'Page {i} skills Python Django' for i in range(5)])
+
+        with self.settings(PDF_MAX_PAGES=2, PDF_MAX_CHARS=10000):
+            text = services.extract_text_from_pdf(io.BytesIO(pdf))
+        self.assertIn('Page 1', text)
+        self.assertNotIn('Page 2', text)
+
+        with self.settings(PDF_MAX_PAGES=20, PDF_MAX_CHARS=10):
+            self.assertEqual(len(services.extract_text_from_pdf(io.BytesIO(pdf))), 10)
+
+    def test_extraction_in_process_pool(self):
+        pdf = build_pdf(['Senior Python developer'])
+        with self.settings(PDF_EXTRACT_WORKERS=1):
+            self.assertEqual(services.extract_resume_text(pdf), 'Senior Python developer')
+
+    def test_hung_page_gets_its_worker_killed_and_the_pool_rebuilt(self):
+        # Pool workers import the extraction function by name, so the stand-in for a page
+        # that never finishes parsing lives in a module they can import from sys.path.
+        module_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, module_dir, ignore_errors=True)
+        with open(os.path.join(module_dir, 'hanging_pdf.py'), 'w') as f:
+            f.write('import time\n\ndef extract(data, **limits):\n    time.sleep(600)\n')
+        with mock.patch('sys.path', [module_dir, *sys.path]):
+            import hanging_pdf
+
+        with self.settings(PDF_EXTRACT_WORKERS=1, PDF_EXTRACT_TIME_BUDGET=0.5), \
+                mock.patch.object(services, 'PDF_EXTRACT_GRACE_SECONDS', 0), \
+                mock.patch.object(pdf_extraction, 'extract_text_and_page_count_from_bytes', hanging_pdf.extract), \
+                mock.patch('sys.path', [module_dir, *sys.path]):
+            # Workers copy sys.path when they start, so start from fresh ones.
+            services.reset_extraction_pool(services.get_extraction_pool())
+            hung_pool = services.get_extraction_pool()
+            workers = []
+            reset = services.reset_extraction_pool
+            with mock.patch.object(services, 'reset_extraction_pool',
+                                   side_effect=lambda pool: workers.extend(pool._processes.values()) or reset(pool)):
+                started = time.monotonic()
+                self.assertIsNone(services.extract_resume_text(b'%PDF-1.4 hangs'))
+            self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(len(workers), 1)
+        workers[0].join(timeout=5)
+        self.assertFalse(workers[0].is_alive())
+
+        with self.settings(PDF_EXTRACT_WORKERS=1):
+            self.assertIsNot(services.get_extraction_pool(), hung_pool)
+            self.assertEqual(services.extract_resume_text(build_pdf(['Senior Python developer'])), 'Senior Python developer')
+
+    def test_upload_stores_extracted_text(self):
+        response = self.client.post(
+            '/api/resumes/upload/', {'file': SimpleUploadedFile('cv.pdf', build_pdf(['Data engineer']))}
+        )
+        self.assertEqual(response.status_code, 201)
+        resume = Resume.objects.get(pk=response.data['id'])
+        self.assertEqual(resume.blob.extracted_text, 'Data engineer')
+
+
+class PrescoreTests(MediaTestCase):
+    JD = 'Backend Engineer\nWe need Python, Django, Kubernetes and AWS experience.'
+
+    def test_prescore_matches_vocabulary_skills(self):
+        result = scoring.prescore('Python and Django developer; deployed on k8s.', self.JD)
+        self.assertEqual(result['matching_skills'], ['Django', 'Kubernetes', 'Python'])
+        self.assertEqual(result['missing_skills'], ['AWS'])
+        self.assertEqual(result['suggested_title'], 'Backend Engineer')
+        self.assertGreater(result['suitability_score'], scoring.prescore('Pastry chef', self.JD)['suitability_score'])
+
+    def test_fast_mode_skips_llm(self):
+        resume = self.make_extracted_resume('Python developer')
+        with mock.patch.object(services, 'analyze_resume_with_llama') as llm:
+            response = self.client.post(
+                '/api/analyze/', {'resume_id': resume.id, 'jd_text': self.JD, 'mode': 'fast'}, format='json'
+            )
+        llm.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['result']['preliminary'])
+        self.assertEqual(Analysis.objects.count(), 0)
+
+    def test_gated_mode_only_calls_llm_above_threshold(self):
+        weak = self.make_extracted_resume('Pastry chef with ten years of baking experience')
+        strong = self.make_extracted_resume('Python, Django, Kubernetes and AWS backend engineer')
+
+        with self.settings(PRESCORE_LLM_THRESHOLD=40), \
+                mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as llm:
+            weak_response = self.client.post(
+                '/api/analyze/', {'resume_id': weak.id, 'jd_text': self.JD, 'mode': 'gated'}, format='json'
+            )
+            llm.assert_not_called()
+            strong_response = self.client.post(
+                '/api/analyze/', {'resume_id': strong.id, 'jd_text': self.JD, 'mode': 'gated'}, format='json'
+            )
+            llm.assert_called_once()
+
+        self.assertEqual(weak_response.status_code, 201)
+        self.assertTrue(weak_response.data['result']['preliminary'])
+        self.assertEqual(strong_response.data['result'], FAKE_RESULT)
+
+
+class PromptCompactionTests(TestCase):
+    def test_boilerplate_and_repeats_are_removed(self):
+        resume = "\n".join([
+            "Jane   Doe",
+            "Address: 12 Long Street, Springfield",
+            "Experience",
+            "Built   Django services",
+            "Jane Doe",
+            "",
+            "References",
+            "Dr. Smith, former manager",
+            "Skills",
+            "Python",
+        ])
+        self.assertEqual(
+            compaction.compact(resume, 1000),
+            "Jane Doe\nExperience\nBuilt Django services\nSkills\nPython",
+        )
+
+    def test_eeo_statement_is_removed_from_job_description(self):
+        jd = "Python engineer\nWe are an equal opportunity employer and value diversity."
+        self.assertEqual(compaction.compact(jd, 1000), "Python engineer")
+
+    def test_text_is_trimmed_to_token_budget(self):
+        text = "\n".join(f"Line number {i} with some content" for i in range(200))
+        compacted = compaction.compact(text, 50)
+        self.assertLessEqual(compaction.estimate_tokens(compacted), 50)
+        self.assertTrue(compacted.startswith("Line number 0"))
+
+
+class AnalysisHistoryTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        resume = self.make_extracted_resume()
+        for i in range(5):
+            job_description = JobDescription.objects.create(user=self.user, text=f'JD number {i} ' + 'x' * 300)
+            Analysis.objects.create(
+                user=self.user, resume=resume, job_description=job_description,
+                result={**FAKE_RESULT, 'suitability_score': i * 10},
+            )
+
+    def test_history_is_cursor_paginated_newest_first(self):
+        with self.assertNumQueries(1):
+            first = self.client.get('/api/history/?page_size=3').data
+        self.assertEqual([item['result']['suitability_score'] for item in first['results']], [40, 30, 20])
+        self.assertIsNotNone(first['next'])
+
+        second = self.client.get(first['next']).data
+        self.assertEqual([item['result']['suitability_score'] for item in second['results']], [10, 0])
+        self.assertIsNone(second['next'])
+
+    def test_summary_mode_returns_only_summary_fields(self):
+        item = self.client.get('/api/history/?summary=true').data['results'][0]
+        self.assertEqual(
+            set(item), {'id', 'analyzed_at', 'suitability_score', 'suggested_title', 'job_description_snippet'}
+        )
+        self.assertEqual(item['suitability_score'], 40)
+        self.assertEqual(item['suggested_title'], 'Backend Engineer')
+        self.assertEqual(len(item['job_description_snippet']), 150)
+
+
+class RankingAndAnalyticsTests(MediaTestCase):
+    def analyze(self, resume, jd_text, **result):
+        analysis, _, _ = services.save_analysis(
+            self.user, resume, jd_text, {**FAKE_RESULT, **result}, False, f'{resume.pk}-{jd_text}-{result}'
+        )
+        return analysis
+
+    def test_result_fields_are_copied_to_columns_and_skill_links(self):
+        analysis = self.analyze(self.make_extracted_resume(), 'JD', suitability_score='85',
+                                missing_skills=['Kubernetes', ' kubernetes ', 'AWS', 7])
+        analysis.refresh_from_db()
+        self.assertEqual((analysis.suitability_score, analysis.suggested_title), (85, 'Backend Engineer'))
+        self.assertEqual(
+            sorted(analysis.skill_links.values_list('kind', 'skill__name')),
+            [('matching', 'python'), ('missing', 'aws'), ('missing', 'kubernetes')],
+        )
+        self.assertEqual([Analysis.parse_score(v) for v in (72.4, 'high', 850, True, None)], [72, None, None, None, None])
+
+    def test_leaderboard_ranks_latest_analysis_per_resume(self):
+        resumes = [self.make_extracted_resume(f'Resume number {i}') for i in range(3)]
+        for resume, score in zip(resumes, (60, 90, 75)):
+            first = self.analyze(resume, 'Python engineer', suitability_score=score)
+        # A newer analysis of the last resume replaces its earlier score.
+        Analysis.objects.filter(pk=first.pk).update(analyzed_at=first.analyzed_at - timedelta(days=1))
+        self.analyze(resumes[2], 'Python engineer', suitability_score=40)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/job-descriptions/{first.job_description_id}/leaderboard/?limit=2')
+        self.assertEqual([(row['resume_id'], row['suitability_score']) for row in response.data['results']],
+                         [(resumes[1].pk, 90), (resumes[0].pk, 60)])
+
+    def test_skill_gaps_count_missing_skills(self):
+        resume = self.make_extracted_resume()
+        self.analyze(resume, 'JD 1', missing_skills=['Kubernetes', 'AWS'])
+        self.analyze(resume, 'JD 2', missing_skills=['kubernetes'])
+        old = self.analyze(resume, 'JD 3', missing_skills=['Rust'])
+        Analysis.objects.filter(pk=old.pk).update(analyzed_at=old.analyzed_at - timedelta(days=60))
+
+        since = (timezone.now() - timedelta(days=30)).date().isoformat()
+        data = self.client.get(f'/api/analytics/skill-gaps/?since={since}').data
+        self.assertEqual(data['analyses'], 2)
+        self.assertEqual(data['skills'], [{'skill': 'Kubernetes', 'count': 2}, {'skill': 'AWS', 'count': 1}])
+        self.assertEqual(self.client.get('/api/analytics/skill-gaps/?kind=other').status_code, 400)
+
+
+class StreamingAnalysisTests(MediaTestCase):
+    def test_parser_reports_fields_as_they_complete(self):
+        parser = JSONFieldStreamParser()
+        self.assertEqual(parser.feed('```json\n{"suitability_score": 8'), {})
+        self.assertEqual(parser.feed('5, "matching_skills": ["Py'), {'suitability_score': 85})
+        self.assertEqual(parser.feed('thon", "a, b"], "tailored'), {'matching_skills': ['Python', 'a, b']})
+        self.assertEqual(parser.feed('_suggestions": "Add {metrics}"}```'), {'tailored_suggestions': 'Add {metrics}'})
+
+    async def test_stream_endpoint_relays_fields_then_stores_analysis(self):
+        resume = await sync_to_async(self.make_extracted_resume)()
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+
+        async def stream():
+            response = await self.async_client.post(
+                '/api/analyze/stream/',
+                {'resume_id': resume.id, 'jd_text': 'Python engineer'},
+                content_type='application/json',
+                headers={'Authorization': f'Bearer {token}', 'Idempotency-Key': 'stream-1'},
+            )
+            return response, ''.join([chunk.decode() async for chunk in response.streaming_content])
+
+        with FakeLLMServer() as server:
+            router = fake_server_router(server)
+            with mock.patch.object(services, 'llm_router', router):
+                response, body = await stream()
+                # A retry with the same key replays the stored analysis without calling the LLM again.
+                await caches['analysis'].aclear()
+                _, replayed = await stream()
+            await router.aclose()
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(replayed, body)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [block for block in body.split('\n\n') if block.startswith('event:')]
+        self.assertEqual(len(events), len(DEFAULT_ANALYSIS) + 1)
+        self.assertTrue(events[0].startswith('event: field\ndata: {"suitability_score": 72}'))
+        self.assertTrue(events[-1].startswith('event: done'))
+        self.assertEqual(await Analysis.objects.acount(), 1)
+        # Token usage arrives on the stream's last chunk.
+        usage = await LLMUsage.objects.aget(user=self.user)
+        self.assertGreater(usage.total_tokens, 0)
+
+
+class ResumeBlobStorageTests(MediaTestCase):
+    def upload(self, content=FAKE_PDF):
+        return self.client.post('/api/resumes/upload/', {'file': SimpleUploadedFile('cv.pdf', content)})
+
+    def test_duplicate_upload_returns_existing_resume(self):
+        with mock.patch.object(services, 'extract_resume_text', return_value='Python developer') as extract:
+            first = self.upload()
+            second = self.upload()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['id'], first.data['id'])
+        extract.assert_called_once()
+
+    def test_identical_files_share_one_blob_and_extraction(self):
+        other = User.objects.create_user(username='bob', password='pw-12345')
+        with mock.patch.object(services, 'extract_resume_text', return_value='Python developer') as extract:
+            mine = self.make_resume()
+            theirs = self.make_resume(user=other)
+            services.get_resume_text(mine)
+            services.get_resume_text(Resume.objects.get(pk=theirs.pk))
+
+        self.assertNotEqual(mine.pk, theirs.pk)
+        self.assertEqual(mine.blob_id, theirs.blob_id)
+        self.assertEqual(mine.file.name, theirs.file.name)
+        self.assertEqual(ResumeBlob.objects.get().ref_count, 2)
+        extract.assert_called_once()
+
+    def test_resume_list_is_own_resumes_newest_first(self):
+        older = self.make_resume(FAKE_PDF + b'older', name='old_cv.pdf')
+        newer = self.make_resume(FAKE_PDF + b'newer', name='new_cv.pdf')
+        Resume.objects.filter(pk=older.pk).update(uploaded_at=newer.uploaded_at - timedelta(days=1))
+        self.make_resume(FAKE_PDF + b'theirs', user=User.objects.create_user(username='bob', password='pw-12345'))
+
+        response = self.client.get('/api/resumes/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['id'], r['name']) for r in response.data['results']],
+                         [(newer.pk, 'new_cv.pdf'), (older.pk, 'old_cv.pdf')])
+
+    def test_gc_removes_only_unreferenced_blobs(self):
+        kept = self.make_resume(FAKE_PDF + b'kept')
+        dropped = self.make_resume(FAKE_PDF + b'dropped')
+        dropped_name = dropped.blob.file.name
+        dropped.delete()
+        self.assertEqual(ResumeBlob.objects.get(pk=dropped.blob_id).ref_count, 0)
+
+        call_command('gc_resume_blobs', grace=0, stdout=io.StringIO())
+
+        self.assertEqual(list(ResumeBlob.objects.values_list('pk', flat=True)), [kept.blob_id])
+        self.assertFalse(default_storage.exists(dropped_name))
+        self.assertTrue(default_storage.exists(kept.blob.file.name))
+
+    def test_blob_collected_during_upload_is_stored_again(self):
+        old = self.make_resume()
+        old.delete()
+        real_get_or_create_blob = services.get_or_create_blob
+
+        def collected_after_lookup(*args, **kwargs):
+            blob = real_get_or_create_blob(*args, **kwargs)
+            if blob.pk == old.blob_id:
+                # gc_resume_blobs runs between the lookup and add_blob_reference's lock.
+                call_command('gc_resume_blobs', grace=0, stdout=io.StringIO())
+            return blob
+
+        with mock.patch.object(services, 'get_or_create_blob', side_effect=collected_after_lookup) as lookup:
+            resume = self.make_resume()
+        self.assertEqual(lookup.call_count, 2)
+        resume.refresh_from_db()
+        self.assertEqual(resume.blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(resume.file.name))
+
+    def test_failed_save_does_not_count_a_reference(self):
+        blob = self.make_resume().blob
+        other = User.objects.create_user(username='bob', password='pw-12345')
+        with mock.patch.object(Resume, 'save', side_effect=RuntimeError('disk full')), self.assertRaises(RuntimeError):
+            self.make_resume(user=other)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+
+class UploadValidationTests(MediaTestCase):
+    def upload(self, content):
+        return self.client.post('/api/resumes/upload/', {'file': SimpleUploadedFile('cv.pdf', content)})
+
+    def test_non_pdf_is_rejected_before_storage(self):
+        response = self.upload(b'MZ\x90\x00 not a pdf at all')
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(ResumeBlob.objects.exists())
+
+    @override_settings(RESUME_MAX_UPLOAD_BYTES=64)
+    def test_oversized_file_is_rejected_while_streaming(self):
+        response = self.upload(FAKE_PDF + b'x' * 100)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Resume.objects.exists())
+
+    @override_settings(RESUME_MAX_UPLOAD_BYTES=64)
+    def test_declared_length_over_limit_skips_the_body(self):
+        response = self.upload(FAKE_PDF + b'x' * 64 * 1024)
+        self.assertEqual(response.status_code, 413)
+
+    def test_streamed_hash_is_used_for_storage(self):
+        with mock.patch.object(services, 'extract_resume_text', return_value='Python developer'), \
+                mock.patch.object(services, 'hash_uploaded_file') as rehash:
+            response = self.upload(FAKE_PDF)
+        self.assertEqual(response.status_code, 201)
+        rehash.assert_not_called()
+        self.assertEqual(Resume.objects.get().content_hash, hashlib.sha256(FAKE_PDF).hexdigest())
+
+
+@override_settings(RESUME_UPLOAD_CHUNK_BYTES=16)
+class ChunkedUploadTests(MediaTestCase):
+    def start(self, content, name='cv.pdf'):
+        response = self.client.post('/api/resumes/uploads/', {'file_name': name, 'total_size': len(content)})
+        self.assertEqual(response.status_code, 201)
+        return f"/api/resumes/uploads/{response.data['id']}/"
+
+    def send(self, url, chunk, offset):
+        return self.client.put(url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_chunks_assemble_into_a_resume(self):
+        url = self.start(FAKE_PDF)
+        with mock.patch.object(services, 'extract_resume_text', return_value='Python developer'):
+            for offset in range(0, len(FAKE_PDF), 16):
+                response = self.send(url, FAKE_PDF[offset:offset + 16], offset)
+
+        self.assertEqual(response.status_code, 201)
+        resume = Resume.objects.get(pk=response.data['id'])
+        self.assertEqual(resume.content_hash, hashlib.sha256(FAKE_PDF).hexdigest())
+        with resume.file.open('rb') as f:
+            self.assertEqual(f.read(), FAKE_PDF)
+        self.assertFalse(ResumeUpload.objects.exists())
+
+    def test_resume_after_interruption_from_reported_offset(self):
+        url = self.start(FAKE_PDF)
+        self.assertEqual(self.send(url, FAKE_PDF[:16], 0).status_code, 202)
+
+        # A retried chunk at a stale offset is refused with the offset to continue from.
+        conflict = self.send(url, FAKE_PDF[:16], 0)
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(self.client.get(url).data['received'], 16)
+
+        with mock.patch.object(services, 'extract_resume_text', return_value='Python developer'):
+            self.send(url, FAKE_PDF[16:32], 16)
+            response = self.send(url, FAKE_PDF[32:], 32)
+        self.assertEqual(response.status_code, 201)
+
+    def test_bogus_first_chunk_discards_the_upload(self):
+        url = self.start(b'GIF89a' + b'x' * 10)
+        response = self.send(url, b'GIF89a' + b'x' * 10, 0)
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(ResumeUpload.objects.exists())
+
+    @override_settings(RESUME_MAX_UPLOAD_BYTES=32)
+    def test_declared_size_over_limit_is_refused(self):
+        response = self.client.post('/api/resumes/uploads/', {'file_name': 'cv.pdf', 'total_size': 33})
+        self.assertEqual(response.status_code, 400)
+
+
+class SemanticMatchTests(MediaTestCase):
+    DATA_JD = 'Data engineer: Python, SQL, Spark and Airflow pipelines on AWS.'
+    FRONTEND_JD = 'Frontend developer: React, TypeScript, CSS and accessibility.'
+
+    def test_index_search_ranks_similar_text_first(self):
+        index = services.get_vector_index('job_descriptions')
+        index.add(1, 7, vector_index.embed(self.FRONTEND_JD))
+        index.add(2, 7, vector_index.embed(self.DATA_JD))
+        index.add(3, 8, vector_index.embed(self.DATA_JD))
+
+        hits = index.search(vector_index.embed('Spark and SQL data pipelines in Python'), k=5, owner_id=7)
+        self.assertEqual([item_id for item_id, _ in hits], [2, 1])
+
+        index.remove(2)
+        self.assertEqual([item_id for item_id, _ in index.search(vector_index.embed(self.DATA_JD), k=5, owner_id=7)], [1])
+        # A second instance, as in another process, sees the same rows through the memory-mapped files.
+        other = vector_index.VectorIndex(index.directory, 'job_descriptions')
+        self.assertEqual(len(other), 2)
+
+    def test_match_endpoints_rank_indexed_documents(self):
+        resume = self.make_extracted_resume('Python and SQL data engineer building Spark pipelines on AWS')
+        services.index_resume(resume)
+        for text in (self.FRONTEND_JD, self.DATA_JD, self.DATA_JD):
+            services.save_analysis(self.user, resume, text, FAKE_RESULT, False, services.normalize_text(text))
+
+        response = self.client.get(f'/api/resumes/{resume.pk}/matches/?k=5')
+        self.assertEqual(response.status_code, 200)
+        snippets = [match['job_description_snippet'] for match in response.data['matches']]
+        # The repeated JD text is indexed once.
+        self.assertEqual(snippets, [self.DATA_JD, self.FRONTEND_JD])
+
+        jd = JobDescription.objects.filter(text=self.DATA_JD).first()
+        response = self.client.get(f'/api/job-descriptions/{jd.pk}/matches/')
+        self.assertEqual([match['resume_id'] for match in response.data['matches']], [resume.pk])
+
+    def test_batch_top_k_only_analyzes_shortlisted_resumes(self):
+        data = self.make_extracted_resume('Python and SQL data engineer building Spark pipelines on AWS')
+        frontend = self.make_extracted_resume('React and TypeScript frontend developer focused on CSS')
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as analyze:
+            response = self.client.post('/api/analyze/batch/', {
+                'resume_ids': [data.pk, frontend.pk], 'jd_texts': [self.DATA_JD], 'top_k': 1,
+            }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([a['resume'] for a in response.data['analyses']], [data.pk])
+        analyze.assert_called_once()
+
+
+class RateLimitTests(MediaTestCase):
+    def analyze(self, resume, mode='fast'):
+        return self.client.post('/api/analyze/', {'resume_id': resume.id, 'jd_text': 'Python engineer', 'mode': mode}, format='json')
+
+    @override_settings(ANALYZE_BURST=2, ANALYZE_RATE_PER_MINUTE=6)
+    def test_user_bucket_answers_429_with_retry_after(self):
+        resume = self.make_extracted_resume()
+        self.assertEqual(self.analyze(resume).status_code, 200)
+        self.assertEqual(self.analyze(resume).status_code, 200)
+
+        response = self.analyze(resume)
+        self.assertEqual(response.status_code, 429)
+        # One token refills every 10 seconds.
+        self.assertIn(int(response['Retry-After']), range(9, 11))
+
+    @override_settings(ANALYZE_GLOBAL_BURST=1, ANALYZE_GLOBAL_RATE_PER_MINUTE=1)
+    def test_global_bucket_is_shared_by_all_users(self):
+        self.assertEqual(self.analyze(self.make_extracted_resume()).status_code, 200)
+
+        other = User.objects.create_user(username='bob', password='pw-12345')
+        self.client.force_authenticate(other)
+        resume = self.make_resume(FAKE_PDF + b'bob', user=other)
+        self.assertEqual(self.analyze(resume).status_code, 429)
+
+    def test_llm_usage_is_recorded_and_daily_quota_enforced(self):
+        resume = self.make_extracted_resume()
+        UserQuota.objects.create(user=self.user, daily_request_limit=1)
+
+        with FakeLLMServer() as server:
+            with mock.patch.object(services, 'llm_router', fake_server_router(server)):
+                self.assertEqual(self.analyze(resume, mode='full').status_code, 201)
+                over_quota = self.client.post(
+                    '/api/analyze/', {'resume_id': resume.id, 'jd_text': 'Go engineer'}, format='json'
+                )
+
+        usage = LLMUsage.objects.get(user=self.user)
+        self.assertEqual(usage.requests, 1)
+        self.assertEqual(usage.total_tokens, usage.prompt_tokens + usage.completion_tokens)
+        self.assertGreater(usage.total_tokens, 0)
+        self.assertEqual(over_quota.status_code, 429)
+        self.assertGreater(int(over_quota['Retry-After']), 0)
+        self.assertEqual(len(server.requests), 1)
+
+        # Fast mode never reaches the LLM, so it still works over quota.
+        self.assertEqual(self.analyze(resume).status_code, 200)
+        self.assertEqual(self.client.get('/api/usage/').data['requests'], 1)
+
+    def batch(self, resumes):
+        return self.client.post(
+            '/api/analyze/batch/', {'resume_ids': [r.id for r in resumes], 'jd_texts': ['Python engineer', 'Go engineer']},
+            format='json'
+        )
+
+    def test_batch_is_charged_per_pair(self):
+        resumes = [self.make_extracted_resume(f'Resume number {i}') for i in range(2)]
+        UserQuota.objects.create(user=self.user, daily_request_limit=3)
+        with mock.patch.object(services, 'analyze_resume_with_llama') as llm:
+            response = self.batch(resumes)
+        # Four pairs do not fit in a quota of three requests.
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        llm.assert_not_called()
+
+        with override_settings(ANALYZE_BURST=5, ANALYZE_RATE_PER_MINUTE=6), \
+                mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT):
+            UserQuota.objects.filter(user=self.user).update(daily_request_limit=None)
+            self.assertEqual(self.batch(resumes).status_code, 201)
+            # The batch drew four of the five tokens, so one more single request fits, then none.
+            self.assertEqual(self.analyze(resumes[0]).status_code, 200)
+            self.assertEqual(self.analyze(resumes[0]).status_code, 429)
+
+
+class MetricsTests(MediaTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram('test_latency_seconds', 'Test histogram.', ['stage'], buckets=(0.1, 1))
+        try:
+            histogram.observe(0.05, stage='a')
+            histogram.observe(0.5, stage='a')
+            text = metrics.render()
+        finally:
+            del metrics.REGISTRY['test_latency_seconds']
+
+        self.assertIn('# TYPE test_latency_seconds histogram', text)
+        self.assertIn('test_latency_seconds_bucket{stage="a",le="0.1"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{stage="a",le="1"} 2', text)
+        self.assertIn('test_latency_seconds_bucket{stage="a",le="+Inf"} 2', text)
+        self.assertIn('test_latency_seconds_count{stage="a"} 2', text)
+
+    def test_analyze_records_stages_and_logs_request_timings(self):
+        resume = self.make_extracted_resume()
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT), \
+                self.assertLogs('core.timing', level='INFO') as logs:
+            self.client.post('/api/analyze/', {'resume_id': resume.id, 'jd_text': 'Python engineer'}, format='json')
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['path'], '/api/analyze/')
+        self.assertEqual(line['outcome'], 'llm')
+        self.assertIn('jd_insert', line['stages'])
+        self.assertIn('analysis_insert', line['stages'])
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('analysis_stage_seconds_count{stage="analysis_insert"}', body)
+        self.assertIn('analysis_requests_total{mode="full",outcome="llm"}', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_snapshots_flush_late_updates_and_skip_dead_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        counter = metrics.Counter('test_events_total', 'Test counter.', ['kind'])
+        self.addCleanup(metrics.REGISTRY.pop, 'test_events_total')
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        dead_path = os.path.join(directory, f'{exited.pid}.json')
+        with open(dead_path, 'w') as f:
+            json.dump({'test_events_total': [[['a'], 5]]}, f)
+
+        with override_settings(METRICS_DIR=directory), mock.patch.object(metrics, 'SNAPSHOT_INTERVAL', 0.05):
+            counter.inc(kind='a')
+            counter.inc(kind='a')
+            own_path = os.path.join(directory, f'{os.getpid()}.json')
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline:
+                if os.path.exists(own_path):
+                    with open(own_path) as f:
+                        if json.load(f)['test_events_total'] == [[['a'], 2]]:
+                            break
+                time.sleep(0.02)
+            else:
+                self.fail('the second increment was never written')
+
+            self.assertEqual(metrics.merged_values()['test_events_total'], {('a',): 2})
+            self.assertFalse(os.path.exists(dead_path))
+
+
+class BenchmarkTests(MediaTestCase):
+    def test_corpus_is_reproducible_and_extractable(self):
+        resumes, job_descriptions = benchmarks.generate_corpus(seed=3, resume_count=3, max_pages=2, jd_count=3)
+        self.assertEqual((resumes, job_descriptions), benchmarks.generate_corpus(3, 3, 2, 3))
+        self.assertEqual([pages for _, _, pages in resumes], [1, 2, 1])
+        self.assertLess(len(job_descriptions[0]), len(job_descriptions[2]))
+
+        text, pages = pdf_extraction.extract_text_and_page_count_from_bytes(resumes[1][1])
+        self.assertEqual(pages, 2)
+        self.assertIn('(page 2)', text)
+
+    def test_run_benchmark_reports_every_endpoint(self):
+        resumes, job_descriptions = benchmarks.generate_corpus(seed=1, resume_count=2, max_pages=1, jd_count=2)
+        caches['analysis'].clear()
+        with FakeLLMServer() as server:
+            with mock.patch.object(services, 'llm_router', fake_server_router(server)):
+                report = benchmarks.run_benchmark(
+                    resumes, job_descriptions, requests_per_client=2, concurrency=(1,), log=lambda message: None
+                )
+
+        endpoints = report['endpoints']
+        self.assertEqual(endpoints['upload']['status_codes'], {'201': 2})
+        self.assertIn('pdf_extract', endpoints['upload']['stages_ms'])
+        self.assertIn('llm_generation', endpoints['analyze_cold']['stages_ms'])
+        self.assertEqual(endpoints['analyze_cached']['cache_hit_rate'], 1.0)
+        self.assertGreater(endpoints['history']['db_queries']['p50'], 0)
+        self.assertEqual(report['throughput'][0]['requests'], 2)
+        # Two cold analyses plus two throughput requests, all with new job descriptions.
+        self.assertEqual(len(server.requests), 4)
+        self.assertGreater(report['memory']['max_rss_kb'], 0)
+        json.dumps(report)
+
+
+class PrewarmTests(MediaTestCase):
+    def test_upload_prepares_resume_side_work(self):
+        with mock.patch.object(services, 'extract_resume_text', return_value='Python developer, Django') as extract:
+            response = self.client.post('/api/resumes/upload/', {'file': SimpleUploadedFile('cv.pdf', FAKE_PDF)})
+        self.assertEqual(response.status_code, 201)
+        resume = Resume.objects.get(pk=response.data['id'])
+
+        with mock.patch.object(scoring, 'resume_features') as features, \
+                mock.patch.object(compaction, 'compact') as compact, \
+                mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT):
+            fast = self.client.post(
+                '/api/analyze/', {'resume_id': resume.id, 'jd_text': 'Django engineer', 'mode': 'fast'}, format='json'
+            )
+            services.build_prompt(services.get_resume_prompt_text(resume, 'Python developer, Django'), 'Django engineer')
+
+        self.assertEqual(fast.data['result']['matching_skills'], ['Django'])
+        extract.assert_called_once()
+        features.assert_not_called()
+        # Only the job description is compacted at analyze time.
+        compact.assert_called_once()
+        self.assertEqual(len(services.get_vector_index('resumes')), 1)
+
+    @override_settings(RESUME_PREWARM_WORKERS=2)
+    def test_upload_schedules_prewarm_after_commit(self):
+        pool = mock.Mock()
+        with mock.patch.object(services, 'get_prewarm_pool', return_value=pool), \
+                mock.patch.object(services, 'extract_resume_text') as extract, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/resumes/upload/', {'file': SimpleUploadedFile('cv.pdf', FAKE_PDF)})
+
+        self.assertEqual(response.status_code, 201)
+        extract.assert_not_called()
+        resume = Resume.objects.get(pk=response.data['id'])
+        pool.submit.assert_called_once_with(services.run_prewarm, resume.pk, resume.content_hash)
+        services._prewarming.clear()
+
+
+class ResumeProfileTests(MediaTestCase):
+    RESUME_TEXT = """Jane Doe
+Senior Backend Engineer at Acme Corp | 2019 - Present
+- Cut p95 API latency by 40% by introducing Redis caching
+- Led migration of 12 services to Kubernetes
+Skills: Python, Django, PostgreSQL, Docker, AWS
+Software Engineer, Beta Inc (2015 - 2019)
+Education
+B.Sc. Computer Science, State University 2011 - 2015
+References available on request
+"""
+    SKILLS = ['AWS', 'Django', 'Docker', 'Kubernetes', 'PostgreSQL', 'Python', 'Redis']
+
+    def test_profile_extracts_titles_years_skills_and_achievements(self):
+        profile = profiles.build_profile(self.RESUME_TEXT, current_year=2025)
+        self.assertEqual(profile['titles'], ['Senior Backend Engineer', 'Software Engineer'])
+        # 2015-2025, without the degree.
+        self.assertEqual(profile['years_experience'], 10)
+        self.assertEqual(profile['skills'], self.SKILLS)
+        self.assertEqual(profile['achievements'], [
+            'Cut p95 API latency by 40% by introducing Redis caching',
+            'Led migration of 12 services to Kubernetes',
+        ])
+        self.assertIn('Skills: AWS, Django, Docker', profiles.render_profile(profile))
+        self.assertTrue(profiles.is_useful(profile))
+
+    @override_settings(ANALYSIS_RESUME_PROFILE=True)
+    def test_analyses_send_the_profile_built_once_per_file(self):
+        resume = self.make_extracted_resume(self.RESUME_TEXT)
+        with mock.patch.object(services, 'analyze_resume_with_llama', return_value=FAKE_RESULT) as llm, \
+                mock.patch.object(profiles, 'build_profile', wraps=profiles.build_profile) as build:
+            for jd_text in ('Go engineer', 'Python engineer'):
+                self.client.post('/api/analyze/', {'resume_id': resume.id, 'jd_text': jd_text}, format='json')
+
+        build.assert_called_once()
+        prompt_resume = llm.call_args_list[0].args[0]
+        self.assertIn('Key achievements:', prompt_resume)
+        self.assertNotIn('References', prompt_resume)
+        self.assertEqual(llm.call_args_list[1].args[0], prompt_resume)
+
+    def test_profile_is_rebuilt_when_text_is_re_extracted(self):
+        resume = self.make_extracted_resume(self.RESUME_TEXT)
+        self.assertEqual(services.get_resume_profile(resume)['skills'], self.SKILLS)
+
+        with mock.patch.object(services, 'EXTRACTOR_VERSION', services.EXTRACTOR_VERSION + 1), \
+                mock.patch.object(services, 'extract_resume_text', return_value='Django developer since 2020'):
+            services.get_resume_text(resume)
+            self.assertEqual(services.get_resume_profile(resume)['skills'], ['Django'])
+
+    def test_profile_is_off_by_default_and_thin_profiles_are_not_sent(self):
+        resume = self.make_extracted_resume(self.RESUME_TEXT)
+        self.assertEqual(services.get_resume_prompt_text(resume, self.RESUME_TEXT), self.RESUME_TEXT)
+
+        # Two recognized skills are too few to stand in for the resume.
+        thin_text = self.RESUME_TEXT.replace('Skills: Python, Django, PostgreSQL, Docker, AWS\n', '')
+        thin = self.make_extracted_resume(thin_text)
+        with self.settings(ANALYSIS_RESUME_PROFILE=True):
+            self.assertEqual(services.get_resume_profile(thin)['skills'], ['Kubernetes', 'Redis'])
+            self.assertEqual(services.get_resume_prompt_text(thin, thin_text), thin_text)
+
+    def test_profile_is_rebuilt_in_a_new_year(self):
+        resume = self.make_extracted_resume(self.RESUME_TEXT)
+        resume.blob.profile = profiles.build_profile(self.RESUME_TEXT, current_year=date.today().year - 1)
+        resume.blob.save()
+
+        profile = services.get_resume_profile(resume)
+        self.assertEqual(profile['year'], date.today().year)
+        self.assertEqual(profile['years_experience'], date.today().year - 2015)
+
+
+class BulkImportExportTests(MediaTestCase):
+    def test_import_resumes_from_zip(self):
+        archive_path = os.path.join(MEDIA_ROOT, 'resumes.zip')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            archive.writestr('a/jane.pdf', build_pdf(['Python developer with Django']))
+            archive.writestr('b/john.pdf', build_pdf(['Go engineer']))
+            archive.writestr('b/jane-again.pdf', build_pdf(['Python developer with Django']))
+            archive.writestr('notes.pdf', b'not really a pdf')
+        self.make_resume(build_pdf(['Go engineer']))
+
+        out = io.StringIO()
+        call_command('import_resumes', archive_path, user='alice', workers=0, batch_size=2, stdout=out, stderr=io.StringIO())
+
+        self.assertIn('Imported 1 resume(s) for alice; 2 duplicate(s), 1 rejected', out.getvalue())
+        self.assertEqual(Resume.objects.filter(user=self.user).count(), 2)
+        blob = ResumeBlob.objects.get(extracted_text='Python developer with Django')
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(blob.profile['skills'], ['Django', 'Python'])
+        self.assertTrue(default_storage.exists(blob.file.name))
+        self.assertEqual(len(services.get_vector_index('resumes')), 1)
+
+    def make_analyses(self):
+        resume = self.make_extracted_resume()
+        for score in (80, 'high'):
+            job_description = JobDescription.objects.create(user=self.user, text=f'JD {score}')
+            Analysis.objects.create(
+                user=self.user, resume=resume, job_description=job_description,
+                result={**FAKE_RESULT, 'suitability_score': score},
+            )
+
+    def test_export_analyses_as_jsonl(self):
+        self.make_analyses()
+        out = io.StringIO()
+        with mock.patch('sys.stdout', out):
+            call_command('export_analyses', include_jd_text=True, batch_size=1, stdout=io.StringIO())
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['jd_text'] for row in rows], ['JD 80', 'JD high'])
+        self.assertEqual(rows[0]['username'], 'alice')
+        self.assertEqual(json.loads(rows[0]['result']), {**FAKE_RESULT, 'suitability_score': 80})
+
+    def test_export_analyses_as_parquet(self):
+        import pyarrow.parquet as pq
+
+        self.make_analyses()
+        path = os.path.join(MEDIA_ROOT, 'analyses.parquet')
+        call_command('export_analyses', output=path, batch_size=1, stdout=io.StringIO())
+
+        table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.column('suitability_score').to_pylist(), [80, None])
+        self.assertEqual(table.column('suggested_title').to_pylist(), ['Backend Engineer'] * 2)
@@ -0,0 +1,126 @@
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from .models import LLMUsage, RateLimitBucket, UserQuota
+
+# Rate limiting and daily LLM quotas for the analyze endpoints, so one noisy user
+# cannot exhaust the shared provider quota (and get everyone throttled upstream).
+# State lives in the database, like the job queue, so it holds across worker processes.
+
+
+def take_tokens(limits, cost=1):
+    """
+    Takes `cost` tokens from every bucket in `limits`, a list of (key, rate per second,
+    capacity), or from none of them. Returns 0 when allowed, otherwise the seconds
+    until all buckets would have enough. A cost above a bucket's capacity is taken from a
+    full bucket and leaves it in debt, so a large batch is followed by a long wait instead
+    of never being allowed.
+    """
+    now = time.time()
+    with transaction.atomic():
+        buckets = []
+        for key, rate, capacity in limits:
+            bucket, _ = RateLimitBucket.objects.select_for_update().get_or_create(
+                key=key, defaults={"tokens": capacity, "updated_at": now}
+            )
+            bucket.tokens = min(capacity, bucket.tokens + max(0.0, now - bucket.updated_at) * rate)
+            bucket.updated_at = now
+            buckets.append((bucket, rate, min(cost, capacity)))
+
+        wait = max(((need - bucket.tokens) / rate for bucket, rate, need in buckets if bucket.tokens < need), default=0)
+        for bucket, _, _ in buckets:
+            if not wait:
+                bucket.tokens -= cost
+            bucket.save(update_fields=["tokens", "updated_at"])
+    return wait
+
+
+def rate_limit_wait(user, cost=1):
+    """
+    Draws `cost` analyze requests from the user's bucket and the global one.
+    Returns 0, or the seconds to wait before retrying.
+    """
+    return take_tokens([
+        (f"analyze:user:{user.pk}", settings.ANALYZE_RATE_PER_MINUTE / 60, settings.ANALYZE_BURST),
+        ("analyze:global", settings.ANALYZE_GLOBAL_RATE_PER_MINUTE / 60, settings.ANALYZE_GLOBAL_BURST),
+    ], cost=cost)
+
+
+def daily_limits(user):
+    """
+    Returns (token limit, request limit) for the user; 0 means unlimited.
+    """
+    quota = UserQuota.objects.filter(user=user).first()
+    token_limit = settings.LLM_DAILY_TOKEN_LIMIT
+    request_limit = settings.LLM_DAILY_REQUEST_LIMIT
+    if quota and quota.daily_token_limit is not None:
+        token_limit = quota.daily_token_limit
+    if quota and quota.daily_request_limit is not None:
+        request_limit = quota.daily_request_limit
+    return token_limit, request_limit
+
+
+def seconds_until_tomorrow():
+    now = timezone.localtime()
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), dt_time.min))
+    return (midnight - now).total_seconds()
+
+
+def quota_wait(user):
+    """
+    Returns 0 while the user is within today's LLM quota, otherwise the seconds until it resets.
+    """
+    usage = LLMUsage.objects.filter(user=user, day=timezone.localdate()).first()
+    if usage is None:
+        return 0
+    token_limit, request_limit = daily_limits(user)
+    if (token_limit and usage.total_tokens >= token_limit) or (request_limit and usage.requests >= request_limit):
+        return seconds_until_tomorrow()
+    return 0
+
+
+def analyze_wait(user, mode=None):
+    """
+    Checks an analyze request against the daily quota and the rate limits.
+    "fast" mode never calls the LLM, so it is only rate limited.
+    """
+    if mode != "fast":
+        wait = quota_wait(user)
+        if wait:
+            return wait
+    return rate_limit_wait(user)
+
+
+def batch_analyze_wait(user, pairs):
+    """
+    Checks a batch of `pairs` analyses up front, since each may be an LLM call: the batch
+    must fit in what is left of today's request quota, and it draws one rate-limit token
+    per pair. Returns 0, or the seconds to wait before retrying.
+    """
+    wait = quota_wait(user)
+    if wait:
+        return wait
+    _, request_limit = daily_limits(user)
+    if request_limit:
+        used = LLMUsage.objects.filter(user=user, day=timezone.localdate()).values_list("requests", flat=True).first()
+        if (used or 0) + pairs > request_limit:
+            return seconds_until_tomorrow()
+    return rate_limit_wait(user, cost=pairs)
+
+
+# DRF throttle for the analyze views; DRF answers 429 with a Retry-After header.
+class AnalyzeThrottle(BaseThrottle):
+
+    def allow_request(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return True
+        self.wait_seconds = analyze_wait(request.user, request.data.get("mode"))
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,148 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from .models import ResumeUpload
+
+# Upload validation that happens while the bytes arrive, not after they are buffered:
+# a multipart upload handler for POST /api/resumes/upload/, and the chunk writer
+# behind the resumable /api/resumes/uploads/ endpoints.
+
+PDF_MAGIC = b"%PDF-"
+
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD = 16 * 1024
+
+# How much of a chunk request body is read into memory at a time.
+READ_SIZE = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """
+    Raised when an upload is refused; `status` is the HTTP status to answer with.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def matches_pdf_magic(data, start):
+    """
+    Checks the part of the PDF header that falls inside `data`, which starts at byte
+    offset `start` of the file. Data past the header always passes.
+    """
+    if start >= len(PDF_MAGIC):
+        return True
+    expected = PDF_MAGIC[start:]
+    return expected.startswith(data[:len(expected)])
+
+
+class PdfUploadGuard(FileUploadHandler):
+    """
+    Runs first in request.upload_handlers. Refuses requests whose Content-Length is
+    already too large before reading the body, and stops a file as soon as it passes
+    `max_size` bytes or its first bytes are not a PDF header, so neither reaches memory
+    or disk. Hashes each file as it streams past (see `hashes`).
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size if max_size is not None else settings.RESUME_MAX_UPLOAD_BYTES
+        self.error = None
+        self.hashes = {}
+        self.digest = None
+
+    def reject(self, message, status):
+        self.error = UploadRejected(message, status)
+        raise StopUpload()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.error = UploadRejected(f"File is larger than {self.max_size} bytes.", 413)
+            # Returning the (empty) result ourselves means Django never reads the body.
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.reject(f"File is larger than {self.max_size} bytes.", 413)
+        if not matches_pdf_magic(raw_data, start):
+            self.reject("File is not a PDF.", 415)
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if file_size < len(PDF_MAGIC):
+            self.reject("File is not a PDF.", 415)
+        self.hashes[self.field_name] = self.digest.hexdigest()
+        # Let the next handler (memory or temporary file) build the UploadedFile.
+        return None
+
+
+def partial_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, "uploads", "partial", f"{upload.pk}.part")
+
+
+def discard_upload(upload):
+    """
+    Deletes an upload session and its partial file.
+    """
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def append_chunk(upload, stream, offset, length):
+    """
+    Writes `length` bytes from `stream` at `offset` of the upload's partial file and
+    returns how many bytes arrived. A chunk cut short by a dropped connection still
+    counts, so the client resumes from the new `received`.
+    """
+    if offset != upload.received:
+        raise UploadRejected(f"Expected offset {upload.received}.", 409)
+    if length <= 0:
+        raise UploadRejected("Empty chunk.")
+    if length > settings.RESUME_UPLOAD_CHUNK_BYTES:
+        raise UploadRejected(f"Chunks may be at most {settings.RESUME_UPLOAD_CHUNK_BYTES} bytes.", 413)
+    if offset + length > upload.total_size:
+        raise UploadRejected(f"Chunk runs past the declared size of {upload.total_size} bytes.", 413)
+
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    bogus = False
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        # Drop anything after `offset` left behind by an interrupted attempt at this chunk.
+        f.seek(offset)
+        f.truncate()
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written)) if stream else b""
+            if not data:
+                break
+            if not matches_pdf_magic(data, offset + written):
+                bogus = True
+                break
+            f.write(data)
+            written += len(data)
+
+    if bogus:
+        discard_upload(upload)
+        raise UploadRejected("File is not a PDF.", 415)
+
+    # Conditional on the offset we started from, so a concurrent duplicate chunk cannot double-count.
+    updated = ResumeUpload.objects.filter(pk=upload.pk, received=offset).update(received=offset + written)
+    if not updated:
+        raise UploadRejected("Another chunk for this offset was received concurrently.", 409)
+    upload.received = offset + written
+    return written
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from .scoring import STOPWORDS, extract_skills, tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are serialized.
+    fcntl = None
+
+# Local, CPU-only similarity search between resumes and job descriptions.
+# Texts are embedded as hashed unigram/bigram vectors (no model to download) and
+# kept in a memory-mapped NumPy array per index, so ranking a few thousand
+# documents is one matrix-vector product. Like scoring.py, this module does not
+# import Django; services.py owns the index instances.
+
+# Bump when embed() changes, so indexes built by an older version are rebuilt.
+EMBEDDING_VERSION = 1
+EMBEDDING_DIM = 1024
+
+# Skills named in the bundled vocabulary count this many times more than plain words.
+SKILL_BOOST = 3.0
+
+INITIAL_CAPACITY = 1024
+
+
+@lru_cache(maxsize=65536)
+def feature_slot(feature):
+    """
+    Maps a feature string to (dimension, sign). The sign halves the bias from hash collisions.
+    """
+    digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+    return digest % EMBEDDING_DIM, 1.0 if digest >> 63 else -1.0
+
+
+def embed(text):
+    """
+    Returns the L2-normalized float32 embedding of `text`: log-scaled counts of its
+    non-stopword unigrams and bigrams, plus boosted vocabulary skills, hashed into EMBEDDING_DIM slots.
+    """
+    tokens = tokenize(text)
+    words = [t for t in tokens if t not in STOPWORDS]
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feature, count in features.items():
+        slot, sign = feature_slot(feature)
+        vector[slot] += sign * (1.0 + math.log(count))
+    for skill in extract_skills(tokens):
+        slot, sign = feature_slot("skill:" + skill)
+        vector[slot] += sign * SKILL_BOOST
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def top_k(scores, k):
+    """
+    Returns the indices of the k highest scores, best first.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """
+    An append-mostly store of (item id, owner id, embedding) rows on disk:
+    <name>.vectors.npy and <name>.keys.npy are memory-mapped, <name>.json holds the row count.
+    Writers take a file lock, so web and worker processes can update the same index;
+    readers pick up changes through the JSON file.
+    """
+
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, f"{name}.vectors.npy")
+        self.keys_path = os.path.join(directory, f"{name}.keys.npy")
+        self.meta_path = os.path.join(directory, f"{name}.json")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.thread_lock = threading.Lock()
+        self.epoch = None
+        self.count = 0
+        self.vectors = None
+        self.keys = None
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self.thread_lock, open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self, writable=False):
+        """
+        Re-reads the row count, and remaps the arrays if another process replaced them
+        (see grow) since we last looked. The JSON file is tiny, so this runs on every call.
+        """
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            self.count, self.vectors, self.keys, self.epoch = 0, None, None, None
+            return
+        if meta.get("version") != EMBEDDING_VERSION:
+            # Built by an older embed(): unusable until rebuilt (see build_vector_index).
+            self.count, self.vectors, self.keys, self.epoch = 0, None, None, None
+            return
+        stale = meta["epoch"] != self.epoch or self.vectors is None
+        if stale or (writable and not self.vectors.flags.writeable):
+            mode = "r+" if writable else "r"
+            self.vectors = np.load(self.vectors_path, mmap_mode=mode)
+            self.keys = np.load(self.keys_path, mmap_mode=mode)
+            self.epoch = meta["epoch"]
+        self.count = meta["count"]
+
+    def write_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": EMBEDDING_VERSION, "dim": EMBEDDING_DIM, "epoch": self.epoch, "count": self.count}, f)
+        os.replace(tmp, self.meta_path)
+
+    def grow(self, capacity):
+        """
+        Copies the rows into larger files and swaps them in; readers keep the old mapping until they refresh.
+        """
+        vectors = np.lib.format.open_memmap(self.vectors_path + ".tmp", mode="w+", dtype=np.float32,
+                                            shape=(capacity, EMBEDDING_DIM))
+        keys = np.lib.format.open_memmap(self.keys_path + ".tmp", mode="w+", dtype=np.int64, shape=(capacity, 2))
+        keys[:] = -1
+        if self.count:
+            vectors[:self.count] = self.vectors[:self.count]
+            keys[:self.count] = self.keys[:self.count]
+        vectors.flush()
+        keys.flush()
+        os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        os.replace(self.keys_path + ".tmp", self.keys_path)
+        self.vectors, self.keys = vectors, keys
+        # A fresh random epoch, so no process mistakes these files for ones it mapped before a clear().
+        self.epoch = os.urandom(8).hex()
+
+    def slot_of(self, item_id):
+        slots = np.flatnonzero(self.keys[:self.count, 0] == item_id) if self.count else ()
+        return int(slots[0]) if len(slots) else None
+
+    def add(self, item_id, owner_id, vector):
+        """
+        Inserts or replaces the embedding stored for `item_id`.
+        """
+        self.add_many([(item_id, owner_id, vector)])
+
+    def add_many(self, rows):
+        """
+        Inserts or replaces (item id, owner id, vector) rows under one lock and one flush.
+        """
+        if not rows:
+            return
+        with self.locked():
+            self.refresh(writable=True)
+            for item_id, owner_id, vector in rows:
+                slot = self.slot_of(item_id) if self.vectors is not None else None
+                if slot is None:
+                    capacity = 0 if self.vectors is None else len(self.vectors)
+                    if self.count >= capacity:
+                        self.grow(max(INITIAL_CAPACITY, capacity * 2))
+                    slot = self.count
+                    self.count += 1
+                self.vectors[slot] = vector
+                self.keys[slot] = (item_id, owner_id)
+            self.vectors.flush()
+            self.keys.flush()
+            self.write_meta()
+
+    def remove(self, item_id):
+        """
+        Tombstones the row for `item_id`; rebuilding the index reclaims the space.
+        """
+        with self.locked():
+            self.refresh(writable=True)
+            slot = self.slot_of(item_id) if self.vectors is not None else None
+            if slot is None:
+                return
+            self.keys[slot] = (-1, -1)
+            self.vectors[slot] = 0
+            self.keys.flush()
+            self.write_meta()
+
+    def clear(self):
+        with self.locked():
+            for path in (self.meta_path, self.vectors_path, self.keys_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.count, self.vectors, self.keys, self.epoch = 0, None, None, None
+
+    def search(self, vector, k, owner_id=None, exclude=()):
+        """
+        Returns up to k (item id, cosine similarity) pairs, best first, optionally
+        limited to one owner's rows.
+        """
+        self.refresh()
+        if not self.count or self.vectors is None:
+            return []
+        keys = self.keys[:self.count]
+        mask = keys[:, 0] >= 0
+        if owner_id is not None:
+            mask &= keys[:, 1] == owner_id
+        if exclude:
+            mask &= ~np.isin(keys[:, 0], list(exclude))
+        rows = np.flatnonzero(mask)
+        scores = self.vectors[rows] @ vector
+        best = top_k(scores, k)
+        return [(int(keys[rows[i], 0]), float(scores[i])) for i in best]
+
+    def __len__(self):
+        self.refresh()
+        if not self.count or self.keys is None:
+            return 0
+        return int((self.keys[:self.count, 0] >= 0).sum())
+
+
+def shortlist(query_texts, candidate_texts, k):
+    """
+    For each query text, returns the indices of the k most similar candidate texts, best first.
+    """
+    if not query_texts or not candidate_texts:
+        return [np.empty(0, dtype=np.int64) for _ in query_texts]
+    queries = np.vstack([embed(text) for text in query_texts])
+    candidates = np.vstack([embed(text) for text in candidate_texts])
+    return [top_k(row, k) for row in queries @ candidates.T]
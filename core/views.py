@@ -1,10 +1,71 @@
+import json
+import math
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status, permissions
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.functions import Substr
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.files import File
 from django.shortcuts import get_object_or_404
-from .serializers import UserSerializer, ResumeSerializer, AnalysisSerializer
-from .models import User, Resume, JobDescription, Analysis
-from .services import extract_text_from_pdf, analyze_resume_with_llama
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from . import metrics
+from .pagination import AnalysisHistoryPagination, ResumeListPagination
+from .serializers import (
+    UserSerializer, ResumeSerializer, ResumeUploadSerializer, AnalysisSerializer, AnalysisSummarySerializer,
+    AnalysisJobSerializer, AnalysisBatchSerializer
+)
+from .models import User, Resume, ResumeUpload, JobDescription, Analysis, AnalysisJob, AnalysisBatch, AnalysisSkill, LLMUsage
+from .services import (
+    store_resume, prewarm_resume, parse_since, match_job_descriptions, match_resumes, enqueue_analysis_job, run_analysis_once,
+    run_analysis_once_async, run_batch_analysis, run_prescore, stream_analysis,
+    AnalysisError, IdempotencyKeyReused, LLMUnavailableError, ANALYSIS_MODES
+)
+from .streaming import sse_event
+from .throttling import AnalyzeThrottle, analyze_wait, batch_analyze_wait, daily_limits
+from .uploads import PdfUploadGuard, UploadRejected, append_chunk, discard_upload, partial_path
+
+
+def is_truthy(value):
+    # Accepts JSON booleans as well as the strings form-encoded clients send.
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_idempotency_key(request):
+    """
+    Returns the request's Idempotency-Key header ('' if it has none), or None if the key is unusable.
+    Clients send a fresh key per analysis and the same key again when they retry it.
+    """
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if len(key) > 255 or not key.isprintable():
+        return None
+    return key
+
+
+IDEMPOTENCY_KEY_ERROR = {'error': 'Idempotency-Key must be at most 255 printable characters.'}
+
+
+def stored_jd_texts(user, job_description_ids):
+    """
+    Returns {id: text} for those of the ids that are the user's stored job descriptions.
+    Clients that analyzed a JD before send its job_description_id instead of the whole text again.
+    """
+    ids = {int(pk) for pk in job_description_ids if str(pk).isdigit()}
+    return dict(JobDescription.objects.filter(pk__in=ids, user=user).values_list('pk', 'text'))
+
+
+def stored_jd_text(user, job_description_id):
+    if not str(job_description_id).isdigit():
+        return None
+    return stored_jd_texts(user, [job_description_id]).get(int(job_description_id))
+
 
 # An API view for user registration.
 # This provides a public endpoint (no authentication required) for new users to create an account.
@@ -13,74 +74,558 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = (permissions.AllowAny,)
     serializer_class = UserSerializer
 
+# Lists the current user's resumes, newest first, so a resume uploaded once can be picked
+# again for every new job description instead of being re-uploaded.
+class ResumeListView(generics.ListAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ResumeSerializer
+    pagination_class = ResumeListPagination
+
+    def get_queryset(self):
+        return Resume.objects.filter(user=self.request.user)
+
 # An API view for uploading resume files.
 # This provides a secure endpoint for authenticated users to upload their PDF resumes.
 class ResumeUploadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Installs the size/PDF checks before anything (including authentication) reads the body.
+        self.upload_guard = PdfUploadGuard(request)
+        request.upload_handlers.insert(0, self.upload_guard)
+        return super().initialize_request(request, *args, **kwargs)
+
     def post(self, request, *args, **kwargs):
         # Creates a serializer instance with the uploaded file data.
         # The serializer validates the incoming data (ensuring a file was actually uploaded) before we attempt to save it.
         serializer = ResumeSerializer(data=request.data)
+        if self.upload_guard.error:
+            return Response({'error': str(self.upload_guard.error)}, status=self.upload_guard.error.status)
         if serializer.is_valid():
-            # Saves the new Resume object, associating it with the currently logged-in user.
-            serializer.save(user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Stores the file content-addressed: a re-upload of the same PDF is just a hash check
+            # and returns the existing resume, and identical files share one copy on disk.
+            resume, created = store_resume(
+                request.user, serializer.validated_data['file'], sha256=self.upload_guard.hashes.get('file')
+            )
+            # Extracts the text and does the rest of the resume-side work in the background,
+            # while the user writes the job description; later analyses never re-parse the PDF.
+            prewarm_resume(resume)
+            return Response(
+                ResumeSerializer(resume).data,
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# An API view that starts a resumable, chunked upload.
+# Meant for slow or flaky connections: the file is sent in pieces to ResumeUploadChunkView.
+class ResumeUploadSessionView(generics.CreateAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ResumeUploadSerializer
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+# An API view for one chunked upload.
+# GET reports how many bytes arrived (where to resume), PUT appends the chunk starting at the
+# Upload-Offset header, and DELETE abandons the upload. The PUT that delivers the last byte
+# stores the resume and answers like ResumeUploadView.
+class ResumeUploadChunkView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_upload(self, request, pk):
+        return get_object_or_404(ResumeUpload, pk=pk, user=request.user)
+
+    def get(self, request, pk, *args, **kwargs):
+        return Response(ResumeUploadSerializer(self.get_upload(request, pk)).data)
+
+    def delete(self, request, pk, *args, **kwargs):
+        discard_upload(self.get_upload(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def put(self, request, pk, *args, **kwargs):
+        upload = self.get_upload(request, pk)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return Response({'error': 'The Upload-Offset header is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Reads the raw body in small pieces straight into the partial file; request.data is never touched.
+            append_chunk(upload, request.stream, offset, length)
+        except UploadRejected as e:
+            return Response({'error': str(e), 'received': upload.received}, status=e.status)
+
+        if upload.received < upload.total_size:
+            return Response(ResumeUploadSerializer(upload).data, status=status.HTTP_202_ACCEPTED)
+
+        with open(partial_path(upload), 'rb') as f:
+            resume, created = store_resume(request.user, File(f, name=upload.file_name or 'resume.pdf'))
+        discard_upload(upload)
+        prewarm_resume(resume)
+        return Response(
+            ResumeSerializer(resume).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
 # The main API view to trigger the resume analysis.
 # This endpoint connects all the pieces: it takes a resume ID and JD text, calls our AI service 
 class AnalyzeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    # Per-user and global rate limits plus the daily LLM quota; over the limit is a 429 with Retry-After.
+    throttle_classes = [AnalyzeThrottle]
 
     def post(self, request, *args, **kwargs):
         resume_id = request.data.get('resume_id')
         jd_text = request.data.get('jd_text')
+        job_description_id = request.data.get('job_description_id')
+        idempotency_key = get_idempotency_key(request)
+        if idempotency_key is None:
+            return Response(IDEMPOTENCY_KEY_ERROR, status=status.HTTP_400_BAD_REQUEST)
 
-        # Basic validation to ensure the required data was sent.
-        if not resume_id or not jd_text:
+        # Basic validation to ensure the required data was sent: the JD as text, or the id of a stored one.
+        if not resume_id or not (jd_text or job_description_id):
             return Response({'error': 'Resume ID and Job Description are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Picks how much work to do: see ANALYSIS_MODES in services.py.
+        mode = request.data.get('mode') or settings.ANALYSIS_DEFAULT_MODE
+        if mode not in ANALYSIS_MODES:
+            return Response({'error': f'mode must be one of: {", ".join(ANALYSIS_MODES)}.'}, status=status.HTTP_400_BAD_REQUEST)
+
         # Retrieves the Resume object from the database, ensuring it exists and belongs to the current user.
         resume = get_object_or_404(Resume, pk=resume_id, user=request.user)
+        if not jd_text:
+            jd_text = stored_jd_text(request.user, job_description_id)
+            if jd_text is None:
+                return Response({'detail': 'No JobDescription matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Fast mode answers straight from the local pre-scorer; the result is preliminary and not stored.
+        if mode == 'fast':
+            try:
+                result = run_prescore(resume, jd_text)
+            except AnalysisError as e:
+                return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return Response({'result': result, 'preliminary': True}, status=status.HTTP_200_OK)
+
+        # In async mode the request only enqueues a job; a background worker does the slow part.
+        # The client then polls the job endpoint for its status and result.
+        # Resending the same Idempotency-Key returns the job it queued instead of queuing another.
+        if is_truthy(request.data.get('async')):
+            try:
+                job, _ = enqueue_analysis_job(request.user, resume, jd_text, mode, idempotency_key)
+            except IdempotencyKeyReused as e:
+                return Response({'error': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            return Response(AnalysisJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            # Extracts (or reuses cached) resume text, analyzes it and saves the result.
+            # An identical earlier analysis is returned as-is, without calling the LLM again, and an
+            # identical request already in flight (in any worker process) is waited for and shared.
+            analysis, cache_hit, created = run_analysis_once(request.user, resume, jd_text, mode, idempotency_key)
+        except IdempotencyKeyReused as e:
+            return Response({'error': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        except LLMUnavailableError as e:
+            # The provider is unhealthy; tell the client when to come back instead of letting it hammer us.
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(math.ceil(e.retry_after))}
+            )
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Serializes the final analysis object to be sent back as a JSON response.
+        serializer = AnalysisSerializer(analysis)
+        return Response(
+            {**serializer.data, 'cache_hit': cache_hit},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+# Shared request handling for the native async analyze views below.
+# DRF views are sync-only, so these are plain Django views that do JWT authentication themselves.
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAnalyzeBaseView(View):
+    http_method_names = ['post']
+
+    async def parse_request(self, request):
+        """
+        Returns (user, resume, data) for a valid request, or a JsonResponse describing the problem.
+        data['idempotency_key'] holds the Idempotency-Key header.
+        """
+        try:
+            auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if auth is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+        user = auth[0]
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Request body must be JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Request body must be a JSON object.'}, status=status.HTTP_400_BAD_REQUEST)
+        data['idempotency_key'] = get_idempotency_key(request)
+        if data['idempotency_key'] is None:
+            return JsonResponse(IDEMPOTENCY_KEY_ERROR, status=status.HTTP_400_BAD_REQUEST)
+
+        resume_id = data.get('resume_id')
+        if not resume_id or not (data.get('jd_text') or data.get('job_description_id')):
+            return JsonResponse({'error': 'Resume ID and Job Description are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Like stored_jd_text: anything but a numeric id would make the query raise instead of matching nothing.
+        if not str(resume_id).isdigit():
+            return JsonResponse({'error': 'resume_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        resume = await Resume.objects.filter(pk=resume_id, user=user).afirst()
+        if resume is None:
+            return JsonResponse({'detail': 'No Resume matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+        if not data.get('jd_text'):
+            data['jd_text'] = await sync_to_async(stored_jd_text)(user, data['job_description_id'])
+            if data['jd_text'] is None:
+                return JsonResponse({'detail': 'No JobDescription matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # The same limits AnalyzeThrottle applies to the DRF views.
+        wait = await sync_to_async(analyze_wait)(user, data.get('mode'))
+        if wait:
+            response = JsonResponse({'detail': f'Request was throttled. Expected available in {math.ceil(wait)} seconds.'},
+                                    status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+
+        return user, resume, data
+
+
+# A native async version of AnalyzeView for ASGI deployments (see resume_analyzer/asgi.py).
+# While the LLM call is in flight the request only holds an event-loop task, not a worker thread,
+# so one process can serve dozens of analyses at once.
+class AsyncAnalyzeView(AsyncAnalyzeBaseView):
+
+    async def post(self, request, *args, **kwargs):
+        parsed = await self.parse_request(request)
+        if isinstance(parsed, JsonResponse):
+            return parsed
+        user, resume, data = parsed
+        jd_text = data['jd_text']
+
+        mode = data.get('mode') or settings.ANALYSIS_DEFAULT_MODE
+        if mode not in ANALYSIS_MODES:
+            return JsonResponse({'error': f'mode must be one of: {", ".join(ANALYSIS_MODES)}.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if mode == 'fast':
+            try:
+                result = await sync_to_async(run_prescore)(resume, jd_text)
+            except AnalysisError as e:
+                return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return JsonResponse({'result': result, 'preliminary': True}, status=status.HTTP_200_OK)
+
+        try:
+            analysis, cache_hit, created = await run_analysis_once_async(user, resume, jd_text, mode, data['idempotency_key'])
+        except IdempotencyKeyReused as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        except LLMUnavailableError as e:
+            response = JsonResponse({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(math.ceil(e.retry_after))
+            return response
+        except AnalysisError as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        data = await sync_to_async(lambda: AnalysisSerializer(analysis).data)()
+        return JsonResponse(
+            {**data, 'cache_hit': cache_hit},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+# A streaming version of AnalyzeView that relays the analysis over Server-Sent Events as the LLM writes it.
+# Emits one "field" event per completed result field (score first, then skills, then suggestions),
+# then a "done" event with the stored analysis, or an "error" event. Serve it through ASGI.
+class StreamAnalyzeView(AsyncAnalyzeBaseView):
+
+    async def post(self, request, *args, **kwargs):
+        parsed = await self.parse_request(request)
+        if isinstance(parsed, JsonResponse):
+            return parsed
+        user, resume, data = parsed
+
+        response = StreamingHttpResponse(
+            self.events(user, resume, data['jd_text'], data['idempotency_key']), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stops nginx-style proxies from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def events(self, user, resume, jd_text, idempotency_key):
+        # An initial comment flushes the headers so the client sees the stream open right away.
+        yield ": analysis started\n\n"
         try:
-            # Calls the text extraction service 
-            resume_text = extract_text_from_pdf(resume.file)
-            if not resume_text:
-                return Response({'error': 'Could not extract text from PDF.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Creates and saves the JobDescription object.
-            job_description = JobDescription.objects.create(user=request.user, text=jd_text)
-
-            # Calls the Gemini analysis service 
-            # This is the core step where the actual AI analysis happens.
-            analysis_result = analyze_resume_with_llama(resume_text, job_description.text)
-            if not analysis_result:
-                return Response({'error': 'Failed to get analysis from AI service.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Creates and saves the Analysis object with the result from Gemini.
-            analysis = Analysis.objects.create(
-                user=request.user,
-                resume=resume,
-                job_description=job_description,
-                result=analysis_result
+            async for event, payload in stream_analysis(user, resume, jd_text, idempotency_key):
+                if event == 'field':
+                    yield sse_event('field', payload)
+                else:
+                    analysis, cache_hit, _ = payload
+                    data = await sync_to_async(lambda: AnalysisSerializer(analysis).data)()
+                    yield sse_event('done', {**data, 'cache_hit': cache_hit})
+        except LLMUnavailableError as e:
+            yield sse_event('error', {'error': str(e), 'retry_after': math.ceil(e.retry_after)})
+        except AnalysisError as e:
+            yield sse_event('error', {'error': str(e)})
+
+
+# An API view to check on a queued analysis.
+# Reports queued, running, done or failed, and includes the analysis once it is done.
+class AnalysisJobView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = AnalysisJobSerializer
+
+    def get_queryset(self):
+        return AnalysisJob.objects.filter(user=self.request.user).select_related('analysis__job_description')
+
+
+# An API view that analyzes many resumes against many job descriptions in one request.
+# Replaces hundreds of separate /api/analyze/ calls with one authenticated request whose LLM calls run concurrently.
+class BatchAnalyzeView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    # Throttled in post() instead of by AnalyzeThrottle: a batch costs one token and one quota request per pair.
+
+    def post(self, request, *args, **kwargs):
+        resume_ids = request.data.get('resume_ids')
+        jd_texts = request.data.get('jd_texts', [])
+        # Stored job descriptions can be referenced by id instead of (or as well as) sending their text.
+        job_description_ids = request.data.get('job_description_ids', [])
+
+        # Basic validation: resume_ids and at least one of jd_texts / job_description_ids must be non-empty lists,
+        # and the batch must not exceed the configured size.
+        if (not isinstance(resume_ids, list) or not isinstance(jd_texts, list) or not isinstance(job_description_ids, list)
+                or not resume_ids or not (jd_texts or job_description_ids)):
+            return Response({'error': 'resume_ids and jd_texts or job_description_ids must be non-empty lists.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in resume_ids):
+            return Response({'error': 'resume_ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(text, str) and text.strip() for text in jd_texts):
+            return Response({'error': 'Every job description must be non-empty text.'}, status=status.HTTP_400_BAD_REQUEST)
+        if job_description_ids:
+            stored = stored_jd_texts(request.user, job_description_ids)
+            missing = set(map(str, job_description_ids)) - set(map(str, stored))
+            if missing:
+                return Response({'error': f'Job descriptions not found: {", ".join(sorted(missing))}'}, status=status.HTTP_404_NOT_FOUND)
+            jd_texts = jd_texts + list(stored.values())
+        # Optional: only analyze each job description against its top_k most similar resumes.
+        top_k = request.data.get('top_k')
+        if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+            return Response({'error': 'top_k must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        pair_count = min(len(set(resume_ids)), top_k or math.inf) * len({JobDescription.hash_text(text) for text in jd_texts})
+        if pair_count > settings.ANALYSIS_BATCH_MAX_PAIRS:
+            return Response(
+                {'error': f'A batch may contain at most {settings.ANALYSIS_BATCH_MAX_PAIRS} resume/job description pairs.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            # Serializes the final analysis object to be sent back as a JSON response.
-            serializer = AnalysisSerializer(analysis)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Every requested resume must exist and belong to the current user.
+        resumes = list(Resume.objects.filter(pk__in=resume_ids, user=request.user))
+        missing = set(map(str, resume_ids)) - {str(resume.pk) for resume in resumes}
+        if missing:
+            return Response({'error': f'Resumes not found: {", ".join(sorted(missing))}'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Checked against the daily quota and rate limits as pair_count analyze requests.
+        wait = batch_analyze_wait(request.user, pair_count)
+        if wait:
+            return Response(
+                {'detail': f'Request was throttled. Expected available in {math.ceil(wait)} seconds.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(math.ceil(wait))}
+            )
 
+        try:
+            batch, errors = run_batch_analysis(
+                request.user, resumes, jd_texts, settings.ANALYSIS_BATCH_PARALLELISM, top_k=top_k
+            )
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        batch = AnalysisBatch.objects.prefetch_related('analyses').get(pk=batch.pk)
+        serializer = AnalysisBatchSerializer(batch)
+        return Response({**serializer.data, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+
+# An API view to fetch a batch and all of its analyses by batch id.
+class AnalysisBatchView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = AnalysisBatchSerializer
+
+    def get_queryset(self):
+        return AnalysisBatch.objects.filter(user=self.request.user).prefetch_related('analyses')
 
-# An API view to list all past analyses for the logged-in user.
-# To populate the "History" page in our frontend.
+
+# An API view reporting the user's LLM usage today against their daily limits (0 = unlimited).
+class LLMUsageView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        today = timezone.localdate()
+        usage = LLMUsage.objects.filter(user=request.user, day=today).first() or LLMUsage(user=request.user, day=today)
+        token_limit, request_limit = daily_limits(request.user)
+        return Response({
+            'day': today,
+            'requests': usage.requests,
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens,
+            'total_tokens': usage.total_tokens,
+            'daily_token_limit': token_limit,
+            'daily_request_limit': request_limit,
+        })
+
+
+# Shared by the two match views: reads and bounds the ?k= query parameter.
+class MatchesBaseView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    default_k = 10
+    max_k = 100
+
+    def get_k(self, request):
+        try:
+            return max(1, min(int(request.query_params.get('k', self.default_k)), self.max_k))
+        except ValueError:
+            return self.default_k
+
+# An API view that ranks the user's stored job descriptions against one resume, in milliseconds and without the LLM.
+# Use it to pick which pairs are worth a full /api/analyze/ call.
+class ResumeMatchesView(MatchesBaseView):
+    def get(self, request, pk, *args, **kwargs):
+        resume = get_object_or_404(Resume, pk=pk, user=request.user)
+        try:
+            matches = match_job_descriptions(resume, self.get_k(request))
+        except AnalysisError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'resume_id': resume.pk,
+            'matches': [
+                {'job_description_id': jd.pk, 'score': round(score, 4), 'job_description_snippet': jd.text[:200]}
+                for jd, score in matches
+            ],
+        })
+
+# An API view that ranks the user's resumes against one stored job description.
+class JobDescriptionMatchesView(MatchesBaseView):
+    def get(self, request, pk, *args, **kwargs):
+        job_description = get_object_or_404(JobDescription, pk=pk, user=request.user)
+        matches = match_resumes(job_description, self.get_k(request))
+        return Response({
+            'job_description_id': job_description.pk,
+            'matches': [
+                {'resume_id': resume.pk, 'score': round(score, 4), 'file': resume.file.url}
+                for resume, score in matches
+            ],
+        })
+
+
+# An API view to list past analyses for the logged-in user, newest first, one cursor page at a time.
+# To populate the "History" page in our frontend. Pass ?summary=true for only the score, title and JD snippet,
+# and ?job_description_id= for only the analyses of one stored job description.
 class AnalysisHistoryView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = AnalysisSerializer
+    pagination_class = AnalysisHistoryPagination
+
+    def is_summary(self):
+        return is_truthy(self.request.query_params.get('summary'))
+
+    def get_serializer_class(self):
+        return AnalysisSummarySerializer if self.is_summary() else AnalysisSerializer
 
     def get_queryset(self):
         # Filters the queryset to return only Analysis objects belonging to the current user.
-        return Analysis.objects.filter(user=self.request.user).order_by('-analyzed_at')
+        queryset = Analysis.objects.filter(user=self.request.user)
+        job_description_id = self.request.query_params.get('job_description_id')
+        if job_description_id is not None:
+            queryset = queryset.filter(job_description_id=job_description_id if job_description_id.isdigit() else None)
+        if self.is_summary():
+            # Reads just the summary columns and a JD snippet instead of loading the full result and JD text.
+            return queryset.annotate(
+                job_description_snippet=Substr('job_description__text', 1, 150),
+            ).only('id', 'analyzed_at', 'suitability_score', 'suggested_title')
+        # Joins the job description in the same query instead of one extra query per row.
+        return queryset.select_related('job_description')
+
+
+# Shared limit handling for the ranking and analytics views below.
+class RankingBaseView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 50
+    max_limit = 200
+
+    def get_limit(self, request):
+        try:
+            return max(1, min(int(request.query_params.get('limit', self.default_limit)), self.max_limit))
+        except ValueError:
+            return self.default_limit
+
+# Ranks the resumes analyzed against one of the user's job descriptions, best score first.
+# Only each resume's latest analysis counts. Runs as one query on analysis_jd_score_idx.
+class JobDescriptionLeaderboardView(RankingBaseView):
+    def get(self, request, pk, *args, **kwargs):
+        job_description = get_object_or_404(JobDescription, pk=pk, user=request.user)
+        newer = Analysis.objects.filter(
+            resume=OuterRef('resume'), job_description=OuterRef('job_description'), analyzed_at__gt=OuterRef('analyzed_at')
+        )
+        rows = (
+            Analysis.objects.filter(job_description=job_description, suitability_score__isnull=False)
+            .exclude(Exists(newer))
+            .order_by('-suitability_score', 'analyzed_at')
+            .values('id', 'resume_id', 'resume__name', 'suitability_score', 'suggested_title', 'analyzed_at')
+            [:self.get_limit(request)]
+        )
+        return Response({
+            'job_description_id': job_description.pk,
+            'results': [
+                {
+                    'analysis_id': row['id'],
+                    'resume_id': row['resume_id'],
+                    'resume_name': row['resume__name'],
+                    'suitability_score': row['suitability_score'],
+                    'suggested_title': row['suggested_title'],
+                    'analyzed_at': row['analyzed_at'],
+                }
+                for row in rows
+            ],
+        })
+
+# Counts how often each skill came up as missing (or, with ?kind=matching, matching) across the
+# user's analyses, most frequent first. ?since=2025-01-01 limits it to analyses made since then.
+class SkillGapsView(RankingBaseView):
+    default_limit = 20
+
+    def get(self, request, *args, **kwargs):
+        kind = request.query_params.get('kind', AnalysisSkill.Kind.MISSING)
+        if kind not in AnalysisSkill.Kind.values:
+            return Response({'error': f'kind must be one of: {", ".join(AnalysisSkill.Kind.values)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        analyses = Analysis.objects.filter(user=request.user)
+        if request.query_params.get('since'):
+            since = parse_since(request.query_params['since'])
+            if since is None:
+                return Response({'error': 'since must be an ISO 8601 date or datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+            analyses = analyses.filter(analyzed_at__gte=since)
+
+        rows = (
+            AnalysisSkill.objects.filter(analysis__in=analyses, kind=kind)
+            .values('skill_id', 'skill__label')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'skill__label')
+            [:self.get_limit(request)]
+        )
+        return Response({
+            'kind': kind,
+            'analyses': analyses.count(),
+            'skills': [{'skill': row['skill__label'], 'count': row['count']} for row in rows],
+        })
+
+
+# Exposes the analyze pipeline's counters and histograms for Prometheus to scrape.
+class MetricsView(View):
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
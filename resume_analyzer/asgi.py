@@ -3,6 +3,11 @@ ASGI config for resume_analyzer project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server so async views such as ``AsyncAnalyzeView``
+(``/api/analyze/async/``) share one event loop and LLM connection pool, e.g.::
+
+    gunicorn resume_analyzer.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
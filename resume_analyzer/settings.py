@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 import os
 import dj_database_url
 from dotenv import load_dotenv
@@ -53,6 +54,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Logs one JSON line of stage timings per analyze request (see core/metrics.py).
+    'core.metrics.RequestTimingMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -92,6 +95,186 @@ DATABASES = {
     )
 }
 
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.environ.get('CORE_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# Metrics
+# /metrics serves Prometheus-format counters and histograms for the analyze pipeline.
+# With several worker processes, point METRICS_DIR at a shared, writable directory so
+# the endpoint reports every process. If METRICS_TOKEN is set, scrapers must send it
+# as "Authorization: Bearer <token>".
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The "analysis" cache holds LLM results keyed by a hash of their inputs.
+# LocMemCache evicts least-recently-used entries once MAX_ENTRIES is reached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analysis': {
+        'BACKEND': os.environ.get('ANALYSIS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('ANALYSIS_CACHE_LOCATION', 'analysis-results'),
+        'TIMEOUT': int(os.environ.get('ANALYSIS_CACHE_TTL', 60 * 60 * 24)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+# Analysis modes
+# "full" always calls the LLM, "fast" returns the local pre-score (core/scoring.py)
+# without calling it, and "gated" skips the LLM when the pre-score is below
+# PRESCORE_LLM_THRESHOLD. Clients can pick a mode per request with "mode".
+
+ANALYSIS_DEFAULT_MODE = os.environ.get('ANALYSIS_DEFAULT_MODE', 'full')
+PRESCORE_LLM_THRESHOLD = int(os.environ.get('PRESCORE_LLM_THRESHOLD', 25))
+
+# Background analysis queue
+# Jobs created by POST /api/analyze/ with "async": true are processed by
+# `python manage.py run_analysis_worker`. Running jobs older than
+# ANALYSIS_JOB_STALE_AFTER seconds are requeued when a worker starts.
+
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 4))
+ANALYSIS_WORKER_POLL_INTERVAL = float(os.environ.get('ANALYSIS_WORKER_POLL_INTERVAL', 1.0))
+ANALYSIS_JOB_STALE_AFTER = int(os.environ.get('ANALYSIS_JOB_STALE_AFTER', 600))
+
+# Single-flight analyses and idempotency keys (see SingleFlight in core/services.py)
+# Identical analyze requests (same user, resume, job description and mode) that arrive while one
+# is running wait for its result instead of calling the LLM again, across all worker processes.
+# Waiters check on it every ANALYSIS_SINGLE_FLIGHT_POLL_INTERVAL seconds at most, and take over
+# if it has not finished after ANALYSIS_SINGLE_FLIGHT_STALE_AFTER seconds. A request retried with
+# the same Idempotency-Key header within IDEMPOTENCY_KEY_TTL seconds gets the original result.
+
+ANALYSIS_SINGLE_FLIGHT_POLL_INTERVAL = float(os.environ.get('ANALYSIS_SINGLE_FLIGHT_POLL_INTERVAL', 0.25))
+ANALYSIS_SINGLE_FLIGHT_STALE_AFTER = int(os.environ.get('ANALYSIS_SINGLE_FLIGHT_STALE_AFTER', 300))
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+
+# LLM client
+# GROQ_BASE_URL can point at a local fake server (see core/fake_llm.py) for tests and load tests.
+# LLM_MAX_CONCURRENCY caps in-flight calls per event loop in the async analysis path.
+
+GROQ_BASE_URL = os.environ.get('GROQ_BASE_URL', '')
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 32))
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 32))
+
+# LLM backends and hedged requests (see core/llm_backends.py)
+# LLM_BACKENDS is a JSON list of backends to route analyses over, each with a "type"
+# ("groq", "openai" for any OpenAI-compatible API, or "fake"), a "model", an optional
+# "name", and per type "base_url", "api_key_env" (the variable holding its key),
+# "latency"/"error_rate" (fake). Empty means one Groq backend running the default model
+# at GROQ_BASE_URL. With LLM_HEDGE_PERCENTILE set (e.g. 95) and at least two backends, a call
+# still running after the chosen backend's LLM_HEDGE_PERCENTILE latency (at least
+# LLM_HEDGE_MIN_DELAY seconds; LLM_HEDGE_DEFAULT_DELAY until it has LLM_HEDGE_MIN_SAMPLES
+# answers) gets a hedged second request to another backend. Both replies' tokens count
+# towards quotas, and a sync hedge that loses cannot be cancelled. 0 (the default) is off.
+# Example: [{"type": "groq", "model": "llama-3.1-8b-instant"},
+#           {"type": "openai", "model": "gpt-4o-mini", "base_url": "https://api.openai.com/v1", "api_key_env": "OPENAI_API_KEY"}]
+
+LLM_BACKENDS = json.loads(os.environ.get('LLM_BACKENDS') or '[]')
+LLM_HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', 0))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', 0.5))
+LLM_HEDGE_DEFAULT_DELAY = float(os.environ.get('LLM_HEDGE_DEFAULT_DELAY', 5))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', 20))
+
+# Resume and JD text is compacted to at most this many (estimated) tokens each
+# before it goes into the prompt (see core/compaction.py).
+PROMPT_RESUME_TOKEN_BUDGET = int(os.environ.get('PROMPT_RESUME_TOKEN_BUDGET', 2500))
+PROMPT_JD_TOKEN_BUDGET = int(os.environ.get('PROMPT_JD_TOKEN_BUDGET', 1500))
+
+# With ANALYSIS_RESUME_PROFILE on, the prompt carries a condensed profile of the
+# resume (titles, years of experience, skills, key achievements; see core/profiles.py),
+# built once per file, instead of the resume text. Off by default: the profile only
+# knows skills from a built-in vocabulary, so it can leave out much of a resume. Even
+# when on, resumes with a thin profile (see profiles.is_useful) are sent as text.
+
+ANALYSIS_RESUME_PROFILE = os.environ.get('ANALYSIS_RESUME_PROFILE', 'False').lower() == 'true'
+
+# Rate limiting and LLM quotas (see core/throttling.py)
+# Analyze requests draw from a token bucket per user and one shared by everyone:
+# each holds up to *_BURST requests and refills at *_PER_MINUTE. Each user may also
+# spend at most LLM_DAILY_TOKEN_LIMIT tokens in LLM_DAILY_REQUEST_LIMIT LLM calls per
+# day (0 = unlimited); a UserQuota row overrides these for one user.
+ANALYZE_RATE_PER_MINUTE = float(os.environ.get('ANALYZE_RATE_PER_MINUTE', 10))
+ANALYZE_BURST = int(os.environ.get('ANALYZE_BURST', 10))
+ANALYZE_GLOBAL_RATE_PER_MINUTE = float(os.environ.get('ANALYZE_GLOBAL_RATE_PER_MINUTE', 300))
+ANALYZE_GLOBAL_BURST = int(os.environ.get('ANALYZE_GLOBAL_BURST', 60))
+LLM_DAILY_TOKEN_LIMIT = int(os.environ.get('LLM_DAILY_TOKEN_LIMIT', 200000))
+LLM_DAILY_REQUEST_LIMIT = int(os.environ.get('LLM_DAILY_REQUEST_LIMIT', 200))
+
+# Transient LLM errors are retried up to LLM_RETRY_ATTEMPTS times with jittered
+# exponential backoff (or the provider's Retry-After). After
+# LLM_CIRCUIT_FAILURE_THRESHOLD consecutive failures, calls fail fast with a 503
+# for LLM_CIRCUIT_RESET_TIMEOUT seconds.
+LLM_RETRY_ATTEMPTS = int(os.environ.get('LLM_RETRY_ATTEMPTS', 4))
+LLM_RETRY_BACKOFF = float(os.environ.get('LLM_RETRY_BACKOFF', 0.5))
+LLM_RETRY_MAX_WAIT = float(os.environ.get('LLM_RETRY_MAX_WAIT', 20))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('LLM_CIRCUIT_FAILURE_THRESHOLD', 5))
+LLM_CIRCUIT_RESET_TIMEOUT = float(os.environ.get('LLM_CIRCUIT_RESET_TIMEOUT', 30))
+
+# PDF text extraction
+# Extraction runs in a pool of PDF_EXTRACT_WORKERS processes (0 = in the request
+# thread). It stops after PDF_MAX_PAGES pages, PDF_MAX_CHARS characters or
+# PDF_EXTRACT_TIME_BUDGET seconds, whichever comes first.
+
+PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', 2))
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', 20))
+PDF_MAX_CHARS = int(os.environ.get('PDF_MAX_CHARS', 30000))
+PDF_EXTRACT_TIME_BUDGET = float(os.environ.get('PDF_EXTRACT_TIME_BUDGET', 10))
+
+# Resume pre-warming
+# Right after an upload, RESUME_PREWARM_WORKERS background threads extract the
+# text and precompute the resume-side parts of an analysis (0 = in the request
+# thread). Precomputed parts are cached for RESUME_PREWARM_TTL seconds.
+
+RESUME_PREWARM_WORKERS = int(os.environ.get('RESUME_PREWARM_WORKERS', 2))
+RESUME_PREWARM_TTL = int(os.environ.get('RESUME_PREWARM_TTL', 60 * 60 * 24))
+
+# Resume uploads
+# Files larger than RESUME_MAX_UPLOAD_BYTES, or that do not start with the PDF
+# magic bytes, are rejected while they stream in. Chunked uploads
+# (/api/resumes/uploads/) take at most RESUME_UPLOAD_CHUNK_BYTES per request and
+# are discarded by gc_resume_blobs once idle for RESUME_UPLOAD_EXPIRY seconds.
+
+RESUME_MAX_UPLOAD_BYTES = int(os.environ.get('RESUME_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+RESUME_UPLOAD_CHUNK_BYTES = int(os.environ.get('RESUME_UPLOAD_CHUNK_BYTES', 1024 * 1024))
+RESUME_UPLOAD_EXPIRY = int(os.environ.get('RESUME_UPLOAD_EXPIRY', 24 * 3600))
+
+# Semantic matching index
+# Hashed n-gram vectors of every resume and job description, memory-mapped from
+# VECTOR_INDEX_DIR (see core/vector_index.py). Rebuild with: python manage.py build_vector_index
+
+VECTOR_INDEX_DIR = os.environ.get('VECTOR_INDEX_DIR', os.path.join(BASE_DIR, 'vector_index'))
+
+# Batch analysis
+# POST /api/analyze/batch/ runs at most ANALYSIS_BATCH_PARALLELISM LLM calls at
+# once and accepts up to ANALYSIS_BATCH_MAX_PAIRS resume/JD pairs per request.
+
+ANALYSIS_BATCH_PARALLELISM = int(os.environ.get('ANALYSIS_BATCH_PARALLELISM', 8))
+ANALYSIS_BATCH_MAX_PAIRS = int(os.environ.get('ANALYSIS_BATCH_MAX_PAIRS', 500))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -28,7 +28,23 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     # App-specific endpoints
+    path('api/resumes/', core_views.ResumeListView.as_view(), name='resume-list'),
     path('api/resumes/upload/', core_views.ResumeUploadView.as_view(), name='resume-upload'),
+    path('api/resumes/uploads/', core_views.ResumeUploadSessionView.as_view(), name='resume-upload-session'),
+    path('api/resumes/uploads/<uuid:pk>/', core_views.ResumeUploadChunkView.as_view(), name='resume-upload-chunk'),
+    path('api/resumes/<int:pk>/matches/', core_views.ResumeMatchesView.as_view(), name='resume-matches'),
+    path('api/job-descriptions/<int:pk>/matches/', core_views.JobDescriptionMatchesView.as_view(), name='job-description-matches'),
+    path('api/job-descriptions/<int:pk>/leaderboard/', core_views.JobDescriptionLeaderboardView.as_view(), name='job-description-leaderboard'),
     path('api/analyze/', core_views.AnalyzeView.as_view(), name='analyze'),
+    path('api/analyze/async/', core_views.AsyncAnalyzeView.as_view(), name='analyze-async'),
+    path('api/analyze/stream/', core_views.StreamAnalyzeView.as_view(), name='analyze-stream'),
+    path('api/analyze/jobs/<int:pk>/', core_views.AnalysisJobView.as_view(), name='analysis-job'),
+    path('api/analyze/batch/', core_views.BatchAnalyzeView.as_view(), name='analyze-batch'),
+    path('api/analyze/batch/<int:pk>/', core_views.AnalysisBatchView.as_view(), name='analysis-batch'),
     path('api/history/', core_views.AnalysisHistoryView.as_view(), name='analysis-history'),
+    path('api/usage/', core_views.LLMUsageView.as_view(), name='llm-usage'),
+    path('api/analytics/skill-gaps/', core_views.SkillGapsView.as_view(), name='skill-gaps'),
+
+    # Monitoring
+    path('metrics', core_views.MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file